@@ -0,0 +1,89 @@
+import argparse
+import datetime
+import os
+from dataclasses import dataclass
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+
+@dataclass
+class StandinConfig:
+    port: int
+    # seconds added before every response
+    latency: float = 0.0
+    # requests per second before the stand-in answers with a rate limit
+    # error; 0 disables the limit
+    rate_limit: float = 0.0
+    # deals, orders or reward events, depending on the stand-in
+    history_size: int = 1000
+    history_days: int = 90
+    # largest page a single response may carry
+    max_rows: int = 1000
+
+    @classmethod
+    def from_arguments(cls, arguments: argparse.Namespace) -> "StandinConfig":
+        return cls(
+            port=arguments.port,
+            latency=arguments.latency,
+            rate_limit=arguments.rate_limit,
+            history_size=arguments.history_size,
+            history_days=arguments.history_days,
+            max_rows=arguments.max_rows,
+        )
+
+    def to_arguments(self) -> list:
+        return [
+            "--port",
+            str(self.port),
+            "--latency",
+            str(self.latency),
+            "--rate-limit",
+            str(self.rate_limit),
+            "--history-size",
+            str(self.history_size),
+            "--history-days",
+            str(self.history_days),
+            "--max-rows",
+            str(self.max_rows),
+        ]
+
+
+def add_standin_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--history-size", type=int, default=1000)
+    parser.add_argument("--history-days", type=int, default=90)
+    parser.add_argument("--max-rows", type=int, default=1000)
+
+
+def write_certificate(directory: str) -> str:
+    # the cTrader client speaks TLS but does not verify the peer, so a
+    # throwaway self-signed certificate is enough
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.utcnow()
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    path = os.path.join(directory, "standin.pem")
+    with open(path, "wb") as pem:
+        pem.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.TraditionalOpenSSL,
+                serialization.NoEncryption(),
+            )
+        )
+        pem.write(certificate.public_bytes(serialization.Encoding.PEM))
+    return path
@@ -0,0 +1,196 @@
+import argparse
+import bisect
+import tempfile
+import time
+
+from ctrader_open_api import Protobuf
+from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import (
+    ProtoHeartbeatEvent,
+    ProtoMessage,
+)
+from ctrader_open_api.messages.OpenApiMessages_pb2 import (
+    ProtoOAAccountAuthReq,
+    ProtoOAAccountAuthRes,
+    ProtoOAApplicationAuthReq,
+    ProtoOAApplicationAuthRes,
+    ProtoOADealListReq,
+    ProtoOADealListRes,
+    ProtoOAErrorRes,
+    ProtoOAReconcileReq,
+    ProtoOAReconcileRes,
+    ProtoOATraderReq,
+    ProtoOATraderRes,
+)
+from ctrader_open_api.messages.OpenApiModelMessages_pb2 import (
+    ProtoOADealStatus,
+    ProtoOAPositionStatus,
+    ProtoOATradeSide,
+)
+from twisted.internet import protocol, reactor
+from twisted.internet.endpoints import serverFromString
+from twisted.protocols.basic import Int32StringReceiver
+
+from benchmarks.config import StandinConfig, add_standin_arguments, write_certificate
+from common.rate_limit import TokenBucket
+
+MONEY_DIGITS = 2
+SYMBOL_ID = 1
+DAY_MS = 86400000
+RATE_LIMIT_ERROR = "REQUEST_FREQUENCY_EXCEEDED"
+
+
+class FakeAccount:
+    def __init__(self, config: StandinConfig, account_id: int, symbol_id: int) -> None:
+        self.account_id = account_id
+        self.symbol_id = symbol_id
+        now = round(time.time() * 1000)
+        start = now - config.history_days * DAY_MS
+        step = max((now - start) // max(config.history_size, 1), 1)
+        # sorted by execution time, so a window is a slice found by bisection
+        self.deal_times = [start + i * step for i in range(config.history_size)]
+
+    def add_deals(self, response, from_timestamp: int, to_timestamp: int, limit: int):
+        # returns whether the window held more deals than were added
+        first = bisect.bisect_left(self.deal_times, from_timestamp)
+        last = bisect.bisect_right(self.deal_times, to_timestamp)
+        for index in range(first, min(last, first + limit)):
+            self.add_deal(response, index, self.deal_times[index])
+        return last - first > limit
+
+    def add_deal(self, response, index: int, execution_time: int):
+        deal = response.deal.add()
+        deal.dealId = index + 1
+        deal.orderId = index + 1
+        deal.positionId = index // 2 + 1
+        deal.volume = 100
+        deal.filledVolume = 100
+        deal.symbolId = self.symbol_id
+        deal.createTimestamp = execution_time
+        deal.executionTimestamp = execution_time
+        deal.tradeSide = ProtoOATradeSide.SELL if index % 2 else ProtoOATradeSide.BUY
+        deal.dealStatus = ProtoOADealStatus.FILLED
+        if index % 2:
+            # every second deal closes the position the previous one opened
+            detail = deal.closePositionDetail
+            detail.entryPrice = 5.0
+            detail.grossProfit = 150
+            detail.swap = -3
+            detail.commission = -1
+            detail.balance = 1000000
+            detail.moneyDigits = MONEY_DIGITS
+
+
+class FakeCTraderProtocol(Int32StringReceiver):
+    MAX_LENGTH = 15000000
+
+    def stringReceived(self, data):
+        message = ProtoMessage()
+        message.ParseFromString(data)
+        if message.payloadType == ProtoHeartbeatEvent().payloadType:
+            return
+        response = self.factory.handle(Protobuf.extract(message))
+        if response is None:
+            return
+        reactor.callLater(
+            self.factory.config.latency, self.reply, response, message.clientMsgId
+        )
+
+    def reply(self, response, client_msg_id: str):
+        if not self.connected:
+            return
+        message = ProtoMessage(
+            payload=response.SerializeToString(),
+            payloadType=response.payloadType,
+            clientMsgId=client_msg_id,
+        )
+        self.sendString(message.SerializeToString())
+
+
+class FakeCTraderFactory(protocol.Factory):
+    protocol = FakeCTraderProtocol
+
+    def __init__(self, config: StandinConfig) -> None:
+        self.config = config
+        self.accounts = {}
+        self.historical = (
+            TokenBucket(rate=config.rate_limit, capacity=config.rate_limit)
+            if config.rate_limit
+            else None
+        )
+
+    def account(self, account_id: int) -> FakeAccount:
+        if account_id not in self.accounts:
+            self.accounts[account_id] = FakeAccount(self.config, account_id, SYMBOL_ID)
+        return self.accounts[account_id]
+
+    def handle(self, request):
+        if isinstance(request, ProtoOAApplicationAuthReq):
+            return ProtoOAApplicationAuthRes()
+        if isinstance(request, ProtoOAAccountAuthReq):
+            return ProtoOAAccountAuthRes(
+                ctidTraderAccountId=request.ctidTraderAccountId
+            )
+        if isinstance(request, ProtoOAReconcileReq):
+            return self.reconcile(request.ctidTraderAccountId)
+        if isinstance(request, ProtoOATraderReq):
+            response = ProtoOATraderRes(ctidTraderAccountId=request.ctidTraderAccountId)
+            response.trader.ctidTraderAccountId = request.ctidTraderAccountId
+            response.trader.balance = 1000000
+            response.trader.depositAssetId = 1
+            response.trader.moneyDigits = MONEY_DIGITS
+            return response
+        if isinstance(request, ProtoOADealListReq):
+            return self.deal_list(request)
+        return ProtoOAErrorRes(
+            errorCode="UNSUPPORTED_MESSAGE",
+            description=type(request).__name__,
+        )
+
+    def reconcile(self, account_id: int):
+        response = ProtoOAReconcileRes(ctidTraderAccountId=account_id)
+        position = response.position.add()
+        position.positionId = 1
+        position.tradeData.symbolId = SYMBOL_ID
+        position.tradeData.volume = 50000
+        position.tradeData.tradeSide = ProtoOATradeSide.SELL
+        position.positionStatus = ProtoOAPositionStatus.POSITION_STATUS_OPEN
+        position.swap = -120
+        position.price = 6.5
+        position.usedMargin = 32500
+        position.moneyDigits = MONEY_DIGITS
+        return response
+
+    def deal_list(self, request):
+        if self.historical is not None and self.historical.reserve() > 0:
+            # the rejected request must not use up the allowance
+            self.historical.reserve(-1)
+            return ProtoOAErrorRes(
+                ctidTraderAccountId=request.ctidTraderAccountId,
+                errorCode=RATE_LIMIT_ERROR,
+            )
+        response = ProtoOADealListRes(ctidTraderAccountId=request.ctidTraderAccountId)
+        response.hasMore = self.account(request.ctidTraderAccountId).add_deals(
+            response,
+            request.fromTimestamp,
+            request.toTimestamp,
+            request.maxRows or self.config.max_rows,
+        )
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake cTrader Open API server")
+    add_standin_arguments(parser)
+    config = StandinConfig.from_arguments(parser.parse_args())
+
+    certificate = write_certificate(tempfile.mkdtemp(prefix="ctrader-standin-"))
+    endpoint = serverFromString(
+        reactor,
+        f"ssl:port={config.port}:interface=127.0.0.1:privateKey={certificate}",
+    )
+    endpoint.listen(FakeCTraderFactory(config))
+    reactor.run()
+
+
+if __name__ == "__main__":
+    main()
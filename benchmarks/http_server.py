@@ -0,0 +1,206 @@
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.config import StandinConfig, add_standin_arguments
+from common.rate_limit import TokenBucket
+
+BINANCE_PREFIX = "/binance/api"
+SUBSCAN_PREFIX = "/subscan/api/"
+FTX_PREFIX = "/ftx/api/"
+
+DOT_PRICE = "6.1"
+ORDER_QTY = "10.0"
+ORDER_QUOTE_QTY = "61.0"
+REWARD_AMOUNT = "1500000000"  # 0.15 DOT in planck
+BLOCK_TIME_SECONDS = 6
+FTX_PAGE_SIZE = 100
+FTX_MAX_PAGE_SIZE = 200
+
+
+class VenueHandler(BaseHTTPRequestHandler):
+    # one handler serves every REST venue, told apart by path prefix
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.dispatch(None)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.dispatch(body)
+
+    def dispatch(self, body):
+        config = self.server.config
+        if self.server.bucket is not None and self.server.bucket.reserve() > 0:
+            self.server.bucket.reserve(-1)
+            self.respond(429, {"code": -1003, "msg": "Too many requests"}, retry=1)
+            return
+        if config.latency:
+            time.sleep(config.latency)
+
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path.startswith(BINANCE_PREFIX):
+            status, payload = self.binance(url.path[len(BINANCE_PREFIX) :], query)
+        elif url.path.startswith(SUBSCAN_PREFIX):
+            status, payload = self.subscan(url.path[len(SUBSCAN_PREFIX) :], body)
+        elif url.path.startswith(FTX_PREFIX):
+            status, payload = self.ftx(url.path[len(FTX_PREFIX) :], query)
+        else:
+            status, payload = 404, {"error": url.path}
+        self.respond(status, payload)
+
+    def binance(self, path: str, query: dict):
+        if path == "/v3/ping":
+            return 200, {}
+        if path == "/v3/avgPrice":
+            return 200, {"mins": 5, "price": DOT_PRICE}
+        if path == "/v3/ticker/price":
+            symbols = json.loads(query["symbols"]) if "symbols" in query else []
+            if "symbol" in query:
+                return 200, {"symbol": query["symbol"], "price": DOT_PRICE}
+            return 200, [{"symbol": symbol, "price": DOT_PRICE} for symbol in symbols]
+        if path == "/v3/allOrders":
+            return 200, self.orders(query)
+        return 404, {"code": -1, "msg": path}
+
+    def orders(self, query: dict) -> list:
+        config = self.server.config
+        first = max(int(query.get("orderId", 1)), 1)
+        limit = min(int(query.get("limit", 500)), config.max_rows)
+        last = min(first + limit, config.history_size + 1)
+        return [
+            {
+                "symbol": query["symbol"],
+                "orderId": order_id,
+                "side": "BUY",
+                "status": "FILLED",
+                "executedQty": ORDER_QTY,
+                "cummulativeQuoteQty": ORDER_QUOTE_QTY,
+                "time": order_id * 1000,
+                "updateTime": order_id * 1000,
+            }
+            for order_id in range(first, last)
+        ]
+
+    def subscan(self, path: str, body: dict):
+        if path != "scan/account/reward_slash":
+            return 404, {"code": 404, "message": path}
+        config = self.server.config
+        rows = min(body.get("row", 10), config.max_rows)
+        start = body.get("page", 0) * rows
+        # newest first, like the real endpoint
+        numbers = range(config.history_size - 1 - start, -1, -1)[:rows]
+        rewards = [
+            {
+                "event_index": f"{1000 + number}-1",
+                "extrinsic_index": f"{1000 + number}-0",
+                "block_num": 1000 + number,
+                "block_timestamp": self.server.started
+                - (config.history_size - number) * BLOCK_TIME_SECONDS,
+                "amount": REWARD_AMOUNT,
+            }
+            for number in numbers
+        ]
+        data = {"count": config.history_size, "list": rewards}
+        return 200, {"code": 0, "message": "Success", "data": data}
+
+    def ftx(self, path: str, query: dict):
+        config = self.server.config
+        if path == "wallet/balances":
+            result = [{"coin": "DOT", "free": 0.0, "total": 0.0}]
+        elif path in ("orders/history", "wallet/withdrawals", "wallet/deposits"):
+            limit = FTX_PAGE_SIZE
+            if path == "orders/history":
+                limit = min(int(query.get("limit", limit)), FTX_MAX_PAGE_SIZE)
+            result = [
+                self.ftx_row(path, number)
+                for number in self.ftx_page(query, min(limit, config.max_rows))
+            ]
+        else:
+            return 404, {"success": False, "error": path}
+        return 200, {"success": True, "result": result}
+
+    def ftx_page(self, query: dict, limit: int) -> list:
+        # newest first; pairs of rows share a second so clients have to
+        # handle the inclusive end_time boundary
+        start_time = float(query.get("start_time") or 0)
+        end_time = float(query.get("end_time") or self.server.started)
+        numbers = []
+        for number in range(self.server.config.history_size):
+            row_time = self.server.started - number // 2
+            if row_time > end_time:
+                continue
+            if row_time < start_time or len(numbers) == limit:
+                break
+            numbers.append(number)
+        return numbers
+
+    def ftx_row(self, path: str, number: int) -> dict:
+        row_time = datetime.fromtimestamp(
+            self.server.started - number // 2, timezone.utc
+        ).isoformat()
+        if path == "orders/history":
+            return {
+                "id": number,
+                "market": "DOT/USD",
+                "side": "buy",
+                "status": "closed",
+                "avgFillPrice": float(DOT_PRICE),
+                "filledSize": float(ORDER_QTY),
+                "createdAt": row_time,
+            }
+        return {
+            "id": number,
+            "coin": "DOT",
+            "size": float(ORDER_QTY),
+            "status": "complete",
+            "address": "",
+            "time": row_time,
+        }
+
+    def respond(self, status: int, payload, retry: int = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if retry is not None:
+            self.send_header("Retry-After", str(retry))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class VenueServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: StandinConfig) -> None:
+        super().__init__(("127.0.0.1", config.port), VenueHandler)
+        self.config = config
+        self.connections = 0
+        self.started = int(time.time())
+        self.bucket = (
+            TokenBucket(rate=config.rate_limit, capacity=config.rate_limit)
+            if config.rate_limit
+            else None
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binance, Subscan and FTX stand-in")
+    add_standin_arguments(parser)
+    VenueServer(StandinConfig.from_arguments(parser.parse_args())).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+DATABASE = "postgres"
+USER = "benchmark"
+
+
+def _binary(name: str) -> str:
+    # PG_BIN points at e.g. /usr/lib/postgresql/14/bin when it is not on PATH
+    directory = os.environ.get("PG_BIN")
+    path = os.path.join(directory, name) if directory else shutil.which(name)
+    if not path or not os.path.exists(path):
+        raise RuntimeError(f"{name} not found, install Postgres or set PG_BIN")
+    return path
+
+
+@contextmanager
+def throwaway_postgres(port: int):
+    data_dir = tempfile.mkdtemp(prefix="hedge-benchmark-pg-")
+    try:
+        subprocess.run(
+            [_binary("initdb"), "-D", data_dir, "-U", USER, "--auth=trust"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        subprocess.run(
+            [
+                _binary("pg_ctl"),
+                "-D",
+                data_dir,
+                "-o",
+                f"-p {port} -k {data_dir} -c listen_addresses=127.0.0.1",
+                "-l",
+                os.path.join(data_dir, "server.log"),
+                "-w",
+                "start",
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            yield {
+                "host": "127.0.0.1",
+                "port": port,
+                "database": DATABASE,
+                "user": USER,
+                "password": "",
+            }
+        finally:
+            subprocess.run(
+                [_binary("pg_ctl"), "-D", data_dir, "-m", "immediate", "stop"],
+                stdout=subprocess.DEVNULL,
+            )
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
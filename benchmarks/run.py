@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from dataclasses import replace
+from datetime import datetime, timezone
+
+from benchmarks.config import StandinConfig
+from benchmarks.postgres import throwaway_postgres
+from benchmarks.substrate_server import DEFAULT_FIXTURE
+
+STARTUP_TIMEOUT_SECONDS = 30
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(
+                f"stand-in on port {port} exited with {process.returncode}"
+            )
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"stand-in on port {port} did not start")
+
+
+@contextmanager
+def standin(module: str, arguments: list, port: int):
+    process = subprocess.Popen([sys.executable, "-m", module] + arguments)
+    try:
+        wait_for_port(port, process)
+        yield process
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def configure_environment(ports: dict, database: dict, dot_address: str):
+    # must run before any common/ module is imported, since endpoints are
+    # read once at import time
+    environment = {
+        "HEDGE_CTRADER_HOST": "127.0.0.1",
+        "HEDGE_CTRADER_PORT": str(ports["ctrader"]),
+        "HEDGE_BINANCE_API_URL": f"http://127.0.0.1:{ports['binance']}/binance/api",
+        "HEDGE_BINANCE_STREAM_URL": "",
+        "HEDGE_SUBSCAN_URL": f"http://127.0.0.1:{ports['subscan']}/subscan/api/",
+        "PGPORT": str(database["port"]),
+    }
+    os.environ.update(environment)
+
+    from common.endpoints import BLOCK_OVERRIDE_PREFIX
+
+    blocks = {
+        "prefect-psql-host": database["host"],
+        "prefect-psql-database": database["database"],
+        "prefect-psql-user": database["user"],
+        "prefect-psql-password": database["password"],
+        "ctrader-account-id": "1",
+        "ctrader-symbol-id": "1",
+        "ctrader-client-id": "benchmark",
+        "ctrader-client-secret": "benchmark",
+        "ctrader-access-token": "benchmark",
+        "binance-api-key": "benchmark",
+        "binance-api-secret": "benchmark",
+        "dot-address": dot_address,
+        "dot-rpc-url": f"http://127.0.0.1:{ports['substrate']}",
+        "ftx-total-size": "0",
+        "ftx-avg-cost": "0",
+    }
+    for name, value in blocks.items():
+        os.environ[BLOCK_OVERRIDE_PREFIX + name.upper().replace("-", "_")] = value
+
+
+async def read_task_timings(since: datetime) -> dict:
+    from prefect.client import get_client
+    from prefect.orion.schemas.filters import TaskRunFilter, TaskRunFilterStartTime
+
+    async with get_client() as client:
+        task_runs = await client.read_task_runs(
+            task_run_filter=TaskRunFilter(
+                start_time=TaskRunFilterStartTime(after_=since)
+            )
+        )
+    timings = defaultdict(list)
+    for task_run in task_runs:
+        timings[task_run.task_key].append(task_run.total_run_time.total_seconds())
+    return timings
+
+
+def run_flows(runs: int, concurrent: bool) -> list:
+    from flows.flow_all_data import collect_all_data_flow
+    from flows.flow_db import migrate_db_flow
+
+    migrate_db_flow()
+
+    reports = []
+    for run in range(runs):
+        since = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        state = collect_all_data_flow(concurrent=concurrent, return_state=True)
+        elapsed = time.perf_counter() - started
+        timings = asyncio.run(read_task_timings(since))
+        reports.append((run, state.name, elapsed, timings))
+    return reports
+
+
+def print_report(reports: list):
+    for run, state, elapsed, timings in reports:
+        # the first run backfills every ledger, later runs are incremental
+        print(f"run {run}: {state} in {elapsed:.2f}s")
+        for task_key, durations in sorted(
+            timings.items(), key=lambda item: max(item[1]), reverse=True
+        ):
+            print(
+                f"  {task_key:<50} n={len(durations):<3} "
+                f"max={max(durations):8.3f}s total={sum(durations):8.3f}s"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run collect_all_data_flow against local venue stand-ins"
+    )
+    parser.add_argument("--substrate-fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--sequential", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--deals", type=int, default=10000)
+    parser.add_argument("--deal-days", type=int, default=90)
+    parser.add_argument("--deal-rate-limit", type=float, default=5)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--rewards", type=int, default=2000)
+    parser.add_argument("--http-rate-limit", type=float, default=0)
+    parser.add_argument("--max-rows", type=int, default=1000)
+    arguments = parser.parse_args()
+
+    ports = {
+        "ctrader": free_port(),
+        "binance": free_port(),
+        "subscan": free_port(),
+        "substrate": free_port(),
+        "postgres": free_port(),
+    }
+    base = StandinConfig(port=0, latency=arguments.latency, max_rows=arguments.max_rows)
+    ctrader = replace(
+        base,
+        port=ports["ctrader"],
+        rate_limit=arguments.deal_rate_limit,
+        history_size=arguments.deals,
+        history_days=arguments.deal_days,
+    )
+    # both REST venues are served by the same stand-in, one process each
+    binance = replace(
+        base,
+        port=ports["binance"],
+        rate_limit=arguments.http_rate_limit,
+        history_size=arguments.orders,
+    )
+    subscan = replace(
+        base,
+        port=ports["subscan"],
+        rate_limit=arguments.http_rate_limit,
+        history_size=arguments.rewards,
+    )
+    substrate = replace(base, port=ports["substrate"])
+
+    with ExitStack() as stack:
+        database = stack.enter_context(throwaway_postgres(ports["postgres"]))
+        stack.enter_context(
+            standin(
+                "benchmarks.ctrader_server", ctrader.to_arguments(), ports["ctrader"]
+            )
+        )
+        for config in (binance, subscan):
+            stack.enter_context(
+                standin("benchmarks.http_server", config.to_arguments(), config.port)
+            )
+        stack.enter_context(
+            standin(
+                "benchmarks.substrate_server",
+                ["serve"]
+                + substrate.to_arguments()
+                + ["--fixture", arguments.substrate_fixture],
+                ports["substrate"],
+            )
+        )
+        with open(arguments.substrate_fixture) as fixture:
+            dot_address = json.load(fixture)["address"]
+        configure_environment(ports, database, dot_address)
+        print_report(run_flows(arguments.runs, not arguments.sequential))
+
+
+if __name__ == "__main__":
+    main()
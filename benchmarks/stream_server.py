@@ -0,0 +1,169 @@
+import argparse
+import base64
+import hashlib
+import json
+import random
+import select
+import socketserver
+import struct
+import time
+from typing import List, Optional
+
+from benchmarks.config import StandinConfig, add_standin_arguments
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+DOT_PRICE = 6.1
+# seconds of trade history replayed to every new connection, so a feed has
+# a full averaging window straight away
+REPLAY_SECONDS = 600
+
+
+class StreamHandler(socketserver.BaseRequestHandler):
+    # just enough RFC 6455 for <url>/<symbol>@trade: the upgrade, unmasked
+    # text frames out, and close/ping frames in
+    def handle(self):
+        symbol = self.upgrade()
+        if symbol is None:
+            return
+        self.server.connections += 1
+
+        for message in self.server.messages(symbol):
+            self.send_frame(OPCODE_TEXT, json.dumps(message).encode())
+
+        interval = self.server.config.latency or 1.0
+        while True:
+            readable, _, _ = select.select([self.request], [], [], interval)
+            if readable:
+                if not self.read_frame():
+                    return
+            elif self.server.script is None:
+                self.send_frame(
+                    OPCODE_TEXT,
+                    json.dumps(self.server.live_trade(symbol)).encode(),
+                )
+
+    def upgrade(self) -> Optional[str]:
+        head = b""
+        while b"\r\n\r\n" not in head:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return None
+            head += chunk
+        lines = head.split(b"\r\n\r\n")[0].decode().split("\r\n")
+        headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        accept = base64.b64encode(
+            hashlib.sha1(
+                (headers["sec-websocket-key"] + WEBSOCKET_GUID).encode()
+            ).digest()
+        ).decode()
+        self.request.sendall(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode()
+        )
+        path = lines[0].split()[1]
+        return path.rsplit("/", 1)[-1].split("@")[0].upper()
+
+    def send_frame(self, opcode: int, payload: bytes):
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([len(payload)])
+        elif len(payload) < 65536:
+            header += bytes([126]) + struct.pack("!H", len(payload))
+        else:
+            header += bytes([127]) + struct.pack("!Q", len(payload))
+        self.request.sendall(header + payload)
+
+    def read_frame(self) -> bool:
+        # False once the client has closed
+        head = self.recv_exactly(2)
+        if head is None:
+            return False
+        opcode = head[0] & 0x0F
+        length = head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self.recv_exactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self.recv_exactly(8))[0]
+        mask = self.recv_exactly(4) if head[1] & 0x80 else bytes(4)
+        payload = bytes(
+            byte ^ mask[index % 4]
+            for index, byte in enumerate(self.recv_exactly(length) or b"")
+        )
+        if opcode == OPCODE_CLOSE:
+            self.send_frame(OPCODE_CLOSE, payload[:2])
+            return False
+        if opcode == OPCODE_PING:
+            self.send_frame(OPCODE_PONG, payload)
+        return True
+
+    def recv_exactly(self, size: int) -> Optional[bytes]:
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+
+class StreamServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, config: StandinConfig, script: List[dict] = None) -> None:
+        # script replaces the generated trades with exactly these messages,
+        # sent once per connection
+        self.config = config
+        self.script = script
+        self.connections = 0
+        self.trade_id = 0
+        super().__init__(("127.0.0.1", config.port), StreamHandler)
+
+    def messages(self, symbol: str) -> List[dict]:
+        if self.script is not None:
+            return self.script
+        now = time.time()
+        count = self.config.history_size
+        return [
+            self.trade(symbol, now - REPLAY_SECONDS * (count - index) / count)
+            for index in range(count)
+        ]
+
+    def live_trade(self, symbol: str) -> dict:
+        return self.trade(symbol, time.time())
+
+    def trade(self, symbol: str, timestamp: float) -> dict:
+        self.trade_id += 1
+        return {
+            "e": "trade",
+            "E": round(timestamp * 1000),
+            "s": symbol,
+            "t": self.trade_id,
+            "p": f"{DOT_PRICE + random.uniform(-0.05, 0.05):.4f}",
+            "q": f"{random.uniform(1, 100):.2f}",
+            "T": round(timestamp * 1000),
+            "m": random.random() < 0.5,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binance trade stream stand-in")
+    add_standin_arguments(parser)
+    StreamServer(StandinConfig.from_arguments(parser.parse_args())).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.config import StandinConfig, add_standin_arguments
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "substrate.json")
+
+SYNTHETIC_BLOCK_HASH = "0x" + "ab" * 32
+SYNTHETIC_FREE = 10000000000000  # 1000 DOT in planck
+SYNTHETIC_ACTIVE = 8000000000000
+METADATA_MAGIC = "0x6d657461"  # "meta"
+
+
+def _key(method: str, params) -> str:
+    return json.dumps([method, params], sort_keys=True)
+
+
+def record(url: str, address: str, path: str):
+    # replays the JSON-RPC traffic of one balance query against a real node,
+    # recorded once with:
+    #   python -m benchmarks.substrate_server record --url ... --address ...
+    from common.substrate import get_connection, query_multi
+
+    substrate = get_connection(url).substrate
+    calls = []
+    rpc_request = substrate.rpc_request
+
+    def recording_request(method, params, *args, **kwargs):
+        response = rpc_request(method, params, *args, **kwargs)
+        calls.append({"method": method, "params": params, "response": response})
+        return response
+
+    substrate.rpc_request = recording_request
+    query_multi(
+        url, [("System", "Account", [address]), ("Staking", "Ledger", [address])]
+    )
+
+    with open(path, "w") as fixture:
+        json.dump({"address": address, "calls": calls}, fixture)
+
+
+def synthesize(path: str):
+    # A V14 runtime with only the two storage items the collection reads, so
+    # the committed fixture lets the harness run without a node. Balances are
+    # fixed; record against a real node for production-sized metadata.
+    from scalecodec.base import RuntimeConfiguration
+    from scalecodec.type_registry import load_type_registry_preset
+    from substrateinterface.utils.hasher import blake2_128_concat, xxh128
+    from substrateinterface.utils.ss58 import ss58_encode
+
+    config = RuntimeConfiguration()
+    config.update_type_registry(load_type_registry_preset("metadata_types"))
+
+    public_key = hashlib.blake2b(b"hedge-benchmark", digest_size=32).digest()
+    address = ss58_encode(public_key, 0)
+
+    account_info = struct.pack("<4I", 1, 0, 1, 0) + b"".join(
+        value.to_bytes(16, "little") for value in (SYNTHETIC_FREE, 0, 0, 0)
+    )
+    compact = config.create_scale_object("Compact<u128>")
+    ledger = (
+        public_key
+        + bytes(compact.encode(SYNTHETIC_ACTIVE).data)
+        + bytes(compact.encode(SYNTHETIC_ACTIVE).data)
+        + b"\x00"  # no unlocking chunks
+        + b"\x00"  # no claimed rewards
+    )
+
+    def storage_key(pallet: str, function: str) -> str:
+        return (
+            "0x"
+            + xxh128(pallet.encode())
+            + xxh128(function.encode())
+            + blake2_128_concat(public_key)
+        )
+
+    metadata = config.create_scale_object("MetadataVersioned").encode(
+        [METADATA_MAGIC, {"V14": _synthetic_metadata()}]
+    )
+    results = {
+        "system_chain": ([], "Polkadot"),
+        "chain_getHead": ([], SYNTHETIC_BLOCK_HASH),
+        "chain_getHeader": (
+            [SYNTHETIC_BLOCK_HASH],
+            {
+                "parentHash": "0x" + "00" * 32,
+                "number": "0xbc614e",
+                "stateRoot": "0x" + "00" * 32,
+                "extrinsicsRoot": "0x" + "00" * 32,
+                "digest": {"logs": []},
+            },
+        ),
+        "chain_getRuntimeVersion": (
+            [SYNTHETIC_BLOCK_HASH],
+            {
+                "specName": "polkadot",
+                "implName": "parity-polkadot",
+                "authoringVersion": 0,
+                "specVersion": 9300,
+                "implVersion": 0,
+                "apis": [],
+                "transactionVersion": 15,
+                "stateVersion": 0,
+            },
+        ),
+        "state_getMetadata": ([SYNTHETIC_BLOCK_HASH], metadata.to_hex()),
+    }
+    keys = [storage_key("System", "Account"), storage_key("Staking", "Ledger")]
+    results["state_queryStorageAt"] = (
+        [keys, SYNTHETIC_BLOCK_HASH],
+        [
+            {
+                "block": SYNTHETIC_BLOCK_HASH,
+                "changes": [
+                    [keys[0], "0x" + account_info.hex()],
+                    [keys[1], "0x" + ledger.hex()],
+                ],
+            }
+        ],
+    )
+
+    calls = [
+        {
+            "method": method,
+            "params": params,
+            "response": {"jsonrpc": "2.0", "result": result, "id": index},
+        }
+        for index, (method, (params, result)) in enumerate(results.items())
+    ]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as fixture:
+        json.dump({"address": address, "calls": calls}, fixture, indent=1)
+
+
+def _synthetic_metadata() -> dict:
+    def registry_type(definition: dict, path: list = None) -> dict:
+        return {"path": path or [], "params": [], "def": definition, "docs": []}
+
+    def composite(path: list, fields: list) -> dict:
+        return registry_type(
+            {
+                "composite": {
+                    "fields": [
+                        {"name": name, "type": type_id, "typeName": None, "docs": []}
+                        for name, type_id in fields
+                    ]
+                }
+            },
+            path,
+        )
+
+    types = [
+        registry_type({"primitive": "u8"}),
+        registry_type({"array": {"len": 32, "type": 0}}),
+        composite(["sp_core", "crypto", "AccountId32"], [(None, 1)]),
+        registry_type({"primitive": "u32"}),
+        registry_type({"primitive": "u128"}),
+        composite(
+            ["pallet_balances", "AccountData"],
+            [("free", 4), ("reserved", 4), ("misc_frozen", 4), ("fee_frozen", 4)],
+        ),
+        composite(
+            ["frame_system", "AccountInfo"],
+            [
+                ("nonce", 3),
+                ("consumers", 3),
+                ("providers", 3),
+                ("sufficients", 3),
+                ("data", 5),
+            ],
+        ),
+        registry_type({"compact": {"type": 4}}),
+        registry_type({"compact": {"type": 3}}),
+        composite(["pallet_staking", "UnlockChunk"], [("value", 7), ("era", 8)]),
+        registry_type({"sequence": {"type": 9}}),
+        registry_type({"sequence": {"type": 3}}),
+        composite(
+            ["pallet_staking", "StakingLedger"],
+            [
+                ("stash", 2),
+                ("total", 7),
+                ("active", 7),
+                ("unlocking", 10),
+                ("claimed_rewards", 11),
+            ],
+        ),
+        registry_type({"tuple": []}),
+    ]
+
+    def pallet(name: str, index: int, entry: str, modifier: str, value: int, default):
+        return {
+            "name": name,
+            "storage": {
+                "prefix": name,
+                "entries": [
+                    {
+                        "name": entry,
+                        "modifier": modifier,
+                        "type": {
+                            "Map": {
+                                "hashers": ["Blake2_128Concat"],
+                                "key": 2,
+                                "value": value,
+                            }
+                        },
+                        "default": default,
+                        "documentation": [],
+                    }
+                ],
+            },
+            "calls": None,
+            "event": None,
+            "constants": [],
+            "error": None,
+            "index": index,
+        }
+
+    return {
+        "types": {
+            "types": [
+                {"id": type_id, "type": definition}
+                for type_id, definition in enumerate(types)
+            ]
+        },
+        "pallets": [
+            pallet("System", 0, "Account", "Default", 6, "0x" + "00" * 80),
+            pallet("Staking", 7, "Ledger", "Optional", 12, "0x00"),
+        ],
+        "extrinsic": {"ty": 13, "version": 4, "signed_extensions": []},
+        "runtime_type": 13,
+    }
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length))
+        if self.server.config.latency:
+            time.sleep(self.server.config.latency)
+
+        recorded = self.server.responses.get(_key(request["method"], request["params"]))
+        if recorded is None:
+            # the chain head moves between recording and replay, so calls
+            # pinned to another block fall back to the method alone
+            recorded = self.server.responses.get(request["method"])
+        if recorded is None:
+            recorded = {
+                "jsonrpc": "2.0",
+                "error": {"code": -32601, "message": request["method"]},
+            }
+
+        data = json.dumps(dict(recorded, id=request["id"])).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: StandinConfig, fixture_path: str) -> None:
+        super().__init__(("127.0.0.1", config.port), ReplayHandler)
+        self.config = config
+        with open(fixture_path) as fixture:
+            calls = json.load(fixture)["calls"]
+        self.responses = {}
+        for call in calls:
+            self.responses[_key(call["method"], call["params"])] = call["response"]
+            self.responses.setdefault(call["method"], call["response"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Substrate JSON-RPC stand-in")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record")
+    record_parser.add_argument("--url", required=True)
+    record_parser.add_argument("--address", required=True)
+    record_parser.add_argument("--fixture", required=True)
+
+    synthesize_parser = commands.add_parser("synthesize")
+    synthesize_parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+
+    serve_parser = commands.add_parser("serve")
+    add_standin_arguments(serve_parser)
+    serve_parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+
+    arguments = parser.parse_args()
+    if arguments.command == "record":
+        record(arguments.url, arguments.address, arguments.fixture)
+        return
+    if arguments.command == "synthesize":
+        synthesize(arguments.fixture)
+        return
+    config = StandinConfig.from_arguments(arguments)
+    ReplayServer(config, arguments.fixture).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import json
+import os
+from contextlib import contextmanager
+from dataclasses import fields
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from fsspec.implementations.local import LocalFileSystem
+from prefect.filesystems import RemoteFileSystem
+
+from common.schema import Table
+
+STORAGE_BLOCK = "storage-hedge-pnl"
+ARCHIVE_DIR = "archive"
+MANIFEST_NAME = "manifest.json"
+COMPRESSION = "zstd"
+# rows per fetch from Postgres, and so per Parquet row group
+BATCH_ROWS = 50000
+
+ARROW_TYPES = {
+    int: pa.int64(),
+    float: pa.float64(),
+    str: pa.string(),
+}
+
+
+def arrow_schema(table: Table) -> pa.Schema:
+    return pa.schema(
+        [(field.name, ARROW_TYPES[field.type]) for field in fields(table.record_type)]
+    )
+
+
+def partition_date(unix_time: int) -> str:
+    return datetime.fromtimestamp(unix_time, timezone.utc).strftime("%Y-%m-%d")
+
+
+class ParquetArchive:
+    # <root>/<table>/date=YYYY-MM-DD/part-<first unix_time>[-<n>].parquet,
+    # listed in <root>/manifest.json with the unix_time range of every file.
+    # Paths in the manifest are relative, so a synced local copy reads the
+    # same way.
+    def __init__(self, filesystem, root: str) -> None:
+        self.filesystem = filesystem
+        self.root = root.rstrip("/")
+        # files dropped from the manifest by reset, deleted once the manifest
+        # without them is written
+        self._orphaned: List[str] = []
+
+    @classmethod
+    def from_block(cls, name: str = STORAGE_BLOCK) -> "ParquetArchive":
+        block = RemoteFileSystem.load(name)
+        return cls(block.filesystem, f"{block.basepath.rstrip('/')}/{ARCHIVE_DIR}")
+
+    @classmethod
+    def local(cls, path: str) -> "ParquetArchive":
+        return cls(LocalFileSystem(auto_mkdir=True), os.path.abspath(path))
+
+    def read_manifest(self) -> dict:
+        path = f"{self.root}/{MANIFEST_NAME}"
+        if not self.filesystem.exists(path):
+            return {"tables": {}}
+        with self.filesystem.open(path, "r") as manifest_file:
+            return json.load(manifest_file)
+
+    def write_manifest(self, manifest: dict):
+        # Written last, after every file it lists, so a failed run leaves
+        # only unlisted files behind. An object store PUT replaces the key
+        # whole, so readers see the old manifest or the new one.
+        with self.filesystem.open(f"{self.root}/{MANIFEST_NAME}", "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+
+        listed = {
+            item["path"]
+            for entry in manifest["tables"].values()
+            for item in entry["files"]
+        }
+        orphaned = [path for path in self._orphaned if path not in listed]
+        if orphaned:
+            self.filesystem.rm([f"{self.root}/{path}" for path in orphaned])
+        self._orphaned = []
+
+    def watermark(self, manifest: dict, table: Table) -> Optional[int]:
+        return manifest["tables"].get(table.name, {}).get("watermark")
+
+    def reset(self, manifest: dict, table: Table):
+        # the old files stay readable until write_manifest replaces the
+        # manifest that lists them
+        entry = manifest["tables"].pop(table.name, None)
+        if entry:
+            self._orphaned.extend(item["path"] for item in entry["files"])
+
+    def append(
+        self, manifest: dict, table: Table, batches: Iterator[Sequence[tuple]]
+    ) -> List[dict]:
+        # batches arrive ordered by unix_time, so each date is one contiguous
+        # run of rows and is streamed into a single new file
+        entry = manifest["tables"].setdefault(
+            table.name, {"watermark": None, "files": []}
+        )
+        schema = arrow_schema(table)
+        time_index = schema.get_field_index("unix_time")
+
+        written = []
+        current = None
+        writer = None
+        sink = None
+        try:
+            for rows in batches:
+                start = 0
+                while start < len(rows):
+                    date = partition_date(rows[start][time_index])
+                    end = start
+                    while (
+                        end < len(rows)
+                        and partition_date(rows[end][time_index]) == date
+                    ):
+                        end += 1
+                    segment = rows[start:end]
+                    start = end
+
+                    if current is None or current["date"] != date:
+                        if writer is not None:
+                            writer.close()
+                            sink.close()
+                        first = segment[0][time_index]
+                        current = {
+                            "date": date,
+                            "path": self._new_path(table, date, first),
+                            "rows": 0,
+                            "min_unix_time": first,
+                            "max_unix_time": first,
+                        }
+                        written.append(current)
+                        sink = self.filesystem.open(
+                            f"{self.root}/{current['path']}", "wb"
+                        )
+                        writer = pq.ParquetWriter(sink, schema, compression=COMPRESSION)
+
+                    writer.write_batch(
+                        pa.RecordBatch.from_arrays(
+                            [
+                                pa.array(column, type=field.type)
+                                for column, field in zip(zip(*segment), schema)
+                            ],
+                            schema=schema,
+                        )
+                    )
+                    current["rows"] += len(segment)
+                    current["max_unix_time"] = segment[-1][time_index]
+        finally:
+            if writer is not None:
+                writer.close()
+                sink.close()
+
+        entry["files"].extend(written)
+        if written:
+            entry["watermark"] = written[-1]["max_unix_time"]
+        return written
+
+    def _new_path(self, table: Table, date: str, first: int) -> str:
+        # a reset archive is rewritten from the same first row, so new files
+        # must not overwrite the ones the current manifest still lists
+        path = f"{table.name}/date={date}/part-{first}.parquet"
+        version = 0
+        while path in self._orphaned:
+            version += 1
+            path = f"{table.name}/date={date}/part-{first}-{version}.parquet"
+        return path
+
+    def files(
+        self, table_name: str, start: Optional[int] = None, end: Optional[int] = None
+    ) -> List[dict]:
+        # manifest ranges prune files without opening them
+        entry = self.read_manifest()["tables"].get(table_name, {"files": []})
+        return [
+            item
+            for item in entry["files"]
+            if (start is None or item["max_unix_time"] >= start)
+            and (end is None or item["min_unix_time"] < end)
+        ]
+
+    def iter_batches(
+        self,
+        table_name: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+        batch_size: int = BATCH_ROWS,
+    ) -> Iterator[pa.RecordBatch]:
+        read_columns = columns
+        if columns is not None and "unix_time" not in columns:
+            read_columns = columns + ["unix_time"]
+
+        for item in self.files(table_name, start, end):
+            with self._parquet_file(item["path"]) as parquet_file:
+                for batch in parquet_file.iter_batches(
+                    batch_size=batch_size, columns=read_columns
+                ):
+                    batch = _within(batch, start, end)
+                    if columns is not None:
+                        batch = batch.select(columns)
+                    if batch.num_rows:
+                        yield batch
+
+    def read_table(
+        self,
+        table_name: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pa.Table:
+        batches = list(self.iter_batches(table_name, start, end, columns))
+        if not batches:
+            return pa.table({})
+        return pa.Table.from_batches(batches)
+
+    @contextmanager
+    def _parquet_file(self, path: str):
+        path = f"{self.root}/{path}"
+        if isinstance(self.filesystem, LocalFileSystem):
+            # local copies are memory-mapped rather than read into memory
+            yield pq.ParquetFile(path, memory_map=True)
+            return
+        with self.filesystem.open(path, "rb") as source:
+            yield pq.ParquetFile(source)
+
+
+def _within(
+    batch: pa.RecordBatch, start: Optional[int], end: Optional[int]
+) -> pa.RecordBatch:
+    unix_time = batch.column(batch.schema.get_field_index("unix_time"))
+    mask = None
+    if start is not None:
+        mask = pc.greater_equal(unix_time, start)
+    if end is not None:
+        before = pc.less(unix_time, end)
+        mask = before if mask is None else pc.and_(mask, before)
+    if mask is None:
+        return batch
+    return batch.filter(mask)
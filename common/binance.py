@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable
+from urllib.parse import urlparse
+
+from binance.client import Client
+
+from common.blocks import load_secret
+from common.endpoints import BINANCE_API_URL
+from common.metrics import metrics
+from common.store import get_price_quotes
+
+PRICE_TTL_SECONDS = 30
+# binance_price_feed is only read where the feed deployment runs; elsewhere
+# every miss would query an empty table before going to REST
+USE_PRICE_FEED = os.environ.get("HEDGE_USE_PRICE_FEED") == "1"
+
+_client = None
+_client_lock = threading.Lock()
+
+_oracle = None
+_oracle_lock = threading.Lock()
+
+
+class InstrumentedClient(Client):
+    def _request(
+        self, method, uri: str, signed: bool, force_params: bool = False, **kwargs
+    ):
+        operation = f"{method.upper()} {urlparse(uri).path}"
+        with metrics.track("binance", operation) as call:
+            result = super()._request(method, uri, signed, force_params, **kwargs)
+            call.bytes_sent = len(self.response.request.body or b"")
+            call.bytes_received = len(self.response.content)
+            return result
+
+
+def get_client() -> Client:
+    # Client() pings the API on construction, so one is shared per process.
+    global _client
+    with _client_lock:
+        if _client is None:
+            client_class = InstrumentedClient
+            if BINANCE_API_URL:
+                # Client formats API_URL with the endpoint and tld, so an
+                # override has to be in place before construction pings it
+                client_class = type(
+                    "Client", (InstrumentedClient,), {"API_URL": BINANCE_API_URL}
+                )
+            _client = client_class(
+                api_key=load_secret("binance-api-key"),
+                api_secret=load_secret("binance-api-secret"),
+            )
+    return _client
+
+
+class PriceOracle:
+    def __init__(
+        self,
+        ttl: float = PRICE_TTL_SECONDS,
+        client: Client = None,
+        use_feed: bool = USE_PRICE_FEED,
+    ) -> None:
+        self.ttl = ttl
+        self._client = client
+        self.use_feed = use_feed
+        # (kind, symbol) -> (price, fetched at)
+        self._prices: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> Client:
+        if self._client is None:
+            self._client = get_client()
+        return self._client
+
+    def last_price(self, symbol: str) -> float:
+        return self.last_prices([symbol])[symbol]
+
+    def avg_price(self, symbol: str) -> float:
+        return self.avg_prices([symbol])[symbol]
+
+    def last_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        return self._prices_for("last", symbols, self._fetch_last_prices)
+
+    def avg_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        return self._prices_for("avg", symbols, self._fetch_avg_prices)
+
+    def invalidate(self, symbols: Iterable[str] = None):
+        with self._lock:
+            if symbols is None:
+                self._prices.clear()
+                return
+            symbols = set(symbols)
+            for key in list(self._prices):
+                if key[1] in symbols:
+                    del self._prices[key]
+
+    def _prices_for(self, kind: str, symbols: Iterable[str], fetch) -> Dict[str, float]:
+        symbols = list(dict.fromkeys(symbols))
+        # held across the fetch so concurrent callers wait for one request
+        # rather than each hitting the API for the same symbols
+        with self._lock:
+            now = time.monotonic()
+            prices = {}
+            missing = []
+            for symbol in symbols:
+                cached = self._prices.get((kind, symbol))
+                if cached is not None and now - cached[1] < self.ttl:
+                    prices[symbol] = cached[0]
+                else:
+                    missing.append(symbol)
+
+            if missing:
+                fetched = self._from_feed(kind, missing)
+                requested = [symbol for symbol in missing if symbol not in fetched]
+                if requested:
+                    fetched.update(fetch(requested))
+                fetched_at = time.monotonic()
+                for symbol, price in fetched.items():
+                    self._prices[(kind, symbol)] = (price, fetched_at)
+                prices.update(fetched)
+
+        return prices
+
+    def _from_feed(self, kind: str, symbols: list) -> Dict[str, float]:
+        # quotes published by the price feed deployment answer without a
+        # request, as long as they are at least as fresh as the cache would be
+        if not self.use_feed:
+            return {}
+        quotes = get_price_quotes(symbols, self.ttl)
+        if kind == "avg":
+            return {
+                symbol: quote.vwap
+                for symbol, quote in quotes.items()
+                if quote.vwap is not None
+            }
+        return {symbol: quote.last_price for symbol, quote in quotes.items()}
+
+    def _fetch_last_prices(self, symbols: list) -> Dict[str, float]:
+        tickers = self.client.get_symbol_ticker(
+            symbols=json.dumps(symbols, separators=(",", ":"))
+        )
+        return {ticker["symbol"]: float(ticker["price"]) for ticker in tickers}
+
+    def _fetch_avg_prices(self, symbols: list) -> Dict[str, float]:
+        # Binance has no multi-symbol avgPrice endpoint, so only the symbols
+        # missing from the cache are requested, one call each.
+        return {
+            symbol: float(self.client.get_avg_price(symbol=symbol)["price"])
+            for symbol in symbols
+        }
+
+
+def get_price_oracle() -> PriceOracle:
+    global _oracle
+    with _oracle_lock:
+        if _oracle is None:
+            _oracle = PriceOracle()
+    return _oracle
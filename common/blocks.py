@@ -0,0 +1,62 @@
+import threading
+import time
+
+from prefect.blocks.system import Secret, String
+
+from common.endpoints import block_override
+from common.metrics import metrics
+
+BLOCK_TTL_SECONDS = 300
+
+# (block type, name) -> (value, loaded at)
+_values = {}
+_values_lock = threading.Lock()
+
+
+def load_secret(name: str) -> str:
+    return _load("secret", name, lambda: Secret.load(name).get())
+
+
+def load_string(name: str) -> str:
+    return _load("string", name, lambda: String.load(name).value)
+
+
+def save_secret(name: str, value: str):
+    Secret(value=value).save(name, overwrite=True)
+    _store("secret", name, value)
+
+
+def save_string(name: str, value):
+    String(value=value).save(name, overwrite=True)
+    _store("string", name, str(value))
+
+
+def invalidate(name: str = None):
+    with _values_lock:
+        if name is None:
+            _values.clear()
+            return
+        for key in [key for key in _values if key[1] == name]:
+            del _values[key]
+
+
+def _load(kind: str, name: str, loader) -> str:
+    override = block_override(name)
+    if override is not None:
+        return override
+
+    with _values_lock:
+        cached = _values.get((kind, name))
+    if cached is not None and time.monotonic() - cached[1] < BLOCK_TTL_SECONDS:
+        return cached[0]
+
+    with metrics.track("prefect_block", kind) as call:
+        value = loader()
+        call.bytes_received = len(str(value))
+    _store(kind, name, value)
+    return value
+
+
+def _store(kind: str, name: str, value: str):
+    with _values_lock:
+        _values[(kind, name)] = (value, time.monotonic())
@@ -0,0 +1,420 @@
+import atexit
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+from ctrader_open_api import Client, EndPoints, Protobuf, TcpProtocol
+from ctrader_open_api.messages.OpenApiModelMessages_pb2 import ProtoOAPayloadType
+from ctrader_open_api.messages.OpenApiMessages_pb2 import (
+    ProtoOAAccountAuthReq,
+    ProtoOAApplicationAuthReq,
+    ProtoOADealListReq,
+    ProtoOADealListRes,
+    ProtoOAErrorRes,
+    ProtoOAReconcileReq,
+    ProtoOAReconcileRes,
+    ProtoOARefreshTokenReq,
+    ProtoOARefreshTokenRes,
+    ProtoOATraderReq,
+    ProtoOATraderRes,
+)
+from twisted.internet import defer, reactor, threads
+from twisted.python.failure import Failure
+
+from common.blocks import load_secret
+from common.deal_cache import DealCache, align_windows, get_deal_cache
+from common.endpoints import CTRADER_HOST, CTRADER_PORT
+from common.metrics import metrics
+from common.rate_limit import TokenBucket
+
+# Open API allows 5 historical data requests (deal lists, trendbars, ticks)
+# per second per connection, and a deal list may span at most one week.
+HISTORICAL_REQUESTS_PER_SECOND = 5
+DEAL_LIST_MAX_WINDOW = 604800000
+
+RATE_LIMIT_ERROR = "REQUEST_FREQUENCY_EXCEEDED"
+
+_reactor_thread = None
+_reactor_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class CTraderError(Exception):
+    pass
+
+
+class DealListScheduler:
+    def __init__(
+        self,
+        client,
+        account_id: int,
+        bucket: TokenBucket = None,
+        max_in_flight: int = HISTORICAL_REQUESTS_PER_SECOND,
+        response_timeout: int = 30,
+        cache: Optional[DealCache] = None,
+    ) -> None:
+        self.client = client
+        self.account_id = account_id
+        self.cache = cache
+        self.bucket = bucket or TokenBucket(
+            rate=HISTORICAL_REQUESTS_PER_SECOND,
+            capacity=HISTORICAL_REQUESTS_PER_SECOND,
+        )
+        self.max_in_flight = max_in_flight
+        self.response_timeout = response_timeout
+
+    def fetch(self, start: int, end: int) -> defer.Deferred:
+        walk = _DealListWalk(self, start, end)
+        walk.pump()
+        return walk.done
+
+
+class _DealListWalk:
+    def __init__(self, scheduler: DealListScheduler, start: int, end: int) -> None:
+        self.scheduler = scheduler
+        self.start = start
+        self.end = end
+        # (window, cached window it belongs to or None)
+        self.pending = deque()
+        # cached window -> [requests outstanding, deals so far]
+        self.roots = {}
+        self.in_flight = 0
+        self.deals = []
+        self.done = defer.Deferred()
+
+        cache = scheduler.cache
+        if cache is None:
+            for window in _split_windows(start, end, DEAL_LIST_MAX_WINDOW):
+                self.pending.append((window, None))
+            return
+
+        # closed windows are served from the cache, only the open trailing
+        # ones (and misses) go to the network
+        now_ms = round(time.time() * 1000)
+        for window in align_windows(start, end, DEAL_LIST_MAX_WINDOW):
+            if not cache.is_closed(window, now_ms):
+                window = (max(window[0], start), min(window[1], end))
+                self.pending.append((window, None))
+                continue
+            cached = cache.get(scheduler.account_id, window)
+            if cached is not None and not cache.should_verify():
+                self.deals.extend(cached.deal)
+                continue
+            self.roots[window] = [1, []]
+            self.pending.append((window, window))
+
+    def pump(self):
+        if self.done.called:
+            return
+        while self.pending and self.in_flight < self.scheduler.max_in_flight:
+            item = self.pending.popleft()
+            self.in_flight += 1
+            delay = self.scheduler.bucket.reserve()
+            reactor.callLater(delay, self.send, item)
+        if not self.pending and self.in_flight == 0:
+            # cached windows are aligned to the grid and overhang the range
+            self.done.callback(
+                [
+                    deal
+                    for deal in self.deals
+                    if self.start <= deal.executionTimestamp <= self.end
+                ]
+            )
+
+    def send(self, item: tuple):
+        window = item[0]
+        request = ProtoOADealListReq()
+        request.ctidTraderAccountId = self.scheduler.account_id
+        request.fromTimestamp, request.toTimestamp = window
+        deferred = _send_timed(
+            self.scheduler.client,
+            request,
+            clientMsgId=f"deals-{window[0]}-{window[1]}",
+            responseTimeoutInSeconds=self.scheduler.response_timeout,
+        )
+        deferred.addCallbacks(
+            self.on_response,
+            self.on_failure,
+            callbackArgs=(item,),
+        )
+
+    def on_response(self, message, item: tuple):
+        window, root = item
+        self.in_flight -= 1
+        if message.payloadType == ProtoOAErrorRes().payloadType:
+            error = Protobuf.extract(message)
+            if error.errorCode != RATE_LIMIT_ERROR:
+                return self.fail(
+                    Exception(f"cTrader - {error.errorCode}: {error.description}")
+                )
+            self.pending.appendleft(item)
+        elif message.payloadType == ProtoOADealListRes().payloadType:
+            deals = Protobuf.extract(message)
+            if deals.hasMore and window[1] > window[0]:
+                # the response was truncated, ask again in two halves
+                middle = (window[0] + window[1]) // 2
+                self.pending.appendleft(((middle + 1, window[1]), root))
+                self.pending.appendleft(((window[0], middle), root))
+                if root is not None:
+                    self.roots[root][0] += 1
+            else:
+                self.deals.extend(deals.deal)
+                if root is not None:
+                    self.collect(root, deals.deal)
+        self.pump()
+
+    def collect(self, root: Tuple[int, int], deals):
+        state = self.roots[root]
+        state[0] -= 1
+        state[1].extend(deals)
+        if state[0] == 0:
+            del self.roots[root]
+            self.scheduler.cache.put(self.scheduler.account_id, root, state[1])
+
+    def on_failure(self, failure):
+        self.in_flight -= 1
+        self.fail(failure)
+
+    def fail(self, error):
+        if not self.done.called:
+            self.pending.clear()
+            self.done.errback(error)
+
+
+def _split_windows(start: int, end: int, step: int) -> List[Tuple[int, int]]:
+    # both bounds are inclusive, so consecutive windows must not share a
+    # millisecond
+    windows = []
+    while start <= end:
+        window_end = min(start + step - 1, end)
+        windows.append((start, window_end))
+        start = window_end + 1
+    return windows
+
+
+class CTraderSession:
+    # TcpProtocol already answers server heartbeats and sends its own after
+    # 20s of silence, which keeps the connection inside the 30s idle limit.
+    def __init__(
+        self,
+        account_id: int,
+        client_id: str,
+        client_secret: str,
+        access_token: str,
+        host_type: str = "live",
+        request_timeout: int = 30,
+        auth_timeout: int = 30,
+        host: str = None,
+        port: int = EndPoints.PROTOBUF_PORT,
+    ) -> None:
+        self.account_id = account_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.access_token = access_token
+        self.host = host or (
+            EndPoints.PROTOBUF_LIVE_HOST
+            if host_type.lower() == "live"
+            else EndPoints.PROTOBUF_DEMO_HOST
+        )
+        self.port = port
+        self.request_timeout = request_timeout
+        self.auth_timeout = auth_timeout
+        self._client = None
+        self._scheduler = None
+        self._authorized = False
+        self._auth_error = None
+        self._auth_waiters = []
+
+    @property
+    def failed(self) -> bool:
+        return self._auth_error is not None
+
+    def start(self):
+        _ensure_reactor_running()
+        reactor.callFromThread(self._start_client)
+
+    def stop(self):
+        reactor.callFromThread(self._stop_client)
+
+    def reconcile(self) -> ProtoOAReconcileRes:
+        request = ProtoOAReconcileReq()
+        request.ctidTraderAccountId = self.account_id
+        return self._blocking_request(request)
+
+    def deals(self, from_timestamp: int, to_timestamp: int) -> list:
+        return threads.blockingCallFromThread(
+            reactor,
+            lambda: self._when_authorized().addCallback(
+                lambda _: self._scheduler.fetch(from_timestamp, to_timestamp)
+            ),
+        )
+
+    def trader(self) -> ProtoOATraderRes:
+        request = ProtoOATraderReq()
+        request.ctidTraderAccountId = self.account_id
+        return self._blocking_request(request)
+
+    def refresh_token(self, refresh_token: str) -> ProtoOARefreshTokenRes:
+        request = ProtoOARefreshTokenReq()
+        request.refreshToken = refresh_token
+        response = self._blocking_request(request)
+        # used when the account is re-authorised after a reconnect
+        self.access_token = response.accessToken
+        return response
+
+    def _blocking_request(self, request):
+        return threads.blockingCallFromThread(
+            reactor,
+            lambda: self._when_authorized().addCallback(lambda _: self._send(request)),
+        )
+
+    def _start_client(self):
+        self._client = Client(self.host, self.port, TcpProtocol)
+        self._client.setConnectedCallback(self._on_connected)
+        self._client.setDisconnectedCallback(self._on_disconnected)
+        self._scheduler = DealListScheduler(
+            self._client,
+            self.account_id,
+            response_timeout=self.request_timeout,
+            cache=get_deal_cache(),
+        )
+        self._client.startService()
+
+    def _stop_client(self):
+        if self._client is not None and self._client.running:
+            self._client.stopService()
+
+    def _on_connected(self, _):
+        request = ProtoOAApplicationAuthReq()
+        request.clientId = self.client_id
+        request.clientSecret = self.client_secret
+        deferred = self._send(request)
+        deferred.addCallback(lambda _: self._send(self._account_auth_request()))
+        deferred.addCallbacks(self._on_authorized, self._on_auth_failed)
+
+    def _on_disconnected(self, _, reason):
+        # ClientService reconnects on its own; requests wait for re-auth
+        self._authorized = False
+
+    def _account_auth_request(self) -> ProtoOAAccountAuthReq:
+        request = ProtoOAAccountAuthReq()
+        request.ctidTraderAccountId = self.account_id
+        request.accessToken = self.access_token
+        return request
+
+    def _on_authorized(self, _):
+        self._authorized = True
+        self._auth_error = None
+        waiters, self._auth_waiters = self._auth_waiters, []
+        for waiter in waiters:
+            if not waiter.called:
+                waiter.callback(None)
+
+    def _on_auth_failed(self, failure):
+        # the credentials will not get better on a reconnect, so stop the
+        # client and let get_session() replace this session
+        self._auth_error = failure.value
+        self._stop_client()
+        waiters, self._auth_waiters = self._auth_waiters, []
+        for waiter in waiters:
+            if not waiter.called:
+                waiter.errback(failure)
+
+    def _on_auth_timeout(self, result, timeout):
+        # never connected, or the auth requests went unanswered
+        error = CTraderError(f"not authorized within {timeout}s")
+        if not self._authorized:
+            self._auth_error = error
+        return Failure(error)
+
+    def _when_authorized(self) -> defer.Deferred:
+        if self._auth_error is not None:
+            return defer.fail(self._auth_error)
+        if self._authorized:
+            return defer.succeed(None)
+        waiter = defer.Deferred()
+        waiter.addTimeout(
+            self.auth_timeout, reactor, onTimeoutCancel=self._on_auth_timeout
+        )
+        self._auth_waiters.append(waiter)
+        return waiter
+
+    def _send(self, request) -> defer.Deferred:
+        deferred = _send_timed(
+            self._client, request, responseTimeoutInSeconds=self.request_timeout
+        )
+        deferred.addCallback(_extract_response)
+        return deferred
+
+
+def get_session() -> CTraderSession:
+    global _session
+    with _session_lock:
+        if _session is not None and _session.failed:
+            _session.stop()
+            _session = None
+        if _session is None:
+            _session = CTraderSession(
+                account_id=int(load_secret("ctrader-account-id")),
+                client_id=load_secret("ctrader-client-id"),
+                client_secret=load_secret("ctrader-client-secret"),
+                access_token=load_secret("ctrader-access-token"),
+                host=CTRADER_HOST,
+                port=int(CTRADER_PORT or EndPoints.PROTOBUF_PORT),
+            )
+            _session.start()
+    return _session
+
+
+def _send_timed(client, request, **kwargs) -> defer.Deferred:
+    # request/response pairs are keyed by the request payload type, e.g.
+    # PROTO_OA_DEAL_LIST_REQ
+    operation = ProtoOAPayloadType.Name(request.payloadType)
+    started = time.perf_counter()
+    deferred = client.send(request, **kwargs)
+
+    def record(result):
+        failed = isinstance(result, Failure)
+        metrics.record(
+            "ctrader",
+            operation,
+            time.perf_counter() - started,
+            error=failed or result.payloadType == ProtoOAErrorRes().payloadType,
+            bytes_sent=request.ByteSize(),
+            bytes_received=0 if failed else result.ByteSize(),
+        )
+        return result
+
+    deferred.addBoth(record)
+    return deferred
+
+
+def _extract_response(message):
+    response = Protobuf.extract(message)
+    if message.payloadType == ProtoOAErrorRes().payloadType:
+        raise CTraderError(f"{response.errorCode}: {response.description}")
+    return response
+
+
+def _ensure_reactor_running():
+    # A Twisted reactor can only be run once per process, so it lives in a
+    # daemon thread for the lifetime of the worker.
+    global _reactor_thread
+    with _reactor_lock:
+        if _reactor_thread is None:
+            _reactor_thread = threading.Thread(
+                target=reactor.run,
+                kwargs={"installSignalHandlers": False},
+                name="ctrader-reactor",
+                daemon=True,
+            )
+            _reactor_thread.start()
+
+
+@atexit.register
+def _stop_reactor():
+    if _reactor_thread is not None and reactor.running:
+        reactor.callFromThread(reactor.stop)
@@ -0,0 +1,91 @@
+import atexit
+import threading
+from contextlib import contextmanager
+
+from psycopg2 import sql
+from psycopg2.extensions import cursor
+from psycopg2.pool import ThreadedConnectionPool
+
+from common.blocks import load_secret
+from common.metrics import metrics
+
+MIN_CONNECTIONS = 1
+MAX_CONNECTIONS = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises instead of blocking when exhausted, so callers
+# queue up on this semaphore until a connection is handed back.
+_pool_slots = threading.BoundedSemaphore(MAX_CONNECTIONS)
+
+
+class InstrumentedCursor(cursor):
+    # execute_values and the store helpers all funnel through these
+    def execute(self, query, vars=None):
+        with metrics.track("postgres", _operation(query)) as call:
+            try:
+                return super().execute(query, vars)
+            finally:
+                call.bytes_sent = len(self.query or b"")
+
+    def copy_expert(self, query, file, size=8192):
+        with metrics.track("postgres", "COPY") as call:
+            started = file.tell()
+            try:
+                return super().copy_expert(query, file, size)
+            finally:
+                call.bytes_sent = file.tell() - started
+
+
+def _operation(query) -> str:
+    # composed statements start with a plain SQL fragment
+    while isinstance(query, sql.Composed):
+        query = query.seq[0] if query.seq else ""
+    if isinstance(query, sql.SQL):
+        query = query.string
+    if isinstance(query, bytes):
+        query = query.decode(errors="replace")
+    words = query.split(None, 1)
+    return words[0].upper() if words else ""
+
+
+def get_pool() -> ThreadedConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    MIN_CONNECTIONS,
+                    MAX_CONNECTIONS,
+                    host=load_secret("prefect-psql-host"),
+                    database=load_secret("prefect-psql-database"),
+                    user=load_secret("prefect-psql-user"),
+                    password=load_secret("prefect-psql-password"),
+                    cursor_factory=InstrumentedCursor,
+                )
+    return _pool
+
+
+@contextmanager
+def connection():
+    pool = get_pool()
+    with _pool_slots:
+        conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
+
+
+@atexit.register
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
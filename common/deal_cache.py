@@ -0,0 +1,213 @@
+import hashlib
+import mmap
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOADealListRes
+from google.protobuf.message import DecodeError
+
+from common.metrics import metrics
+
+# an empty HEDGE_DEAL_CACHE_DIR turns the cache off
+DEAL_CACHE_DIR = os.environ.get(
+    "HEDGE_DEAL_CACHE_DIR", os.path.expanduser("~/.cache/hedge-dataflow/deals")
+)
+DEAL_CACHE_MAX_BYTES = int(os.environ.get("HEDGE_DEAL_CACHE_MAX_MB", 256)) * 2**20
+# share of cache hits that are fetched again and compared with the cache
+DEAL_CACHE_VERIFY_RATE = float(os.environ.get("HEDGE_DEAL_CACHE_VERIFY_RATE", 0.01))
+# deals are only final once their window ended this long ago
+CLOSED_AFTER_MS = 86400000
+
+Window = Tuple[int, int]
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class DealCache:
+    # Deal list responses live under objects/ named by the SHA-256 of their
+    # serialized bytes, so identical windows (most often empty ones) share a
+    # file. index.sqlite maps (account, from, to) to a digest and tracks
+    # last use for LRU eviction.
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = DEAL_CACHE_MAX_BYTES,
+        verify_rate: float = DEAL_CACHE_VERIFY_RATE,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.verify_rate = verify_rate
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"),
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS deal_windows (
+                account_id INTEGER NOT NULL,
+                from_timestamp INTEGER NOT NULL,
+                to_timestamp INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (account_id, from_timestamp, to_timestamp)
+            )
+            """
+        )
+        self._lock = threading.Lock()
+
+    def is_closed(self, window: Window, now_ms: Optional[int] = None) -> bool:
+        if now_ms is None:
+            now_ms = round(time.time() * 1000)
+        return window[1] < now_ms - CLOSED_AFTER_MS
+
+    def should_verify(self) -> bool:
+        return random.random() < self.verify_rate
+
+    def get(self, account_id: int, window: Window) -> Optional[ProtoOADealListRes]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest FROM deal_windows WHERE account_id = ? "
+                "AND from_timestamp = ? AND to_timestamp = ?",
+                (account_id, *window),
+            ).fetchone()
+            if row is None:
+                metrics.record("deal_cache", "miss", 0)
+                return None
+            self._db.execute(
+                "UPDATE deal_windows SET last_used = ? WHERE account_id = ? "
+                "AND from_timestamp = ? AND to_timestamp = ?",
+                (time.time(), account_id, *window),
+            )
+
+        started = time.perf_counter()
+        try:
+            response = self._read(row[0])
+        except (OSError, ValueError):
+            # evicted by another process, or unreadable; refetch it
+            self._forget(account_id, window)
+            metrics.record("deal_cache", "miss", 0)
+            return None
+        metrics.record(
+            "deal_cache",
+            "hit",
+            time.perf_counter() - started,
+            bytes_received=response.ByteSize(),
+        )
+        return response
+
+    def put(self, account_id: int, window: Window, deals: list) -> str:
+        response = ProtoOADealListRes()
+        response.ctidTraderAccountId = account_id
+        response.hasMore = False
+        # sorted, so the same deals always serialize to the same digest
+        response.deal.extend(
+            sorted(deals, key=lambda deal: (deal.executionTimestamp, deal.dealId))
+        )
+        data = response.SerializeToString(deterministic=True)
+        digest = hashlib.sha256(data).hexdigest()
+
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as blob:
+                blob.write(data)
+            os.replace(temporary, path)
+
+        with self._lock:
+            previous = self._db.execute(
+                "SELECT digest FROM deal_windows WHERE account_id = ? "
+                "AND from_timestamp = ? AND to_timestamp = ?",
+                (account_id, *window),
+            ).fetchone()
+            if previous is not None and previous[0] != digest:
+                # a closed window changed upstream; the fresh copy replaces it
+                metrics.record("deal_cache", "drift", 0, error=True)
+            self._db.execute(
+                "INSERT OR REPLACE INTO deal_windows VALUES (?, ?, ?, ?, ?, ?)",
+                (account_id, *window, digest, len(data), time.time()),
+            )
+            self._evict()
+        return digest
+
+    def _read(self, digest: str) -> ProtoOADealListRes:
+        with open(self._path(digest), "rb") as blob:
+            with mmap.mmap(blob.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    try:
+                        return ProtoOADealListRes.FromString(view)
+                    except DecodeError:
+                        pass
+        # raised outside the mapping, since the traceback would pin the view
+        # and the mmap could not be closed
+        raise ValueError(f"unreadable deal list {digest}")
+
+    def _forget(self, account_id: int, window: Window):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM deal_windows WHERE account_id = ? "
+                "AND from_timestamp = ? AND to_timestamp = ?",
+                (account_id, *window),
+            )
+
+    def _evict(self):
+        # sizes are counted once per blob, since windows can share one
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM "
+            "(SELECT DISTINCT digest, size FROM deal_windows)"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for account_id, from_timestamp, to_timestamp, digest, size in self._db.execute(
+            "SELECT account_id, from_timestamp, to_timestamp, digest, size "
+            "FROM deal_windows ORDER BY last_used"
+        ).fetchall():
+            self._db.execute(
+                "DELETE FROM deal_windows WHERE account_id = ? "
+                "AND from_timestamp = ? AND to_timestamp = ?",
+                (account_id, from_timestamp, to_timestamp),
+            )
+            shared = self._db.execute(
+                "SELECT 1 FROM deal_windows WHERE digest = ? LIMIT 1", (digest,)
+            ).fetchone()
+            if shared is None:
+                try:
+                    os.remove(self._path(digest))
+                except FileNotFoundError:
+                    pass
+                total -= size
+            if total <= self.max_bytes:
+                return
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+
+def align_windows(start: int, end: int, step: int) -> List[Window]:
+    # windows on a fixed grid from the epoch, so every run asks for (and
+    # caches) the same keys wherever its range happens to start
+    windows = []
+    window_start = start - start % step
+    while window_start <= end:
+        windows.append((window_start, window_start + step - 1))
+        window_start += step
+    return windows
+
+
+def get_deal_cache() -> Optional[DealCache]:
+    global _cache
+    if not DEAL_CACHE_DIR:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = DealCache(DEAL_CACHE_DIR)
+    return _cache
@@ -0,0 +1,119 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from common.models import DerivedSnapshot, LastSnapshot, RawSnapshot
+from common.schema import DERIVED_TABLE, RAW_TABLE
+
+Columns = Dict[str, np.ndarray]
+
+
+def rows_to_columns(rows: Sequence[Sequence], columns: List[str]) -> Columns:
+    # NULLs come through as NaN, which then propagate into every derived value
+    # that depends on them instead of failing the whole batch
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(columns))
+    data = {column: values[:, i] for i, column in enumerate(columns)}
+    data["unix_time"] = data["unix_time"].astype(np.int64)
+    return data
+
+
+def snapshots_to_columns(snapshots: Sequence, columns: List[str]) -> Columns:
+    rows = [[getattr(snapshot, column) for column in columns] for snapshot in snapshots]
+    return rows_to_columns(rows, columns)
+
+
+def columns_to_rows(data: Columns, columns: List[str]) -> List[tuple]:
+    return list(zip(*(data[column].tolist() for column in columns)))
+
+
+def _diff(values: np.ndarray, seed: Optional[float]) -> np.ndarray:
+    # the first row is compared against the stored previous snapshot, or
+    # against itself (a zero diff) at the start of history
+    return np.diff(values, prepend=values[:1] if seed is None else seed)
+
+
+def compute_derived(raw: Columns, prev: Optional[LastSnapshot] = None) -> Columns:
+    prev = prev or LastSnapshot()
+
+    ftx_dot_balance = raw["ftx_dot_balance"]
+    ftx_cost_size = raw["ftx_cost_size"]
+    ftx_settled_size = raw["ftx_settled_size"]
+    binance_cost_size = raw["binance_cost_size"]
+    dot_market_price = raw["dot_market_price"]
+    dot_total_balance = raw["dot_total_balance"]
+    pps_open_margin = raw["pps_open_margin"]
+    pps_open_dot_size = raw["pps_open_dot_size"]
+
+    pps_open_pnl = (raw["pps_open_dot_avg_price"] - dot_market_price) * np.abs(
+        pps_open_dot_size
+    )
+
+    pps_open_liquid_value = pps_open_margin + pps_open_pnl + raw["pps_open_swap"]
+
+    pps_total_swap = raw["pps_open_swap"] + raw["pps_closed_swap"]
+
+    dot_liquid_value = (
+        dot_total_balance * dot_market_price + ftx_dot_balance * dot_market_price
+    )
+
+    total_liquid_value = pps_open_liquid_value + dot_liquid_value
+
+    total_cost = (
+        ftx_cost_size * raw["ftx_cost_avg_price"]
+        + binance_cost_size * raw["binance_avg_price"]
+        + pps_open_margin
+    )
+
+    total_settled = ftx_settled_size * raw["ftx_settled_avg_price"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        staked_ratio = (
+            raw["dot_staked_balance"] / (dot_total_balance + ftx_dot_balance) * 100
+        )
+        margin_ratio = np.where(
+            pps_open_margin == 0,
+            1,
+            (raw["pps_acct_balance"] + pps_open_pnl) / pps_open_margin * 100,
+        )
+
+    dot_net_position = dot_total_balance + ftx_dot_balance + pps_open_dot_size
+
+    dot_fees = (
+        ftx_cost_size
+        + binance_cost_size
+        - (ftx_settled_size + ftx_dot_balance + dot_total_balance)
+        + raw["dot_total_rewards"]
+    )
+
+    prev_derived = prev.derived
+    prev_raw = prev.raw
+    pnl = (
+        _diff(total_liquid_value, prev_derived and prev_derived.total_liquid_value)
+        - _diff(total_cost, prev_derived and prev_derived.total_cost)
+        + _diff(total_settled, prev_derived and prev_derived.total_settled)
+        + _diff(raw["pps_realized_pnl"], prev_raw and prev_raw.pps_realized_pnl)
+        + _diff(raw["pps_closed_swap"], prev_raw and prev_raw.pps_closed_swap)
+    )
+
+    return {
+        "unix_time": raw["unix_time"],
+        "pps_open_pnl": pps_open_pnl,
+        "pps_open_liquid_value": pps_open_liquid_value,
+        "pps_total_swap": pps_total_swap,
+        "dot_liquid_value": dot_liquid_value,
+        "total_liquid_value": total_liquid_value,
+        "total_cost": total_cost,
+        "total_settled": total_settled,
+        "staked_ratio": staked_ratio,
+        "margin_ratio": margin_ratio,
+        "dot_net_position": dot_net_position,
+        "dot_fees": dot_fees,
+        "pnl": pnl,
+    }
+
+
+def derive_snapshot(
+    raw: RawSnapshot, prev: Optional[LastSnapshot] = None
+) -> DerivedSnapshot:
+    derived = compute_derived(snapshots_to_columns([raw], RAW_TABLE.columns), prev)
+    return DerivedSnapshot(*columns_to_rows(derived, DERIVED_TABLE.columns)[0])
@@ -0,0 +1,22 @@
+import os
+
+# Every venue endpoint can be overridden from the environment, which is how
+# the benchmark harness points a run at its local stand-ins.
+CTRADER_HOST = os.environ.get("HEDGE_CTRADER_HOST")
+CTRADER_PORT = os.environ.get("HEDGE_CTRADER_PORT")
+BINANCE_API_URL = os.environ.get("HEDGE_BINANCE_API_URL")
+# an empty value disables the streaming price feed
+BINANCE_STREAM_URL = os.environ.get(
+    "HEDGE_BINANCE_STREAM_URL", "wss://stream.binance.com:9443/ws"
+)
+SUBSCAN_URL = os.environ.get(
+    "HEDGE_SUBSCAN_URL", "https://polkadot.api.subscan.io/api/"
+)
+FTX_URL = os.environ.get("HEDGE_FTX_URL", "https://ftx.com/api/")
+
+BLOCK_OVERRIDE_PREFIX = "HEDGE_BLOCK_"
+
+
+def block_override(name: str):
+    # e.g. HEDGE_BLOCK_PREFECT_PSQL_HOST for the prefect-psql-host block
+    return os.environ.get(BLOCK_OVERRIDE_PREFIX + name.upper().replace("-", "_"))
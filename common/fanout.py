@@ -0,0 +1,55 @@
+import time
+from typing import Any, Dict, List, Tuple
+
+from common.venues import VenueAdapter
+
+
+def submit_venues(adapters: List[VenueAdapter]) -> Dict[str, Dict[str, Any]]:
+    return {
+        adapter.name: {
+            role: task.submit(*args) for role, (task, args) in adapter.calls().items()
+        }
+        for adapter in adapters
+    }
+
+
+def join_venues(
+    adapters: List[VenueAdapter],
+    venue_futures: Dict[str, Dict[str, Any]],
+    started: float,
+    deadline: float,
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float]]:
+    # Waits for every venue's task futures, each against its own timeout
+    # capped by the shared deadline, both measured from the fan-out.
+    results = {}
+    timings = {}
+    for adapter in sorted(adapters, key=lambda adapter: adapter.timeout):
+        timeout = min(adapter.timeout, deadline)
+        values = {}
+        finished = started
+        for role, future in venue_futures[adapter.name].items():
+            remaining = max(started + timeout - time.time(), 0)
+            state = future.wait(remaining)
+            if state is None:
+                raise TimeoutError(
+                    f"{adapter.name} {role} did not finish within {timeout}s"
+                )
+            values[role] = state.result()
+            finished = max(finished, state.timestamp.timestamp())
+        results[adapter.name] = values
+        timings[adapter.name] = finished - started
+    return results, timings
+
+
+def run_venues_sequentially(
+    adapters: List[VenueAdapter],
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float]]:
+    results = {}
+    timings = {}
+    for adapter in adapters:
+        started = time.time()
+        results[adapter.name] = {
+            role: task(*args) for role, (task, args) in adapter.calls().items()
+        }
+        timings[adapter.name] = time.time() - started
+    return results, timings
@@ -1,29 +1,39 @@
 import hmac
 import time
 import urllib.parse
-from typing import Any, Dict, List, Optional
+from datetime import datetime
+from typing import Any, Iterator, List
 
-from requests import Request, Response, Session
+from requests import Request, Response
 
+from common.endpoints import FTX_URL
+from common.rest_client import RestClient
 
-class FtxClient:
-    _ENDPOINT = "https://ftx.com/api/"
+# orders/history caps its page size at 200; the wallet endpoints take no limit
+# and return their own page size, so they page until a call brings nothing new
+ORDER_PAGE_SIZE = 200
 
-    def __init__(self, api_key=None, api_secret=None, subaccount_name=None) -> None:
-        self._session = Session()
+
+def _row_time(row: dict) -> float:
+    return datetime.fromisoformat(row["time"]).timestamp()
+
+
+def _order_time(row: dict) -> float:
+    return datetime.fromisoformat(row["createdAt"]).timestamp()
+
+
+class FtxClient(RestClient):
+    BASE_URL = FTX_URL
+    METRICS_NAME = "ftx"
+
+    def __init__(
+        self, api_key=None, api_secret=None, subaccount_name=None, base_url=None
+    ) -> None:
+        super().__init__(base_url)
         self._api_key = api_key
         self._api_secret = api_secret
         self._subaccount_name = subaccount_name
 
-    def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
-        return self._request("GET", path, params=params)
-
-    def _request(self, method: str, path: str, **kwargs) -> Any:
-        request = Request(method, self._ENDPOINT + path, **kwargs)
-        self._sign_request(request)
-        response = self._session.send(request.prepare())
-        return self._process_response(response)
-
     def _sign_request(self, request: Request) -> None:
         ts = int(time.time() * 1000)
         prepared = request.prepare()
@@ -55,34 +65,45 @@ class FtxClient:
     def get_market(self, market: str = None) -> List[dict]:
         return self._get(f"markets/{market}")
 
-    def get_order_history(
+    def iter_order_history(
         self,
         market: str = None,
         side: str = None,
         order_type: str = None,
         start_time: float = None,
         end_time: float = None,
-    ) -> List[dict]:
-        return self._get(
-            f"orders/history",
-            {
-                "market": market,
-                "side": side,
-                "orderType": order_type,
-                "start_time": start_time,
-                "end_time": end_time,
-            },
+    ) -> Iterator[dict]:
+        return self._paginate_by_end_time(
+            "orders/history",
+            {"market": market, "side": side, "orderType": order_type},
+            _order_time,
+            start_time=start_time,
+            end_time=end_time,
+            page_size=ORDER_PAGE_SIZE,
+        )
+
+    def iter_withdrawals(
+        self, start_time: float = None, end_time: float = None
+    ) -> Iterator[dict]:
+        return self._paginate_by_end_time(
+            "wallet/withdrawals", {}, _row_time, start_time, end_time
         )
 
-    def get_withdrawals(
+    def iter_deposit_history(
         self, start_time: float = None, end_time: float = None
-    ) -> List[dict]:
-        return self._get(
-            "wallet/withdrawals", {"start_time": start_time, "end_time": end_time}
+    ) -> Iterator[dict]:
+        return self._paginate_by_end_time(
+            "wallet/deposits", {}, _row_time, start_time, end_time
         )
 
-    def get_deposit_history(self) -> List[dict]:
-        return self._get("wallet/deposits")
+    def get_order_history(self, *args, **kwargs) -> List[dict]:
+        return list(self.iter_order_history(*args, **kwargs))
+
+    def get_withdrawals(self, *args, **kwargs) -> List[dict]:
+        return list(self.iter_withdrawals(*args, **kwargs))
+
+    def get_deposit_history(self, *args, **kwargs) -> List[dict]:
+        return list(self.iter_deposit_history(*args, **kwargs))
 
     def get_balances(self) -> List[dict]:
         return self._get("wallet/balances")
@@ -0,0 +1,238 @@
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Tuple
+
+# upper bounds in seconds, Prometheus style; the last bucket is +Inf
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    float("inf"),
+)
+
+# point the node exporter textfile collector at this directory; each flow
+# writes hedge_dataflow_<flow>.prom with its running totals beside it
+METRICS_DIR = os.environ.get(
+    "HEDGE_METRICS_DIR", os.path.expanduser("~/.local/state/hedge-dataflow/metrics")
+)
+
+
+@dataclass
+class DependencyStats:
+    calls: int = 0
+    errors: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    latency_sum: float = 0.0
+    latency_max: float = 0.0
+    buckets: List[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+
+    def observe(self, seconds: float, error: bool, sent: int, received: int):
+        self.calls += 1
+        self.errors += int(error)
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def merge(self, other: "DependencyStats"):
+        self.calls += other.calls
+        self.errors += other.errors
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.latency_sum += other.latency_sum
+        self.latency_max = max(self.latency_max, other.latency_max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def quantile(self, q: float) -> float:
+        # linear interpolation inside the bucket, as histogram_quantile does
+        if not self.calls:
+            return 0.0
+        rank = q * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            if seen + count >= rank and count:
+                lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+                upper = min(LATENCY_BUCKETS[index], self.latency_max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.latency_max
+
+
+# (dependency, operation) -> stats
+Stats = Dict[Tuple[str, str], DependencyStats]
+
+
+class CallInfo:
+    def __init__(self) -> None:
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error = False
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        # (dependency, operation) -> stats
+        self._stats: Dict[Tuple[str, str], DependencyStats] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        dependency: str,
+        operation: str,
+        seconds: float,
+        error: bool = False,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+    ):
+        with self._lock:
+            stats = self._stats.get((dependency, operation))
+            if stats is None:
+                stats = self._stats[(dependency, operation)] = DependencyStats()
+            stats.observe(seconds, error, bytes_sent, bytes_received)
+
+    @contextmanager
+    def track(self, dependency: str, operation: str):
+        call = CallInfo()
+        started = time.perf_counter()
+        try:
+            yield call
+        except Exception:
+            call.error = True
+            raise
+        finally:
+            self.record(
+                dependency,
+                operation,
+                time.perf_counter() - started,
+                call.error,
+                call.bytes_sent,
+                call.bytes_received,
+            )
+
+    def drain(self) -> Stats:
+        # hands over everything recorded so far, so each flow run exports
+        # only its own calls
+        with self._lock:
+            stats, self._stats = self._stats, {}
+        return stats
+
+
+def to_prometheus_text(stats: Stats, flow: str) -> str:
+    def labels(dependency: str, operation: str) -> str:
+        return (
+            f'flow="{_escape(flow)}",dependency="{dependency}",'
+            f'operation="{_escape(operation)}"'
+        )
+
+    lines = [
+        "# HELP hedge_dependency_latency_seconds Latency of outbound calls.",
+        "# TYPE hedge_dependency_latency_seconds histogram",
+    ]
+    for (dependency, operation), item in sorted(stats.items()):
+        label_text = labels(dependency, operation)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, item.buckets):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(
+                f'hedge_dependency_latency_seconds_bucket{{{label_text},le="{le}"}} '
+                f"{cumulative}"
+            )
+        lines.append(
+            f"hedge_dependency_latency_seconds_sum{{{label_text}}} {item.latency_sum}"
+        )
+        lines.append(
+            f"hedge_dependency_latency_seconds_count{{{label_text}}} {item.calls}"
+        )
+
+    lines += [
+        "# HELP hedge_dependency_errors_total Failed outbound calls.",
+        "# TYPE hedge_dependency_errors_total counter",
+    ]
+    for (dependency, operation), item in sorted(stats.items()):
+        label_text = labels(dependency, operation)
+        lines.append(f"hedge_dependency_errors_total{{{label_text}}} {item.errors}")
+
+    lines += [
+        "# HELP hedge_dependency_bytes_total Payload bytes of outbound calls.",
+        "# TYPE hedge_dependency_bytes_total counter",
+    ]
+    for (dependency, operation), item in sorted(stats.items()):
+        label_text = labels(dependency, operation)
+        lines.append(
+            f'hedge_dependency_bytes_total{{{label_text},direction="sent"}} '
+            f"{item.bytes_sent}"
+        )
+        lines.append(
+            f'hedge_dependency_bytes_total{{{label_text},direction="received"}} '
+            f"{item.bytes_received}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def export_totals(flow: str, stats: Stats, directory: str = METRICS_DIR) -> Stats:
+    # Prometheus counters and histograms must only grow, so each run adds its
+    # calls to the flow's running totals and rewrites the textfile from them.
+    # The lock keeps overlapping runs of one flow from losing each other's.
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"hedge_dataflow_{flow}")
+    with open(f"{base}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        totals = load_totals(f"{base}.json")
+        for key, item in stats.items():
+            totals.setdefault(key, DependencyStats()).merge(item)
+        _write_file(
+            f"{base}.json",
+            json.dumps(
+                [
+                    dict(asdict(item), dependency=dependency, operation=operation)
+                    for (dependency, operation), item in sorted(totals.items())
+                ]
+            ),
+        )
+        _write_file(f"{base}.prom", to_prometheus_text(totals, flow))
+    return totals
+
+
+def load_totals(path: str) -> Stats:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as totals_file:
+        entries = json.load(totals_file)
+    return {
+        (entry.pop("dependency"), entry.pop("operation")): DependencyStats(**entry)
+        for entry in entries
+    }
+
+
+def _write_file(path: str, text: str):
+    # written aside and renamed, so a scrape never sees half a file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as output:
+        output.write(text)
+    os.replace(temporary, path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,390 @@
+from dataclasses import dataclass
+from typing import List, Union
+
+from psycopg2.sql import Composable
+
+# Arbitrary key shared by every process applying migrations to this database.
+MIGRATION_LOCK_ID = 720417
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    statements: List[Union[str, Composable]]
+
+
+# Statements must be idempotent (IF NOT EXISTS etc.) so that a reapply can
+# restore objects removed by drop_table_flow. A released migration is never
+# edited; new tables and columns always go in a new migration.
+MIGRATIONS = [
+    Migration(
+        version=1,
+        name="create hedge data tables",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS hedge_data_raw (
+                id SERIAL PRIMARY KEY,
+                unix_time BIGINT NOT NULL,
+                ftx_dot_balance DOUBLE PRECISION,
+                ftx_cost_size DOUBLE PRECISION,
+                ftx_cost_avg_price DOUBLE PRECISION,
+                ftx_settled_size DOUBLE PRECISION,
+                ftx_settled_avg_price DOUBLE PRECISION,
+                dot_market_price DOUBLE PRECISION,
+                dot_total_balance DOUBLE PRECISION,
+                dot_staked_balance DOUBLE PRECISION,
+                dot_total_rewards DOUBLE PRECISION,
+                pps_acct_balance DOUBLE PRECISION,
+                pps_open_margin DOUBLE PRECISION,
+                pps_open_dot_size DOUBLE PRECISION,
+                pps_open_dot_avg_price DOUBLE PRECISION,
+                pps_open_swap DOUBLE PRECISION,
+                pps_closed_swap DOUBLE PRECISION,
+                pps_realized_pnl DOUBLE PRECISION
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS hedge_data_derived (
+                id SERIAL PRIMARY KEY,
+                unix_time BIGINT NOT NULL,
+                pps_open_pnl DOUBLE PRECISION,
+                pps_open_liquid_value DOUBLE PRECISION,
+                pps_total_swap DOUBLE PRECISION,
+                dot_liquid_value DOUBLE PRECISION,
+                total_liquid_value DOUBLE PRECISION,
+                total_cost DOUBLE PRECISION,
+                total_settled DOUBLE PRECISION,
+                staked_ratio DOUBLE PRECISION,
+                margin_ratio DOUBLE PRECISION,
+                dot_net_position DOUBLE PRECISION,
+                dot_fees DOUBLE PRECISION,
+                pnl DOUBLE PRECISION
+            );
+            """,
+        ],
+    ),
+    Migration(
+        version=2,
+        name="unique unix_time indexes",
+        statements=[
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS hedge_data_raw_unix_time_key
+            ON hedge_data_raw USING btree (unix_time);
+            """,
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS hedge_data_derived_unix_time_key
+            ON hedge_data_derived USING btree (unix_time);
+            """,
+        ],
+    ),
+    Migration(
+        version=3,
+        name="brin unix_time indexes",
+        statements=[
+            """
+            CREATE INDEX IF NOT EXISTS hedge_data_raw_unix_time_brin
+            ON hedge_data_raw USING brin (unix_time);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS hedge_data_derived_unix_time_brin
+            ON hedge_data_derived USING brin (unix_time);
+            """,
+        ],
+    ),
+    Migration(
+        version=4,
+        name="pps deal cursor",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS pps_deal_cursor (
+                account_id BIGINT NOT NULL,
+                symbol_id BIGINT NOT NULL,
+                last_deal_timestamp BIGINT NOT NULL,
+                last_deal_id BIGINT NOT NULL,
+                realized_pnl DOUBLE PRECISION NOT NULL,
+                closed_swap DOUBLE PRECISION NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (account_id, symbol_id)
+            );
+            """,
+        ],
+    ),
+    Migration(
+        version=5,
+        name="dot reward ledger",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS dot_reward_ledger (
+                address TEXT NOT NULL,
+                event_index TEXT NOT NULL,
+                extrinsic_index TEXT,
+                block_num BIGINT NOT NULL,
+                block_timestamp BIGINT,
+                amount NUMERIC(40, 0) NOT NULL,
+                PRIMARY KEY (address, event_index)
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS dot_reward_ledger_block_num_idx
+            ON dot_reward_ledger USING btree (address, block_num);
+            """,
+        ],
+    ),
+    Migration(
+        version=6,
+        name="binance order ledger",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS binance_order_ledger (
+                symbol TEXT NOT NULL,
+                order_id BIGINT NOT NULL,
+                side TEXT NOT NULL,
+                status TEXT NOT NULL,
+                executed_qty NUMERIC NOT NULL,
+                cummulative_quote_qty NUMERIC NOT NULL,
+                order_time BIGINT,
+                update_time BIGINT,
+                PRIMARY KEY (symbol, order_id)
+            );
+            """,
+        ],
+    ),
+    Migration(
+        version=7,
+        name="binance cost columns on raw data",
+        statements=[
+            """
+            ALTER TABLE hedge_data_raw
+            ADD COLUMN IF NOT EXISTS binance_cost_size DOUBLE PRECISION,
+            ADD COLUMN IF NOT EXISTS binance_avg_price DOUBLE PRECISION;
+            """,
+            # Older rows only kept the Binance figures folded into dot_fees and
+            # total_cost, so they are solved back out of the derived row.
+            """
+            UPDATE hedge_data_raw r
+            SET binance_cost_size = d.dot_fees - r.ftx_cost_size
+                + r.ftx_settled_size + r.ftx_dot_balance + r.dot_total_balance
+                - r.dot_total_rewards
+            FROM hedge_data_derived d
+            WHERE d.unix_time = r.unix_time AND r.binance_cost_size IS NULL;
+            """,
+            """
+            UPDATE hedge_data_raw r
+            SET binance_avg_price = COALESCE(
+                (d.total_cost - r.ftx_cost_size * r.ftx_cost_avg_price
+                    - r.pps_open_margin)
+                / NULLIF(r.binance_cost_size, 0),
+                0
+            )
+            FROM hedge_data_derived d
+            WHERE d.unix_time = r.unix_time AND r.binance_avg_price IS NULL;
+            """,
+        ],
+    ),
+    Migration(
+        version=8,
+        name="high frequency price snapshots",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS hedge_data_price (
+                id SERIAL PRIMARY KEY,
+                unix_time BIGINT NOT NULL,
+                dot_market_price DOUBLE PRECISION,
+                pps_open_pnl DOUBLE PRECISION,
+                total_liquid_value DOUBLE PRECISION,
+                margin_ratio DOUBLE PRECISION,
+                position_time BIGINT NOT NULL
+            );
+            """,
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS hedge_data_price_unix_time_key
+            ON hedge_data_price USING btree (unix_time);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS hedge_data_price_unix_time_brin
+            ON hedge_data_price USING brin (unix_time);
+            """,
+        ],
+    ),
+    Migration(
+        version=9,
+        name="hedge data rollups",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS hedge_data_rollup (
+                bucket TEXT NOT NULL,
+                bucket_start BIGINT NOT NULL,
+                row_count INTEGER NOT NULL,
+                first_time BIGINT NOT NULL,
+                last_time BIGINT NOT NULL,
+                pnl_first DOUBLE PRECISION,
+                pnl_last DOUBLE PRECISION,
+                pnl_min DOUBLE PRECISION,
+                pnl_max DOUBLE PRECISION,
+                pnl_sum DOUBLE PRECISION,
+                margin_ratio_first DOUBLE PRECISION,
+                margin_ratio_last DOUBLE PRECISION,
+                margin_ratio_min DOUBLE PRECISION,
+                margin_ratio_max DOUBLE PRECISION,
+                margin_ratio_sum DOUBLE PRECISION,
+                total_liquid_value_first DOUBLE PRECISION,
+                total_liquid_value_last DOUBLE PRECISION,
+                total_liquid_value_min DOUBLE PRECISION,
+                total_liquid_value_max DOUBLE PRECISION,
+                total_liquid_value_sum DOUBLE PRECISION,
+                dot_net_position_first DOUBLE PRECISION,
+                dot_net_position_last DOUBLE PRECISION,
+                dot_net_position_min DOUBLE PRECISION,
+                dot_net_position_max DOUBLE PRECISION,
+                dot_net_position_sum DOUBLE PRECISION,
+                PRIMARY KEY (bucket, bucket_start)
+            );
+            """,
+        ],
+    ),
+    Migration(
+        version=10,
+        name="dependency metrics",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS dependency_metrics (
+                flow_run_id TEXT NOT NULL,
+                recorded_at BIGINT NOT NULL,
+                dependency TEXT NOT NULL,
+                operation TEXT NOT NULL,
+                calls INTEGER NOT NULL,
+                errors INTEGER NOT NULL,
+                bytes_sent BIGINT NOT NULL,
+                bytes_received BIGINT NOT NULL,
+                latency_sum DOUBLE PRECISION NOT NULL,
+                latency_max DOUBLE PRECISION NOT NULL,
+                latency_p50 DOUBLE PRECISION NOT NULL,
+                latency_p95 DOUBLE PRECISION NOT NULL,
+                latency_buckets INTEGER[] NOT NULL,
+                PRIMARY KEY (flow_run_id, dependency, operation)
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS dependency_metrics_recorded_at_idx
+            ON dependency_metrics USING btree (dependency, operation, recorded_at);
+            """,
+        ],
+    ),
+    Migration(
+        version=11,
+        name="per account and asset snapshots",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS hedge_data_asset (
+                id SERIAL PRIMARY KEY,
+                unix_time BIGINT NOT NULL,
+                account TEXT NOT NULL,
+                asset TEXT NOT NULL,
+                total_balance DOUBLE PRECISION,
+                staked_balance DOUBLE PRECISION,
+                total_rewards DOUBLE PRECISION
+            );
+            """,
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS hedge_data_asset_key
+            ON hedge_data_asset USING btree (unix_time, account, asset);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS hedge_data_asset_account_asset_idx
+            ON hedge_data_asset USING btree (account, asset, unix_time);
+            """,
+            # both venues run a single account, so their legs are kept once
+            # per asset rather than on every account holding it
+            """
+            CREATE TABLE IF NOT EXISTS hedge_data_asset_hedge (
+                id SERIAL PRIMARY KEY,
+                unix_time BIGINT NOT NULL,
+                asset TEXT NOT NULL,
+                market_price DOUBLE PRECISION,
+                binance_cost_size DOUBLE PRECISION,
+                binance_avg_price DOUBLE PRECISION,
+                hedge_open_margin DOUBLE PRECISION,
+                hedge_open_size DOUBLE PRECISION,
+                hedge_open_avg_price DOUBLE PRECISION,
+                hedge_open_swap DOUBLE PRECISION,
+                hedge_closed_swap DOUBLE PRECISION,
+                hedge_realized_pnl DOUBLE PRECISION
+            );
+            """,
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS hedge_data_asset_hedge_key
+            ON hedge_data_asset_hedge USING btree (unix_time, asset);
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS hedge_data_hedge_account (
+                id SERIAL PRIMARY KEY,
+                unix_time BIGINT NOT NULL,
+                account_id BIGINT NOT NULL,
+                acct_balance DOUBLE PRECISION
+            );
+            """,
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS hedge_data_hedge_account_key
+            ON hedge_data_hedge_account USING btree (unix_time, account_id);
+            """,
+        ],
+    ),
+    Migration(
+        version=12,
+        name="binance price feed",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS binance_price_feed (
+                symbol TEXT PRIMARY KEY,
+                last_price DOUBLE PRECISION NOT NULL,
+                last_trade_time BIGINT NOT NULL,
+                vwap DOUBLE PRECISION,
+                updated_at TIMESTAMPTZ NOT NULL,
+                vwap_updated_at TIMESTAMPTZ NOT NULL
+            );
+            """,
+        ],
+    ),
+]
+
+
+def apply_migrations(conn, reapply: bool = False) -> List[Migration]:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            """
+        )
+    conn.commit()
+
+    applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        with conn.cursor() as cur:
+            # Held until commit, so concurrent deploys apply each version once.
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_ID,))
+            cur.execute(
+                "SELECT 1 FROM schema_migrations WHERE version = %s;",
+                (migration.version,),
+            )
+            if cur.fetchone() is not None and not reapply:
+                conn.commit()
+                continue
+
+            for statement in migration.statements:
+                cur.execute(statement)
+            cur.execute(
+                """
+                INSERT INTO schema_migrations (version, name) VALUES (%s, %s)
+                ON CONFLICT (version) DO UPDATE SET applied_at = now();
+                """,
+                (migration.version, migration.name),
+            )
+        conn.commit()
+        applied.append(migration)
+
+    return applied
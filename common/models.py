@@ -0,0 +1,152 @@
+from dataclasses import dataclass, fields
+from typing import List, Optional, Tuple
+
+
+@dataclass
+class RawSnapshot:
+    unix_time: int
+    ftx_dot_balance: float
+    ftx_cost_size: float
+    ftx_cost_avg_price: float
+    ftx_settled_size: float
+    ftx_settled_avg_price: float
+    binance_cost_size: float
+    binance_avg_price: float
+    dot_market_price: float
+    dot_total_balance: float
+    dot_staked_balance: float
+    dot_total_rewards: float
+    pps_acct_balance: float
+    pps_open_margin: float
+    pps_open_dot_size: float
+    pps_open_dot_avg_price: float
+    pps_open_swap: float
+    pps_closed_swap: float
+    pps_realized_pnl: float
+
+
+@dataclass
+class DerivedSnapshot:
+    unix_time: int
+    pps_open_pnl: float
+    pps_open_liquid_value: float
+    pps_total_swap: float
+    dot_liquid_value: float
+    total_liquid_value: float
+    total_cost: float
+    total_settled: float
+    staked_ratio: float
+    margin_ratio: float
+    dot_net_position: float
+    dot_fees: float
+    pnl: float
+
+
+@dataclass
+class PriceSnapshot:
+    unix_time: int
+    dot_market_price: float
+    pps_open_pnl: float
+    total_liquid_value: float
+    margin_ratio: float
+    # when the position state this was marked against was collected
+    position_time: int
+
+
+@dataclass
+class PriceQuote:
+    symbol: str
+    last_price: float
+    # Binance trade time, in milliseconds
+    last_trade_time: int
+    # None until the feed has seen a full averaging window
+    vwap: Optional[float] = None
+
+
+@dataclass
+class AssetSnapshot:
+    # the staking leg of one (account, asset) pair
+    unix_time: int
+    account: str
+    asset: str
+    total_balance: float
+    staked_balance: float
+    total_rewards: float
+
+
+@dataclass
+class AssetHedgeSnapshot:
+    # Binance and cTrader legs of one asset; both venues run a single account,
+    # so these are shared by every staking account holding the asset
+    unix_time: int
+    asset: str
+    market_price: float
+    binance_cost_size: float
+    binance_avg_price: float
+    hedge_open_margin: float
+    hedge_open_size: float
+    hedge_open_avg_price: float
+    hedge_open_swap: float
+    hedge_closed_swap: float
+    hedge_realized_pnl: float
+
+
+@dataclass
+class HedgeAccountSnapshot:
+    unix_time: int
+    account_id: int
+    acct_balance: float
+
+
+@dataclass
+class TrackedPosition:
+    # one staking address hedged on cTrader, keyed by (account, asset)
+    account: str
+    asset: str
+    address: str
+    rpc_url: str
+    binance_symbol: str
+    ctrader_symbol_id: int
+    decimals: int = 10
+    subscan_url: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.account, self.asset
+
+
+@dataclass
+class LastSnapshot:
+    raw: Optional[RawSnapshot] = None
+    derived: Optional[DerivedSnapshot] = None
+
+
+@dataclass
+class PpsSnapshot:
+    acct_balance: float
+    open_margin: float
+    open_dot_size: float
+    open_dot_avg_price: float
+    open_swap: float
+    closed_swap: float
+    realized_pnl: float
+
+
+@dataclass
+class DealCursor:
+    account_id: int
+    symbol_id: int
+    last_deal_timestamp: int
+    last_deal_id: int
+    realized_pnl: float = 0
+    closed_swap: float = 0
+
+    def is_after(self, execution_timestamp: int, deal_id: int) -> bool:
+        return (execution_timestamp, deal_id) > (
+            self.last_deal_timestamp,
+            self.last_deal_id,
+        )
+
+
+def column_names(record_type) -> List[str]:
+    return [field.name for field in fields(record_type)]
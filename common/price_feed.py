@@ -0,0 +1,217 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+import numpy as np
+import websocket
+
+from common.endpoints import BINANCE_STREAM_URL
+from common.models import PriceQuote
+
+# Binance avgPrice is a 5 minute average, so the feed is held to the same window
+PRICE_WINDOW_SECONDS = 300
+BUFFER_CAPACITY = 65536
+RECONNECT_SECONDS = 5
+# a connection that stops answering pings is dropped and reconnected
+PING_SECONDS = 60
+PUBLISH_SECONDS = 5
+
+
+class TickBuffer:
+    # Fixed-size ring of (time, price, qty). Ticks leave the window either by
+    # age or by being overwritten, and every query is O(1): running sums give
+    # the VWAP and monotonic deques of sequence numbers give min/max.
+    def __init__(
+        self, capacity: int = BUFFER_CAPACITY, window: float = PRICE_WINDOW_SECONDS
+    ) -> None:
+        self.capacity = capacity
+        self.window = window
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._prices = np.zeros(capacity, dtype=np.float64)
+        self._qtys = np.zeros(capacity, dtype=np.float64)
+        self._head = 0  # sequence number of the next tick
+        self._tail = 0  # sequence number of the oldest tick in the window
+        self._notional = 0.0
+        self._volume = 0.0
+        self._min = deque()
+        self._max = deque()
+        self._first_time: Optional[float] = None
+        self._overwritten_time: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._head - self._tail
+
+    def push(self, timestamp: float, price: float, qty: float):
+        with self._lock:
+            if self._head - self._tail == self.capacity:
+                self._overwritten_time = float(self._times[self._tail % self.capacity])
+                self._evict()
+            slot = self._head % self.capacity
+            self._times[slot] = timestamp
+            self._prices[slot] = price
+            self._qtys[slot] = qty
+            self._notional += price * qty
+            self._volume += qty
+
+            while self._min and self._prices[self._min[-1] % self.capacity] >= price:
+                self._min.pop()
+            self._min.append(self._head)
+            while self._max and self._prices[self._max[-1] % self.capacity] <= price:
+                self._max.pop()
+            self._max.append(self._head)
+
+            self._head += 1
+            if self._first_time is None:
+                self._first_time = timestamp
+            self._expire(timestamp)
+
+    def last(self) -> Optional[float]:
+        with self._lock:
+            if self._head == self._tail:
+                return None
+            return float(self._prices[(self._head - 1) % self.capacity])
+
+    def last_time(self) -> Optional[float]:
+        with self._lock:
+            if self._head == self._tail:
+                return None
+            return float(self._times[(self._head - 1) % self.capacity])
+
+    def vwap(self, now: Optional[float] = None) -> Optional[float]:
+        with self._lock:
+            self._expire(time.time() if now is None else now)
+            if self._volume <= 0:
+                return None
+            return self._notional / self._volume
+
+    def min(self, now: Optional[float] = None) -> Optional[float]:
+        with self._lock:
+            self._expire(time.time() if now is None else now)
+            if not self._min:
+                return None
+            return float(self._prices[self._min[0] % self.capacity])
+
+    def max(self, now: Optional[float] = None) -> Optional[float]:
+        with self._lock:
+            self._expire(time.time() if now is None else now)
+            if not self._max:
+                return None
+            return float(self._prices[self._max[0] % self.capacity])
+
+    def covers_window(self, now: Optional[float] = None) -> bool:
+        # true once the buffer holds every tick of a full window, so the VWAP
+        # is not skewed towards the moment the feed started or cut short by
+        # ticks overwritten at capacity
+        cutoff = (time.time() if now is None else now) - self.window
+        with self._lock:
+            if self._first_time is None or self._first_time > cutoff:
+                return False
+            return self._overwritten_time is None or self._overwritten_time < cutoff
+
+    def _expire(self, now: float):
+        cutoff = now - self.window
+        while self._tail < self._head:
+            if self._times[self._tail % self.capacity] >= cutoff:
+                break
+            self._evict()
+
+    def _evict(self):
+        slot = self._tail % self.capacity
+        self._notional -= self._prices[slot] * self._qtys[slot]
+        self._volume -= self._qtys[slot]
+        if self._min and self._min[0] == self._tail:
+            self._min.popleft()
+        if self._max and self._max[0] == self._tail:
+            self._max.popleft()
+        self._tail += 1
+        if self._tail == self._head:
+            # drop accumulated float error whenever the window empties
+            self._notional = 0.0
+            self._volume = 0.0
+
+
+class BinancePriceFeed:
+    def __init__(
+        self,
+        symbol: str,
+        buffer: TickBuffer = None,
+        url: str = BINANCE_STREAM_URL,
+    ) -> None:
+        self.symbol = symbol
+        self.buffer = buffer or TickBuffer()
+        self.url = f"{url}/{symbol.lower()}@trade"
+        self._app = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._app = websocket.WebSocketApp(self.url, on_message=self._on_message)
+        self._thread = threading.Thread(
+            target=self._app.run_forever,
+            kwargs={
+                "reconnect": RECONNECT_SECONDS,
+                "ping_interval": PING_SECONDS,
+                "ping_timeout": RECONNECT_SECONDS,
+            },
+            name=f"price-feed-{self.symbol}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._app is not None:
+            self._app.close()
+        self._thread = None
+
+    def quote(self, now: Optional[float] = None) -> Optional[PriceQuote]:
+        last_time = self.buffer.last_time()
+        if last_time is None:
+            return None
+        vwap = self.buffer.vwap(now) if self.buffer.covers_window(now) else None
+        return PriceQuote(
+            symbol=self.symbol,
+            last_price=self.buffer.last(),
+            last_trade_time=round(last_time * 1000),
+            vwap=vwap,
+        )
+
+    def _on_message(self, app, message: str):
+        trade = json.loads(message)
+        if trade.get("e") != "trade":
+            return
+        self.buffer.push(trade["T"] / 1000, float(trade["p"]), float(trade["q"]))
+
+
+def run_price_feeds(
+    symbols: List[str],
+    run_seconds: float,
+    publish: Callable[[List[PriceQuote]], None],
+    publish_seconds: float = PUBLISH_SECONDS,
+    url: str = BINANCE_STREAM_URL,
+) -> int:
+    # Runs in its own long-lived process and hands the quotes to publish
+    # every publish_seconds. Flow runs are too short to fill a window, so
+    # they read the published quotes instead of streaming themselves.
+    feeds = [BinancePriceFeed(symbol, url=url) for symbol in symbols]
+    for feed in feeds:
+        feed.start()
+    deadline = time.monotonic() + run_seconds
+    published = 0
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return published
+            time.sleep(min(publish_seconds, remaining))
+            quotes = [feed.quote() for feed in feeds]
+            quotes = [quote for quote in quotes if quote is not None]
+            if quotes:
+                publish(quotes)
+                published += 1
+    finally:
+        for feed in feeds:
+            feed.stop()
@@ -0,0 +1,154 @@
+import random
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from requests import Request, Response, Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+
+from common.metrics import metrics
+
+
+class PaginationError(Exception):
+    pass
+
+
+class RestClient:
+    # subclasses set the venue endpoint and sign/unwrap requests
+    BASE_URL = ""
+    METRICS_NAME = "rest"
+    # (connect, read) seconds
+    TIMEOUT = (5, 30)
+    POOL_SIZE = 10
+    MAX_RETRIES = 5
+    BACKOFF_BASE = 0.5
+    BACKOFF_CAP = 30.0
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    # only these are retried on 5xx or a dropped connection; 429 means the
+    # request was never processed, so every method is retried on it
+    IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "DELETE"})
+
+    def __init__(self, base_url: Optional[str] = None) -> None:
+        self._base_url = base_url or self.BASE_URL
+        self._session = Session()
+        # retries are handled in _request, so the adapter only pools
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.POOL_SIZE, max_retries=0
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def close(self) -> None:
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        return self._request("GET", path, params=params)
+
+    def _request(self, method: str, path: str, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            request = Request(method, self._base_url + path, **kwargs)
+            self._sign_request(request)
+            prepared = request.prepare()
+            try:
+                with metrics.track(self.METRICS_NAME, f"{method} {path}") as call:
+                    call.bytes_sent = len(prepared.body or b"")
+                    response = self._session.send(prepared, timeout=self.TIMEOUT)
+                    call.bytes_received = len(response.content)
+                    call.error = response.status_code >= 400
+            except (ConnectionError, Timeout):
+                if method not in self.IDEMPOTENT_METHODS or attempt >= self.MAX_RETRIES:
+                    raise
+                self._backoff(attempt, None)
+                attempt += 1
+                continue
+
+            if self._should_retry(method, response) and attempt < self.MAX_RETRIES:
+                self._backoff(attempt, response)
+                attempt += 1
+                continue
+            return self._process_response(response)
+
+    def _should_retry(self, method: str, response: Response) -> bool:
+        if response.status_code == 429:
+            return True
+        return (
+            response.status_code in self.RETRY_STATUSES
+            and method in self.IDEMPOTENT_METHODS
+        )
+
+    def _backoff(self, attempt: int, response: Optional[Response]) -> None:
+        # full jitter, so concurrent workers do not retry in lockstep
+        delay = random.uniform(
+            0, min(self.BACKOFF_CAP, self.BACKOFF_BASE * 2**attempt)
+        )
+        retry_after = response.headers.get("Retry-After") if response else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        time.sleep(delay)
+
+    def _sign_request(self, request: Request) -> None:
+        pass
+
+    def _process_response(self, response: Response) -> Any:
+        response.raise_for_status()
+        return response.json()
+
+    def _paginate_by_end_time(
+        self,
+        path: str,
+        params: Dict[str, Any],
+        row_time: Callable[[dict], float],
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None,
+        page_size: Optional[int] = None,
+        row_id: Callable[[dict], Any] = lambda row: row["id"],
+    ) -> Iterator[dict]:
+        # Walks newest-first endpoints backwards one page at a time, moving
+        # end_time to the oldest row seen. Rows sharing that timestamp come
+        # back on the next page and are skipped by id.
+        boundary_ids = set()
+        full_page = page_size or 0
+        while True:
+            query = dict(params, start_time=start_time, end_time=end_time)
+            if page_size is not None:
+                query["limit"] = page_size
+            rows = self._get(path, query)
+            if not rows:
+                return
+            full_page = max(full_page, len(rows))
+
+            oldest = min(row_time(row) for row in rows)
+            fresh = 0
+            for row in rows:
+                if row_id(row) in boundary_ids:
+                    continue
+                fresh += 1
+                yield row
+
+            if page_size is not None and len(rows) < page_size:
+                return
+            if fresh == 0:
+                if len(rows) < full_page:
+                    return
+                # a full page of rows already seen: more rows share end_time
+                # than fit on a page (endpoints without a limit are taken to
+                # fill the largest page seen), so moving on would skip them
+                raise PaginationError(
+                    f"{path}: {len(rows)} rows at end_time {end_time} "
+                    "fill a whole page"
+                )
+            if end_time is not None and oldest >= end_time:
+                boundary_ids |= {row_id(row) for row in rows}
+            else:
+                boundary_ids = {row_id(row) for row in rows if row_time(row) == oldest}
+            end_time = oldest
@@ -0,0 +1,127 @@
+from typing import Iterable, List, Tuple
+
+from psycopg2 import sql
+
+ROLLUP_TABLE = "hedge_data_rollup"
+
+# migration 9 created a column per metric and aggregate, so changing either
+# list needs a new migration
+ROLLUP_METRICS = ["pnl", "margin_ratio", "total_liquid_value", "dot_net_position"]
+ROLLUP_AGGREGATES = ["first", "last", "min", "max", "sum"]
+
+# bucket name -> (size, offset) in seconds; weeks are shifted from the
+# Thursday unix epoch so they start on Monday 00:00 UTC
+ROLLUP_BUCKETS = {
+    "1h": (3600, 0),
+    "1d": (86400, 0),
+    "1w": (604800, 345600),
+}
+
+_AGGREGATE_SQL = {
+    "first": "(array_agg({metric} ORDER BY unix_time))[1]",
+    "last": "(array_agg({metric} ORDER BY unix_time DESC))[1]",
+    "min": "min({metric})",
+    "max": "max({metric})",
+    "sum": "sum({metric})",
+}
+
+
+def rollup_columns() -> List[str]:
+    return [
+        f"{metric}_{aggregate}"
+        for metric in ROLLUP_METRICS
+        for aggregate in ROLLUP_AGGREGATES
+    ]
+
+
+def bucket_start(unix_time: int, bucket: str) -> int:
+    size, offset = ROLLUP_BUCKETS[bucket]
+    return (unix_time - offset) // size * size + offset
+
+
+def _refresh_statement() -> sql.Composed:
+    columns = rollup_columns()
+    aggregates = [
+        sql.SQL(_AGGREGATE_SQL[aggregate]).format(metric=sql.Identifier(metric))
+        for metric in ROLLUP_METRICS
+        for aggregate in ROLLUP_AGGREGATES
+    ]
+    return sql.SQL(
+        """
+        INSERT INTO {table} (
+            bucket, bucket_start, row_count, first_time, last_time, {columns}
+        )
+        SELECT
+            %(bucket)s,
+            (unix_time - %(offset)s) / %(size)s * %(size)s + %(offset)s,
+            count(*),
+            min(unix_time),
+            max(unix_time),
+            {aggregates}
+        FROM hedge_data_derived
+        WHERE unix_time >= %(start)s AND unix_time < %(end)s
+        GROUP BY 2
+        ON CONFLICT (bucket, bucket_start) DO UPDATE SET
+            row_count = EXCLUDED.row_count,
+            first_time = EXCLUDED.first_time,
+            last_time = EXCLUDED.last_time,
+            {updates};
+        """
+    ).format(
+        table=sql.Identifier(ROLLUP_TABLE),
+        columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+        aggregates=sql.SQL(", ").join(aggregates),
+        updates=sql.SQL(", ").join(
+            sql.SQL("{column} = EXCLUDED.{column}").format(
+                column=sql.Identifier(column)
+            )
+            for column in columns
+        ),
+    )
+
+
+def _affected_ranges(unix_times: Iterable[int], bucket: str) -> List[Tuple[int, int]]:
+    size, _ = ROLLUP_BUCKETS[bucket]
+    starts = sorted({bucket_start(unix_time, bucket) for unix_time in unix_times})
+    ranges = []
+    for start in starts:
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], start + size)
+        else:
+            ranges.append((start, start + size))
+    return ranges
+
+
+def refresh_rollups(cur, unix_times: Iterable[int]):
+    # whole buckets are re-aggregated from hedge_data_derived, so late or
+    # rewritten rows are handled the same as new ones
+    unix_times = list(unix_times)
+    statement = _refresh_statement()
+    for bucket, (size, offset) in ROLLUP_BUCKETS.items():
+        for start, end in _affected_ranges(unix_times, bucket):
+            cur.execute(
+                statement,
+                {
+                    "bucket": bucket,
+                    "size": size,
+                    "offset": offset,
+                    "start": start,
+                    "end": end,
+                },
+            )
+
+
+def rebuild_rollups(cur):
+    cur.execute(sql.SQL("DELETE FROM {};").format(sql.Identifier(ROLLUP_TABLE)))
+    statement = _refresh_statement()
+    for bucket, (size, offset) in ROLLUP_BUCKETS.items():
+        cur.execute(
+            statement,
+            {
+                "bucket": bucket,
+                "size": size,
+                "offset": offset,
+                "start": 0,
+                "end": 2**62,
+            },
+        )
@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+from psycopg2 import sql
+
+from common.models import (
+    AssetHedgeSnapshot,
+    AssetSnapshot,
+    DerivedSnapshot,
+    HedgeAccountSnapshot,
+    PriceSnapshot,
+    RawSnapshot,
+    column_names,
+)
+
+
+@dataclass(frozen=True)
+class Table:
+    # maps a record type onto its table for reads and inserts; the DDL is
+    # written out by hand in common/migrations.py
+    name: str
+    record_type: type
+
+    @property
+    def columns(self) -> List[str]:
+        return column_names(self.record_type)
+
+    @property
+    def identifier(self) -> sql.Identifier:
+        return sql.Identifier(self.name)
+
+    def column_list(self, alias: Optional[str] = None) -> sql.Composed:
+        if alias is None:
+            return sql.SQL(", ").join(map(sql.Identifier, self.columns))
+        return sql.SQL(", ").join(
+            sql.Identifier(alias, column) for column in self.columns
+        )
+
+
+RAW_TABLE = Table("hedge_data_raw", RawSnapshot)
+DERIVED_TABLE = Table("hedge_data_derived", DerivedSnapshot)
+PRICE_TABLE = Table("hedge_data_price", PriceSnapshot)
+ASSET_TABLE = Table("hedge_data_asset", AssetSnapshot)
+ASSET_HEDGE_TABLE = Table("hedge_data_asset_hedge", AssetHedgeSnapshot)
+HEDGE_ACCOUNT_TABLE = Table("hedge_data_hedge_account", HedgeAccountSnapshot)
+
+TABLES = {
+    table.name: table
+    for table in (
+        RAW_TABLE,
+        DERIVED_TABLE,
+        PRICE_TABLE,
+        ASSET_TABLE,
+        ASSET_HEDGE_TABLE,
+        HEDGE_ACCOUNT_TABLE,
+    )
+}
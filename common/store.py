@@ -0,0 +1,463 @@
+import io
+import math
+from dataclasses import astuple
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from common.db import connection
+from common.metrics import DependencyStats
+from common.models import (
+    AssetHedgeSnapshot,
+    AssetSnapshot,
+    DealCursor,
+    DerivedSnapshot,
+    HedgeAccountSnapshot,
+    PriceQuote,
+    PriceSnapshot,
+    RawSnapshot,
+)
+from common.rollup import rebuild_rollups, refresh_rollups
+from common.schema import (
+    ASSET_HEDGE_TABLE,
+    ASSET_TABLE,
+    DERIVED_TABLE,
+    HEDGE_ACCOUNT_TABLE,
+    PRICE_TABLE,
+    RAW_TABLE,
+    Table,
+)
+
+# Binance order states that can still change, so must be fetched again
+OPEN_ORDER_STATUSES = ("NEW", "PARTIALLY_FILLED", "PENDING_CANCEL")
+
+# below this many rows one multi-row INSERT is cheaper than setting up a COPY
+COPY_THRESHOLD = 100
+
+# backslash, tab and line breaks are escapes or delimiters in COPY text format
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+        return repr(value)
+    if isinstance(value, str):
+        return value.translate(COPY_ESCAPES)
+    return str(value)
+
+
+def insert_rows(cur, table: Table, rows: Sequence[tuple]):
+    if not rows:
+        return
+    if len(rows) < COPY_THRESHOLD:
+        execute_values(
+            cur,
+            sql.SQL("INSERT INTO {} ({}) VALUES %s;").format(
+                table.identifier, table.column_list()
+            ),
+            rows,
+        )
+        return
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(map(_copy_value, row)))
+        buffer.write("\n")
+    buffer.seek(0)
+    cur.copy_expert(
+        sql.SQL("COPY {} ({}) FROM STDIN;").format(
+            table.identifier, table.column_list()
+        ),
+        buffer,
+    )
+
+
+def write_snapshots(raw: Sequence[RawSnapshot], derived: Sequence[DerivedSnapshot]):
+    # one transaction, so a raw row is never left without its derived row
+    with connection() as conn, conn.cursor() as cur:
+        insert_rows(cur, RAW_TABLE, [astuple(snapshot) for snapshot in raw])
+        insert_rows(cur, DERIVED_TABLE, [astuple(snapshot) for snapshot in derived])
+        refresh_rollups(cur, [snapshot.unix_time for snapshot in derived])
+
+
+def write_price_snapshots(snapshots: Sequence[PriceSnapshot]):
+    with connection() as conn, conn.cursor() as cur:
+        insert_rows(cur, PRICE_TABLE, [astuple(snapshot) for snapshot in snapshots])
+
+
+def write_asset_snapshots(
+    snapshots: Sequence[AssetSnapshot],
+    hedges: Sequence[AssetHedgeSnapshot],
+    accounts: Sequence[HedgeAccountSnapshot],
+):
+    # one transaction, so a run's staking rows always have their hedge legs
+    with connection() as conn, conn.cursor() as cur:
+        insert_rows(cur, ASSET_TABLE, [astuple(snapshot) for snapshot in snapshots])
+        insert_rows(cur, ASSET_HEDGE_TABLE, [astuple(hedge) for hedge in hedges])
+        insert_rows(
+            cur, HEDGE_ACCOUNT_TABLE, [astuple(account) for account in accounts]
+        )
+
+
+def iter_table_rows(
+    table: Table, after: Optional[int], before: int, batch_rows: int
+) -> Iterator[List[tuple]]:
+    # a named cursor keeps the result set on the server, so memory stays at
+    # one batch however much history is read
+    with connection() as conn, conn.cursor(name=f"iter_{table.name}") as cur:
+        cur.itersize = batch_rows
+        cur.execute(
+            sql.SQL(
+                "SELECT {} FROM {} WHERE unix_time > %s AND unix_time < %s "
+                "ORDER BY unix_time, id;"
+            ).format(table.column_list(), table.identifier),
+            (-1 if after is None else after, before),
+        )
+        while True:
+            rows = cur.fetchmany(batch_rows)
+            if not rows:
+                return
+            yield rows
+
+
+def replace_derived_rows(rows: Sequence[tuple]):
+    # readers never see a half-rebuilt table
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(sql.SQL("DELETE FROM {};").format(DERIVED_TABLE.identifier))
+        insert_rows(cur, DERIVED_TABLE, rows)
+        rebuild_rollups(cur)
+
+
+def rebuild_rollup_rows():
+    with connection() as conn, conn.cursor() as cur:
+        rebuild_rollups(cur)
+
+
+def load_deal_cursor(account_id: int, symbol_id: int) -> Optional[DealCursor]:
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+                account_id,
+                symbol_id,
+                last_deal_timestamp,
+                last_deal_id,
+                realized_pnl,
+                closed_swap
+            FROM pps_deal_cursor
+            WHERE account_id = %s AND symbol_id = %s;
+            """,
+            (account_id, symbol_id),
+        )
+        row = cur.fetchone()
+
+    if row is None:
+        return None
+    return DealCursor(*row)
+
+
+def save_deal_cursor(cursor: DealCursor):
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO pps_deal_cursor (
+                account_id,
+                symbol_id,
+                last_deal_timestamp,
+                last_deal_id,
+                realized_pnl,
+                closed_swap
+            ) VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (account_id, symbol_id) DO UPDATE SET
+                last_deal_timestamp = EXCLUDED.last_deal_timestamp,
+                last_deal_id = EXCLUDED.last_deal_id,
+                realized_pnl = EXCLUDED.realized_pnl,
+                closed_swap = EXCLUDED.closed_swap,
+                updated_at = now();
+            """,
+            (
+                cursor.account_id,
+                cursor.symbol_id,
+                cursor.last_deal_timestamp,
+                cursor.last_deal_id,
+                cursor.realized_pnl,
+                cursor.closed_swap,
+            ),
+        )
+
+
+def get_reward_watermark(address: str) -> int:
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT COALESCE(MAX(block_num), 0) FROM dot_reward_ledger "
+            "WHERE address = %s;",
+            (address,),
+        )
+        return cur.fetchone()[0]
+
+
+def add_rewards(address: str, rewards: List[dict]) -> int:
+    if not rewards:
+        return 0
+    with connection() as conn, conn.cursor() as cur:
+        # the watermark block is fetched again on every run, so events
+        # already in the ledger are skipped rather than rejected; rowcount
+        # only covers the last page, so inserted rows are returned instead
+        inserted = execute_values(
+            cur,
+            """
+            INSERT INTO dot_reward_ledger (
+                address,
+                event_index,
+                extrinsic_index,
+                block_num,
+                block_timestamp,
+                amount
+            ) VALUES %s
+            ON CONFLICT (address, event_index) DO NOTHING
+            RETURNING event_index;
+            """,
+            [
+                (
+                    address,
+                    reward["event_index"],
+                    reward.get("extrinsic_index"),
+                    reward["block_num"],
+                    reward.get("block_timestamp"),
+                    reward["amount"],
+                )
+                for reward in rewards
+            ],
+            fetch=True,
+        )
+        return len(inserted)
+
+
+def get_total_rewards(address: str) -> str:
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT COALESCE(SUM(amount), 0) FROM dot_reward_ledger "
+            "WHERE address = %s;",
+            (address,),
+        )
+        return str(cur.fetchone()[0])
+
+
+def get_total_rewards_by_address(addresses: Sequence[str]) -> Dict[str, str]:
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT address, COALESCE(SUM(amount), 0) FROM dot_reward_ledger "
+            "WHERE address = ANY(%s) GROUP BY address;",
+            (list(addresses),),
+        )
+        totals = {address: str(total) for address, total in cur.fetchall()}
+    return {address: totals.get(address, "0") for address in addresses}
+
+
+def get_order_watermark(symbol: str) -> int:
+    # Orders still open may fill later, so fetching restarts at the oldest of
+    # them; otherwise it continues after the newest stored order.
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT COALESCE(
+                MIN(order_id) FILTER (WHERE status IN %s),
+                MAX(order_id) + 1,
+                0
+            )
+            FROM binance_order_ledger
+            WHERE symbol = %s;
+            """,
+            (OPEN_ORDER_STATUSES, symbol),
+        )
+        return cur.fetchone()[0]
+
+
+def upsert_orders(symbol: str, orders: List[dict]):
+    if not orders:
+        return
+    with connection() as conn, conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO binance_order_ledger (
+                symbol,
+                order_id,
+                side,
+                status,
+                executed_qty,
+                cummulative_quote_qty,
+                order_time,
+                update_time
+            ) VALUES %s
+            ON CONFLICT (symbol, order_id) DO UPDATE SET
+                status = EXCLUDED.status,
+                executed_qty = EXCLUDED.executed_qty,
+                cummulative_quote_qty = EXCLUDED.cummulative_quote_qty,
+                update_time = EXCLUDED.update_time;
+            """,
+            [
+                (
+                    symbol,
+                    order["orderId"],
+                    order["side"].upper(),
+                    order["status"].upper(),
+                    order["executedQty"],
+                    order["cummulativeQuoteQty"],
+                    order.get("time"),
+                    order.get("updateTime"),
+                )
+                for order in orders
+            ],
+        )
+
+
+def get_filled_buy_totals(symbol: str) -> Tuple[float, float]:
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+                COALESCE(SUM(executed_qty), 0),
+                COALESCE(SUM(cummulative_quote_qty), 0)
+            FROM binance_order_ledger
+            WHERE symbol = %s AND status = 'FILLED' AND side = 'BUY';
+            """,
+            (symbol,),
+        )
+        total_size, total_usd = cur.fetchone()
+    return float(total_size), float(total_usd)
+
+
+def get_filled_buy_totals_by_symbol(
+    symbols: Sequence[str],
+) -> Dict[str, Tuple[float, float]]:
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+                symbol,
+                COALESCE(SUM(executed_qty), 0),
+                COALESCE(SUM(cummulative_quote_qty), 0)
+            FROM binance_order_ledger
+            WHERE symbol = ANY(%s) AND status = 'FILLED' AND side = 'BUY'
+            GROUP BY symbol;
+            """,
+            (list(symbols),),
+        )
+        totals = {
+            symbol: (float(total_size), float(total_usd))
+            for symbol, total_size, total_usd in cur.fetchall()
+        }
+    return {symbol: totals.get(symbol, (0.0, 0.0)) for symbol in symbols}
+
+
+def publish_price_quotes(quotes: Sequence[PriceQuote]):
+    with connection() as conn, conn.cursor() as cur:
+        # a feed that has not filled its window yet leaves the previous VWAP
+        # in place, so an overlapping run cannot blank a fresher one
+        execute_values(
+            cur,
+            """
+            INSERT INTO binance_price_feed (
+                symbol,
+                last_price,
+                last_trade_time,
+                vwap,
+                updated_at,
+                vwap_updated_at
+            ) VALUES %s
+            ON CONFLICT (symbol) DO UPDATE SET
+                last_price = EXCLUDED.last_price,
+                last_trade_time = EXCLUDED.last_trade_time,
+                updated_at = EXCLUDED.updated_at,
+                vwap = COALESCE(EXCLUDED.vwap, binance_price_feed.vwap),
+                vwap_updated_at = CASE
+                    WHEN EXCLUDED.vwap IS NULL
+                    THEN binance_price_feed.vwap_updated_at
+                    ELSE EXCLUDED.vwap_updated_at
+                END;
+            """,
+            [
+                (quote.symbol, quote.last_price, quote.last_trade_time, quote.vwap)
+                for quote in quotes
+            ],
+            template="(%s, %s, %s, %s, now(), now())",
+        )
+
+
+def get_price_quotes(symbols: Sequence[str], max_age: float) -> Dict[str, PriceQuote]:
+    # ages are measured against the database clock on both sides
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+                symbol,
+                last_price,
+                last_trade_time,
+                CASE
+                    WHEN vwap_updated_at > now() - make_interval(secs => %s)
+                    THEN vwap
+                END
+            FROM binance_price_feed
+            WHERE symbol = ANY(%s)
+                AND updated_at > now() - make_interval(secs => %s);
+            """,
+            (max_age, list(symbols), max_age),
+        )
+        return {row[0]: PriceQuote(*row) for row in cur.fetchall()}
+
+
+def write_dependency_metrics(
+    flow_run_id: str,
+    recorded_at: int,
+    stats: Dict[Tuple[str, str], DependencyStats],
+):
+    if not stats:
+        return
+    with connection() as conn, conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO dependency_metrics (
+                flow_run_id,
+                recorded_at,
+                dependency,
+                operation,
+                calls,
+                errors,
+                bytes_sent,
+                bytes_received,
+                latency_sum,
+                latency_max,
+                latency_p50,
+                latency_p95,
+                latency_buckets
+            ) VALUES %s
+            ON CONFLICT (flow_run_id, dependency, operation) DO NOTHING;
+            """,
+            [
+                (
+                    flow_run_id,
+                    recorded_at,
+                    dependency,
+                    operation,
+                    item.calls,
+                    item.errors,
+                    item.bytes_sent,
+                    item.bytes_received,
+                    item.latency_sum,
+                    item.latency_max,
+                    item.quantile(0.5),
+                    item.quantile(0.95),
+                    item.buckets,
+                )
+                for (dependency, operation), item in stats.items()
+            ],
+        )
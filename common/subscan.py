@@ -0,0 +1,62 @@
+import threading
+from typing import Any, Dict, Iterator
+
+from requests import Response
+
+from common.endpoints import SUBSCAN_URL
+from common.rest_client import RestClient
+
+PAGE_SIZE = 100
+
+# one pooled client per Subscan network
+_clients: Dict[str, "SubscanClient"] = {}
+_clients_lock = threading.Lock()
+
+
+class SubscanClient(RestClient):
+    BASE_URL = SUBSCAN_URL
+    METRICS_NAME = "subscan"
+    # every Subscan endpoint is a read-only POST, so it is safe to retry on
+    # 5xx and dropped connections like a GET
+    IDEMPOTENT_METHODS = RestClient.IDEMPOTENT_METHODS | {"POST"}
+
+    def _post(self, path: str, data: dict) -> Any:
+        return self._request("POST", path, json=data)
+
+    def _process_response(self, response: Response) -> Any:
+        response.raise_for_status()
+        body = response.json()
+        if body["code"] != 0:
+            raise Exception(f"Subscan {response.request.path_url}: {body['message']}")
+        return body["data"]
+
+    def iter_rewards_since(self, address: str, min_block_num: int) -> Iterator[dict]:
+        # Subscan lists reward events newest first, so paging stops at the
+        # first event below the block the ledger already covers.
+        page = 0
+        while True:
+            data = self._post(
+                "scan/account/reward_slash",
+                {"row": PAGE_SIZE, "page": page, "address": address},
+            )
+            rewards = data["list"] or []
+            for reward in rewards:
+                if reward["block_num"] < min_block_num:
+                    return
+                yield reward
+            if len(rewards) < PAGE_SIZE:
+                return
+            page += 1
+
+
+def get_client(base_url: str = SUBSCAN_URL) -> SubscanClient:
+    with _clients_lock:
+        if base_url not in _clients:
+            _clients[base_url] = SubscanClient(base_url)
+        return _clients[base_url]
+
+
+def iter_rewards_since(
+    address: str, min_block_num: int, base_url: str = SUBSCAN_URL
+) -> Iterator[dict]:
+    return get_client(base_url).iter_rewards_since(address, min_block_num)
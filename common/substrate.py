@@ -0,0 +1,125 @@
+import threading
+from typing import List, Tuple
+
+from scalecodec.base import ScaleBytes
+from substrateinterface import SubstrateInterface
+from substrateinterface.exceptions import (
+    StorageFunctionNotFound,
+    SubstrateRequestException,
+)
+from websocket import WebSocketConnectionClosedException
+
+from common.metrics import metrics
+
+# (module, storage function, params)
+StorageQuery = Tuple[str, str, list]
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+class SubstrateConnection:
+    def __init__(self, url: str) -> None:
+        # SubstrateInterface keeps the decoded runtime metadata per spec
+        # version on the instance, so reusing it skips the metadata download.
+        self.substrate = SubstrateInterface(url=url)
+        self.substrate.rpc_request = _instrumented(self.substrate.rpc_request)
+        # a single websocket can only carry one request/response at a time
+        self.lock = threading.Lock()
+
+
+def _instrumented(rpc_request):
+    # every storage read, metadata fetch and head lookup goes through here
+    def request(method, params, *args, **kwargs):
+        with metrics.track("substrate", method) as call:
+            response = rpc_request(method, params, *args, **kwargs)
+            call.bytes_received = len(str(response.get("result", "")))
+            call.error = "error" in response
+            return response
+
+    return request
+
+
+def get_connection(url: str) -> SubstrateConnection:
+    with _connections_lock:
+        connection = _connections.get(url)
+        if connection is None:
+            connection = SubstrateConnection(url)
+            _connections[url] = connection
+    return connection
+
+
+def query_multi(url: str, queries: List[StorageQuery]) -> list:
+    connection = get_connection(url)
+    with connection.lock:
+        try:
+            return _query_multi(connection.substrate, queries)
+        except (WebSocketConnectionClosedException, ConnectionError):
+            connection.substrate.connect_websocket()
+            return _query_multi(connection.substrate, queries)
+
+
+def _query_multi(substrate: SubstrateInterface, queries: List[StorageQuery]) -> list:
+    # every key is read at the same pinned block so the values are consistent
+    block_hash = substrate.get_chain_head()
+    substrate.init_runtime(block_hash=block_hash)
+
+    storage_keys = []
+    for module, storage_function, params in queries:
+        metadata_module = substrate.get_metadata_module(module, block_hash=block_hash)
+        storage_item = substrate.get_metadata_storage_function(
+            module, storage_function, block_hash=block_hash
+        )
+        if not metadata_module or not storage_item:
+            raise StorageFunctionNotFound(
+                f'Storage function "{module}.{storage_function}" not found'
+            )
+
+        param_types = storage_item.get_params_type_string()
+        encoded_params = []
+        for param_type, param in zip(param_types, params):
+            param = substrate.convert_storage_parameter(param_type, param)
+            param_obj = substrate.runtime_config.create_scale_object(
+                type_string=param_type
+            )
+            encoded_params.append(param_obj.encode(param))
+
+        storage_hash = substrate.generate_storage_hash(
+            storage_module=metadata_module.value["storage"]["prefix"],
+            storage_function=storage_function,
+            params=encoded_params,
+            hashers=storage_item.get_param_hashers(),
+        )
+        storage_keys.append((storage_hash, storage_item))
+
+    response = substrate.rpc_request(
+        "state_queryStorageAt",
+        [[storage_hash for storage_hash, _ in storage_keys], block_hash],
+    )
+    if "error" in response:
+        raise SubstrateRequestException(response["error"]["message"])
+
+    changes = {}
+    for change_set in response["result"]:
+        for storage_hash, data in change_set["changes"]:
+            changes[storage_hash] = data
+
+    results = []
+    for storage_hash, storage_item in storage_keys:
+        value_scale_type = storage_item.get_value_type_string()
+        data = changes.get(storage_hash)
+        if data is None:
+            if storage_item.value["modifier"] != "Default":
+                # No result is interpreted as an Option<...> result
+                value_scale_type = f"Option<{value_scale_type}>"
+            data = storage_item.value_object["default"].value_object
+
+        result = substrate.runtime_config.create_scale_object(
+            type_string=value_scale_type,
+            data=ScaleBytes(data),
+            metadata=substrate.metadata_decoder,
+        )
+        result.decode()
+        results.append(result)
+
+    return results
@@ -3,6 +3,10 @@ def dot_wei_to_ether(wei: str) -> float:
     return ether_value
 
 
+def planck_to_units(planck: str, decimals: int) -> float:
+    return float(planck) / 10**decimals
+
+
 def calc_net_profit(market_price: float, avg_cost: float, total_size: float) -> float:
     net_profit = (market_price - avg_cost) * total_size
     return net_profit
@@ -0,0 +1,98 @@
+import importlib
+import json
+import os
+from abc import ABC, abstractmethod
+from dataclasses import fields as dataclass_fields
+from typing import Any, Callable, Dict, List, Tuple, Type
+
+from common.models import RawSnapshot
+
+# adapter name -> class, filled in by @register_venue when the module that
+# defines the adapter is imported
+VENUE_ADAPTERS: Dict[str, Type["VenueAdapter"]] = {}
+
+# module is imported for its @register_venue side effect; timeout is seconds
+# from the start of the fan-out
+DEFAULT_VENUES = [
+    {"adapter": "ftx", "module": "flows.flow_ftx_data", "timeout": 60},
+    {"adapter": "binance", "module": "flows.flow_binance_data", "timeout": 120},
+    {"adapter": "dot", "module": "flows.flow_dot_data", "timeout": 300},
+    {"adapter": "pps", "module": "flows.flow_pps_data", "timeout": 600},
+]
+# no venue may run past this, whatever its own timeout
+COLLECT_DEADLINE = float(os.environ.get("HEDGE_COLLECT_DEADLINE", 600))
+
+VenueCall = Tuple[Callable, tuple]
+
+
+class VenueAdapter(ABC):
+    def __init__(self, name: str, timeout: float, **options) -> None:
+        self.name = name
+        self.timeout = timeout
+        self.options = options
+
+    # role -> (task, args); the usual roles are balances, cost_basis,
+    # settlements and mark_price
+    @abstractmethod
+    def calls(self) -> Dict[str, VenueCall]:
+        ...
+
+    # role -> task result, mapped onto RawSnapshot fields
+    @abstractmethod
+    def fields(self, results: Dict[str, Any]) -> Dict[str, float]:
+        ...
+
+
+def register_venue(name: str):
+    def register(adapter: Type[VenueAdapter]) -> Type[VenueAdapter]:
+        VENUE_ADAPTERS[name] = adapter
+        return adapter
+
+    return register
+
+
+def load_venues(config: List[dict] = None) -> List[VenueAdapter]:
+    # HEDGE_VENUES takes a JSON list shaped like DEFAULT_VENUES, with an
+    # optional "name" and adapter "options" per entry
+    if config is None:
+        override = os.environ.get("HEDGE_VENUES")
+        config = json.loads(override) if override else DEFAULT_VENUES
+
+    adapters = []
+    for entry in config:
+        importlib.import_module(entry["module"])
+        adapter = VENUE_ADAPTERS.get(entry["adapter"])
+        if adapter is None:
+            raise ValueError(
+                f"{entry['module']} does not register venue {entry['adapter']}"
+            )
+        adapters.append(
+            adapter(
+                entry.get("name", entry["adapter"]),
+                entry["timeout"],
+                **entry.get("options", {}),
+            )
+        )
+    return adapters
+
+
+def merge_venue_fields(
+    unix_time: int,
+    adapters: List[VenueAdapter],
+    venue_results: Dict[str, Dict[str, Any]],
+) -> RawSnapshot:
+    merged = {}
+    for adapter in adapters:
+        for name, value in adapter.fields(venue_results[adapter.name]).items():
+            if name in merged:
+                raise ValueError(f"{adapter.name} sets {name} twice")
+            merged[name] = value
+
+    expected = {field.name for field in dataclass_fields(RawSnapshot)} - {"unix_time"}
+    missing = expected - merged.keys()
+    unknown = merged.keys() - expected
+    if missing or unknown:
+        raise ValueError(
+            f"venues leave {sorted(missing)} unset and set unknown {sorted(unknown)}"
+        )
+    return RawSnapshot(unix_time=unix_time, **merged)
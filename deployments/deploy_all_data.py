@@ -3,9 +3,13 @@ from prefect.filesystems import RemoteFileSystem
 from prefect.orion.schemas.schedules import CronSchedule
 
 from flows.flow_all_data import collect_all_data_flow
+from flows.flow_db import migrate_db_flow
 
 
 def main():
+    # schema changes are applied once here rather than on every collection run
+    migrate_db_flow()
+
     remote_file_system_block = RemoteFileSystem.load("storage-hedge-pnl")
     deployment = Deployment.build_from_flow(
         flow=collect_all_data_flow,
@@ -0,0 +1,22 @@
+from prefect.deployments import Deployment
+from prefect.filesystems import RemoteFileSystem
+from prefect.orion.schemas.schedules import CronSchedule
+
+from flows.flow_archive import archive_tables_flow
+
+
+def main():
+    remote_file_system_block = RemoteFileSystem.load("storage-hedge-pnl")
+    deployment = Deployment.build_from_flow(
+        flow=archive_tables_flow,
+        name="Archive Hedge Tables Deployment",
+        work_queue_name="staking-pnl-env",
+        storage=remote_file_system_block,
+        # daily at 03:30 HKT, clear of the 6-hourly collections
+        schedule=(CronSchedule(cron="30 3 * * *", timezone="Asia/Hong_Kong")),
+    )
+    deployment.apply()
+
+
+if __name__ == "__main__":
+    main()
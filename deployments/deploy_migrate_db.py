@@ -0,0 +1,19 @@
+from prefect.deployments import Deployment
+from prefect.filesystems import RemoteFileSystem
+
+from flows.flow_db import migrate_db_flow
+
+
+def main():
+    remote_file_system_block = RemoteFileSystem.load("storage-hedge-pnl")
+    deployment = Deployment.build_from_flow(
+        flow=migrate_db_flow,
+        name="Migrate Database Deployment",
+        work_queue_name="staking-pnl-env",
+        storage=remote_file_system_block,
+    )
+    deployment.apply()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+from prefect.deployments import Deployment
+from prefect.filesystems import RemoteFileSystem
+from prefect.orion.schemas.schedules import CronSchedule
+
+from flows.flow_positions_data import collect_positions_flow
+
+
+def main():
+    remote_file_system_block = RemoteFileSystem.load("storage-hedge-pnl")
+    deployment = Deployment.build_from_flow(
+        flow=collect_positions_flow,
+        name="Collect Positions Deployment",
+        work_queue_name="staking-pnl-env",
+        storage=remote_file_system_block,
+        # every 6 hours HKT, half an hour after the full collection: both walk
+        # the cTrader deal cursors and the Binance and reward ledgers, and the
+        # full collection is cut off after HEDGE_COLLECT_DEADLINE (600s)
+        schedule=(CronSchedule(cron="30 */6 * * *", timezone="Asia/Hong_Kong")),
+    )
+    deployment.apply()
+
+
+if __name__ == "__main__":
+    main()
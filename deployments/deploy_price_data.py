@@ -0,0 +1,22 @@
+from prefect.deployments import Deployment
+from prefect.filesystems import RemoteFileSystem
+from prefect.orion.schemas.schedules import CronSchedule
+
+from flows.flow_price_data import collect_price_snapshot_flow
+
+
+def main():
+    remote_file_system_block = RemoteFileSystem.load("storage-hedge-pnl")
+    deployment = Deployment.build_from_flow(
+        flow=collect_price_snapshot_flow,
+        name="Collect Price Snapshot Deployment",
+        work_queue_name="staking-pnl-env",
+        storage=remote_file_system_block,
+        # every minute, between the 6-hourly full collections
+        schedule=(CronSchedule(cron="* * * * *", timezone="Asia/Hong_Kong")),
+    )
+    deployment.apply()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+from prefect.deployments import Deployment
+from prefect.filesystems import RemoteFileSystem
+from prefect.orion.schemas.schedules import CronSchedule
+
+from flows.flow_price_feed import stream_prices_flow
+
+
+def main():
+    remote_file_system_block = RemoteFileSystem.load("storage-hedge-pnl")
+    deployment = Deployment.build_from_flow(
+        flow=stream_prices_flow,
+        name="Stream Binance Prices Deployment",
+        work_queue_name="staking-pnl-env",
+        storage=remote_file_system_block,
+        # hourly, each run overlapping the next by the averaging window
+        schedule=(CronSchedule(cron="0 * * * *", timezone="Asia/Hong_Kong")),
+    )
+    deployment.apply()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+from prefect.deployments import Deployment
+from prefect.filesystems import RemoteFileSystem
+
+from flows.flow_db import rebuild_rollups_flow
+
+
+def main():
+    remote_file_system_block = RemoteFileSystem.load("storage-hedge-pnl")
+    deployment = Deployment.build_from_flow(
+        flow=rebuild_rollups_flow,
+        name="Rebuild Rollups Deployment",
+        work_queue_name="staking-pnl-env",
+        storage=remote_file_system_block,
+    )
+    deployment.apply()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,209 +1,67 @@
 import time
+from dataclasses import asdict
 
 from prefect import flow, get_run_logger
 
-from flows.flow_binance_data import collect_binance_raw_data_flow
-from flows.flow_dot_data import collect_dot_raw_data_flow
-from flows.flow_ftx_data import collect_ftx_raw_data_flow
-from flows.flow_pps_data import collect_pps_raw_data_flow
-from tasks.task_db import (
-    create_derived_data_table,
-    create_raw_data_table,
-    get_last_derived_value,
-    get_last_raw_value,
-    write_derived_data_to_db,
-    write_raw_data_to_db,
-)
+from common.derived import derive_snapshot
+from common.fanout import join_venues, run_venues_sequentially, submit_venues
+from common.venues import COLLECT_DEADLINE, load_venues, merge_venue_fields
+from tasks.task_db import get_last_snapshot, write_snapshots_to_db
+from tasks.task_metrics import export_metrics
 
 
 @flow(name="Collect all data")
-def collect_all_data_flow(dry_run: bool = False):
+def collect_all_data_flow(dry_run: bool = False, concurrent: bool = True):
     logger = get_run_logger()
     logger.info("Collecting raw data")
 
-    create_raw_data_table()
-    create_derived_data_table()
-
-    unix_time = int(time.time())
-
-    (
-        ftx_dot_balance,
-        ftx_cost_size,
-        ftx_cost_avg_price,
-        ftx_settled_size,
-        ftx_settled_avg_price,
-    ) = collect_ftx_raw_data_flow()
-
-    (
-        binance_cost_size,
-        binance_avg_price,
-        dot_market_price,
-    ) = collect_binance_raw_data_flow()
-
-    (
-        dot_total_balance,
-        dot_staked_balance,
-        dot_total_rewards,
-    ) = collect_dot_raw_data_flow()
-
-    (
-        pps_acct_balance,
-        pps_open_margin,
-        pps_open_dot_size,
-        pps_open_dot_avg_price,
-        pps_open_swap,
-        pps_closed_swap,
-        pps_realized_pnl,
-    ) = collect_pps_raw_data_flow()
-
-    logger.info("Collecting raw data complete")
-
-    logger.info("Calculating derived data")
-
-    pps_open_pnl = (pps_open_dot_avg_price - dot_market_price) * abs(pps_open_dot_size)
-
-    pps_open_liquid_value = pps_open_margin + pps_open_pnl + pps_open_swap
-
-    pps_total_swap = pps_open_swap + pps_closed_swap
-
-    dot_liquid_value = (
-        dot_total_balance * dot_market_price + ftx_dot_balance * dot_market_price
-    )
-
-    total_liquid_value = pps_open_liquid_value + dot_liquid_value
-
-    prev_liquid_value = get_last_derived_value("total_liquid_value")
-
-    if prev_liquid_value is None:
-        liquid_value_diff = 0
-    else:
-        liquid_value_diff = total_liquid_value - prev_liquid_value
-
-    total_cost = (
-        ftx_cost_size * ftx_cost_avg_price
-        + binance_cost_size * binance_avg_price
-        + pps_open_margin
-    )
-
-    prev_cost = get_last_derived_value("total_cost")
-
-    if prev_cost is None:
-        cost_diff = 0
-    else:
-        cost_diff = total_cost - prev_cost
-
-    total_settled = ftx_settled_size * ftx_settled_avg_price
-
-    prev_settled = get_last_derived_value("total_settled")
-
-    if prev_settled is None:
-        settled_diff = 0
-    else:
-        settled_diff = total_settled - prev_settled
-
-    prev_pps_pnl = get_last_raw_value("pps_realized_pnl")
-
-    if prev_pps_pnl is None:
-        pps_pnl_diff = 0
-    else:
-        pps_pnl_diff = pps_realized_pnl - prev_pps_pnl
-
-    prev_pps_swap = get_last_raw_value("pps_closed_swap")
-
-    if prev_pps_swap is None:
-        pps_swap_diff = 0
-    else:
-        pps_swap_diff = pps_closed_swap - prev_pps_swap
-
-    staked_ratio = dot_staked_balance / (dot_total_balance + ftx_dot_balance) * 100
-
-    if pps_open_margin == 0:
-        margin_ratio = 1
-    else:
-        margin_ratio = ((pps_acct_balance + pps_open_pnl) / pps_open_margin) * 100
-
-    dot_net_position = dot_total_balance + ftx_dot_balance + pps_open_dot_size
-
-    dot_fees = (
-        ftx_cost_size
-        + binance_cost_size
-        - (ftx_settled_size + ftx_dot_balance + dot_total_balance)
-        + dot_total_rewards
-    )
-
-    pnl = liquid_value_diff - cost_diff + settled_diff + pps_pnl_diff + pps_swap_diff
-
-    logger.info("Calculating derived data complete")
-
-    logger.info(f"Raw - FTX DOT balance: {ftx_dot_balance}")
-    logger.info(f"Raw - FTX cost size: {ftx_cost_size}")
-    logger.info(f"Raw - FTX cost avg price: {ftx_cost_avg_price}")
-    logger.info(f"Raw - FTX settled size: {ftx_settled_size}")
-    logger.info(f"Raw - FTX settled avg price: {ftx_settled_avg_price}")
-    logger.info(f"Raw - Binance cost size: {binance_cost_size}")
-    logger.info(f"Raw - Binance cost avg price: {binance_avg_price}")
-    logger.info(f"Raw - DOT market price: {dot_market_price}")
-    logger.info(f"Raw - DOT total balance: {dot_total_balance}")
-    logger.info(f"Raw - DOT staked balance: {dot_staked_balance}")
-    logger.info(f"Raw - DOT total rewards: {dot_total_rewards}")
-    logger.info(f"Raw - PPS account balance: {pps_acct_balance}")
-    logger.info(f"Raw - PPS open margin: {pps_open_margin}")
-    logger.info(f"Raw - PPS open DOT size: {pps_open_dot_size}")
-    logger.info(f"Raw - PPS open DOT avg price: {pps_open_dot_avg_price}")
-    logger.info(f"Raw - PPS open swap: {pps_open_swap}")
-    logger.info(f"Raw - PPS closed swap: {pps_closed_swap}")
-    logger.info(f"Raw - PPS realized pnl: {pps_realized_pnl}")
-    logger.info(f"Derived - PPS open PnL: {pps_open_pnl}")
-    logger.info(f"Derived - PPS open liquid value: {pps_open_liquid_value}")
-    logger.info(f"Derived - PPS total swap: {pps_total_swap}")
-    logger.info(f"Derived - DOT liquid value: {dot_liquid_value}")
-    logger.info(f"Derived - Total liquid value: {total_liquid_value}")
-    logger.info(f"Derived - Total cost: {total_cost}")
-    logger.info(f"Derived - Total settled: {total_settled}")
-    logger.info(f"Derived - Staked ratio: {staked_ratio}")
-    logger.info(f"Derived - Margin ratio: {margin_ratio}")
-    logger.info(f"Derived - DOT net position: {dot_net_position}")
-    logger.info(f"Derived - DOT fees: {dot_fees}")
-    logger.info(f"Derived - PnL: {pnl}")
-
-    if dry_run:
-        return
-
-    write_raw_data_to_db(
-        unix_time,
-        ftx_dot_balance,
-        ftx_cost_size,
-        ftx_cost_avg_price,
-        ftx_settled_size,
-        ftx_settled_avg_price,
-        dot_market_price,
-        dot_total_balance,
-        dot_staked_balance,
-        dot_total_rewards,
-        pps_acct_balance,
-        pps_open_margin,
-        pps_open_dot_size,
-        pps_open_dot_avg_price,
-        pps_open_swap,
-        pps_closed_swap,
-        pps_realized_pnl,
-    )
-
-    write_derived_data_to_db(
-        unix_time,
-        pps_open_pnl,
-        pps_open_liquid_value,
-        pps_total_swap,
-        dot_liquid_value,
-        total_liquid_value,
-        total_cost,
-        total_settled,
-        staked_ratio,
-        margin_ratio,
-        dot_net_position,
-        dot_fees,
-        pnl,
-    )
+    try:
+        unix_time = int(time.time())
+
+        prev_snapshot = get_last_snapshot()
+
+        adapters = load_venues()
+        if concurrent:
+            started = time.time()
+            venue_futures = submit_venues(adapters)
+            venue_results, timings = join_venues(
+                adapters, venue_futures, started, COLLECT_DEADLINE
+            )
+        else:
+            venue_results, timings = run_venues_sequentially(adapters)
+
+        for venue, elapsed in sorted(timings.items(), key=lambda t: t[1], reverse=True):
+            logger.info(f"Timing - {venue}: {elapsed:.2f}s")
+
+        logger.info("Collecting raw data complete")
+
+        logger.info("Calculating derived data")
+
+        raw = merge_venue_fields(unix_time, adapters, venue_results)
+        derived = derive_snapshot(raw, prev_snapshot)
+
+        logger.info("Calculating derived data complete")
+
+        for name, value in asdict(raw).items():
+            if name != "unix_time":
+                logger.info(f"Raw - {name}: {value}")
+        logger.info(f"Derived - PPS open PnL: {derived.pps_open_pnl}")
+        logger.info(f"Derived - PPS open liquid value: {derived.pps_open_liquid_value}")
+        logger.info(f"Derived - PPS total swap: {derived.pps_total_swap}")
+        logger.info(f"Derived - DOT liquid value: {derived.dot_liquid_value}")
+        logger.info(f"Derived - Total liquid value: {derived.total_liquid_value}")
+        logger.info(f"Derived - Total cost: {derived.total_cost}")
+        logger.info(f"Derived - Total settled: {derived.total_settled}")
+        logger.info(f"Derived - Staked ratio: {derived.staked_ratio}")
+        logger.info(f"Derived - Margin ratio: {derived.margin_ratio}")
+        logger.info(f"Derived - DOT net position: {derived.dot_net_position}")
+        logger.info(f"Derived - DOT fees: {derived.dot_fees}")
+        logger.info(f"Derived - PnL: {derived.pnl}")
+
+        if not dry_run:
+            write_snapshots_to_db([raw], [derived])
+    finally:
+        export_metrics("collect_all_data", persist=not dry_run)
 
 
 if __name__ == "__main__":
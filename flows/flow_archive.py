@@ -0,0 +1,15 @@
+from prefect import flow, get_run_logger
+
+from tasks.task_archive import archive_tables
+
+
+@flow(name="Archive hedge tables")
+def archive_tables_flow(full: bool = False):
+    logger = get_run_logger()
+    logger.info("Archiving hedge tables to Parquet")
+
+    archive_tables(full)
+
+
+if __name__ == "__main__":
+    archive_tables_flow()
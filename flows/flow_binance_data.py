@@ -1,8 +1,26 @@
 from prefect import flow, get_run_logger
 
+from common.venues import VenueAdapter, register_venue
 from tasks.task_binance import binance_get_dot_cost, binance_get_dot_price
 
 
+@register_venue("binance")
+class BinanceVenue(VenueAdapter):
+    def calls(self):
+        return {
+            "cost_basis": (binance_get_dot_cost, ()),
+            "mark_price": (binance_get_dot_price, ()),
+        }
+
+    def fields(self, results):
+        cost_size, avg_price = results["cost_basis"]
+        return {
+            "binance_cost_size": cost_size,
+            "binance_avg_price": avg_price,
+            "dot_market_price": results["mark_price"],
+        }
+
+
 @flow(name="Collect Binance raw data")
 def collect_binance_raw_data_flow():
     logger = get_run_logger()
@@ -1,6 +1,13 @@
 from prefect import flow, get_run_logger
 
-from tasks.task_db import drop_table
+from common.derived import compute_derived
+from tasks.task_db import (
+    drop_table,
+    load_raw_history,
+    migrate_database,
+    rebuild_rollups,
+    replace_derived_data,
+)
 
 
 @flow(name="Drop table")
@@ -13,3 +20,39 @@ def drop_table_flow(table_name: str):
         return
 
     drop_table(table_name)
+
+    # recreate whatever the migrations own, as an empty table
+    migrate_database(reapply=True)
+
+
+@flow(name="Migrate database")
+def migrate_db_flow():
+    logger = get_run_logger()
+    logger.info("Migrating database schema")
+
+    migrate_database()
+
+
+@flow(name="Recompute derived data")
+def recompute_derived_flow(dry_run: bool = False):
+    logger = get_run_logger()
+    logger.info("Recomputing derived data from raw history")
+
+    raw = load_raw_history()
+    derived = compute_derived(raw)
+
+    if len(derived["unix_time"]):
+        logger.info(f"Cumulative PnL: {derived['pnl'].sum()}")
+
+    if dry_run:
+        return
+
+    replace_derived_data(derived)
+
+
+@flow(name="Rebuild rollups")
+def rebuild_rollups_flow():
+    logger = get_run_logger()
+    logger.info("Rebuilding hedge data rollups")
+
+    rebuild_rollups()
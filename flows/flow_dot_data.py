@@ -1,7 +1,26 @@
 from prefect import flow, get_run_logger
-from prefect.blocks.system import String
 
-from tasks.task_dot import dot_get_balance, dot_get_rewards, dot_get_staked_balance
+from common.blocks import load_string
+from common.venues import VenueAdapter, register_venue
+from tasks.task_dot import dot_get_balances, dot_get_rewards
+
+
+@register_venue("dot")
+class DotVenue(VenueAdapter):
+    def calls(self):
+        dot_address = self.options.get("address") or load_string("dot-address")
+        return {
+            "balances": (dot_get_balances, (dot_address,)),
+            "rewards": (dot_get_rewards, (dot_address,)),
+        }
+
+    def fields(self, results):
+        total_balance, staked_balance = results["balances"]
+        return {
+            "dot_total_balance": total_balance,
+            "dot_staked_balance": staked_balance,
+            "dot_total_rewards": results["rewards"],
+        }
 
 
 @flow(name="Collect DOT raw data")
@@ -9,10 +28,9 @@ def collect_dot_raw_data_flow():
     logger = get_run_logger()
     logger.info("Collecting DOT raw data")
 
-    dot_address = String.load("dot-address").value
+    dot_address = load_string("dot-address")
 
-    dot_total_balance = dot_get_balance(dot_address)
-    dot_staked_balance = dot_get_staked_balance(dot_address)
+    dot_total_balance, dot_staked_balance = dot_get_balances(dot_address)
     dot_total_rewards = dot_get_rewards(dot_address)
 
     return dot_total_balance, dot_staked_balance, dot_total_rewards
@@ -1,8 +1,30 @@
 from prefect import flow, get_run_logger
 
+from common.venues import VenueAdapter, register_venue
 from tasks.task_ftx import ftx_get_dot_balance, ftx_get_dot_cost, ftx_get_dot_settlement
 
 
+@register_venue("ftx")
+class FtxVenue(VenueAdapter):
+    def calls(self):
+        return {
+            "balances": (ftx_get_dot_balance, ()),
+            "cost_basis": (ftx_get_dot_cost, ()),
+            "settlements": (ftx_get_dot_settlement, ()),
+        }
+
+    def fields(self, results):
+        cost_size, cost_avg_price = results["cost_basis"]
+        settled_size, settled_avg_price = results["settlements"]
+        return {
+            "ftx_dot_balance": results["balances"],
+            "ftx_cost_size": cost_size,
+            "ftx_cost_avg_price": cost_avg_price,
+            "ftx_settled_size": settled_size,
+            "ftx_settled_avg_price": settled_avg_price,
+        }
+
+
 @flow(name="Collect FTX raw data")
 def collect_ftx_raw_data_flow():
     logger = get_run_logger()
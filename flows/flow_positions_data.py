@@ -0,0 +1,92 @@
+import time
+
+from prefect import flow, get_run_logger
+
+from common.models import AssetHedgeSnapshot, AssetSnapshot, HedgeAccountSnapshot
+from tasks.task_db import write_asset_snapshots_to_db
+from tasks.task_metrics import export_metrics
+from tasks.task_positions import (
+    load_tracked_positions,
+    positions_get_binance,
+    positions_get_chain_balances,
+    positions_get_hedges,
+    positions_get_rewards,
+)
+
+
+@flow(name="Collect positions")
+def collect_positions_flow(dry_run: bool = False):
+    logger = get_run_logger()
+
+    try:
+        unix_time = int(time.time())
+
+        positions = load_tracked_positions()
+        logger.info(f"Collecting {len(positions)} account and asset pairs")
+
+        # one batched task per venue, all running at once
+        futures = [
+            positions_get_chain_balances.submit(positions),
+            positions_get_rewards.submit(positions),
+            positions_get_binance.submit(positions),
+            positions_get_hedges.submit(positions),
+        ]
+        balances, rewards, binance, hedges = [future.result() for future in futures]
+        account_id, acct_balance, hedge_legs = hedges
+
+        snapshots = []
+        for position in positions:
+            key = position.key
+            total_balance, staked_balance = balances[key]
+            snapshot = AssetSnapshot(
+                unix_time=unix_time,
+                account=position.account,
+                asset=position.asset,
+                total_balance=total_balance,
+                staked_balance=staked_balance,
+                total_rewards=rewards[key],
+            )
+            snapshots.append(snapshot)
+            logger.info(f"Positions - {position.account}/{position.asset}: {snapshot}")
+
+        # the venue legs are per asset, shared by every account holding it
+        hedge_snapshots = []
+        for asset, binance_leg in binance.items():
+            binance_cost_size, binance_avg_price, market_price = binance_leg
+            (
+                hedge_open_margin,
+                hedge_open_size,
+                hedge_open_avg_price,
+                hedge_open_swap,
+                hedge_closed_swap,
+                hedge_realized_pnl,
+            ) = hedge_legs[asset]
+            hedge_snapshot = AssetHedgeSnapshot(
+                unix_time=unix_time,
+                asset=asset,
+                market_price=market_price,
+                binance_cost_size=binance_cost_size,
+                binance_avg_price=binance_avg_price,
+                hedge_open_margin=hedge_open_margin,
+                hedge_open_size=hedge_open_size,
+                hedge_open_avg_price=hedge_open_avg_price,
+                hedge_open_swap=hedge_open_swap,
+                hedge_closed_swap=hedge_closed_swap,
+                hedge_realized_pnl=hedge_realized_pnl,
+            )
+            hedge_snapshots.append(hedge_snapshot)
+            logger.info(f"Hedges - {asset}: {hedge_snapshot}")
+
+        account = HedgeAccountSnapshot(
+            unix_time=unix_time, account_id=account_id, acct_balance=acct_balance
+        )
+        logger.info(f"Hedge account - {account}")
+
+        if not dry_run:
+            write_asset_snapshots_to_db(snapshots, hedge_snapshots, account)
+    finally:
+        export_metrics("collect_positions", persist=not dry_run)
+
+
+if __name__ == "__main__":
+    collect_positions_flow(dry_run=True)
@@ -1,34 +1,47 @@
 from prefect import flow, get_run_logger
-from prefect.blocks.system import String
 
-from tasks.task_pps import pps_get_all_data, pps_token_refresh
+from common.venues import VenueAdapter, register_venue
+from tasks.task_pps import pps_get_all_data, pps_save_blocks, pps_token_refresh
+
+
+@register_venue("pps")
+class PpsVenue(VenueAdapter):
+    def calls(self):
+        return {"positions": (pps_get_all_data, ())}
+
+    def fields(self, results):
+        snapshot = results["positions"]
+        return {
+            "pps_acct_balance": snapshot.acct_balance,
+            "pps_open_margin": snapshot.open_margin,
+            "pps_open_dot_size": snapshot.open_dot_size,
+            "pps_open_dot_avg_price": snapshot.open_dot_avg_price,
+            "pps_open_swap": snapshot.open_swap,
+            "pps_closed_swap": snapshot.closed_swap,
+            "pps_realized_pnl": snapshot.realized_pnl,
+        }
 
 
 @flow(name="Collect PPS raw data")
-def collect_pps_raw_data_flow():
+def collect_pps_raw_data_flow(full_history: bool = False, persist_blocks: bool = False):
     logger = get_run_logger()
     logger.info("Collecting PPS raw data")
 
-    pps_get_all_data()
-
-    pps_acct_balance = float(String.load("pps-acct-balance").value)
-
-    pps_open_margin = float(String.load("pps-open-margin").value)
-    pps_open_dot_size = float(String.load("pps-open-dot-size").value)
-    pps_open_dot_avg_price = float(String.load("pps-open-dot-avg-price").value)
-    pps_open_swap = float(String.load("pps-open-swap").value)
+    pps_snapshot = pps_get_all_data(full_history)
 
-    pps_closed_swap = float(String.load("pps-closed-swap").value)
-    pps_realized_pnl = float(String.load("pps-realized-pnl").value)
+    # the deal cursor already checkpoints the running totals in the database;
+    # the String blocks are only a convenience copy for the Prefect UI
+    if persist_blocks:
+        pps_save_blocks.submit(pps_snapshot)
 
     return (
-        pps_acct_balance,
-        pps_open_margin,
-        pps_open_dot_size,
-        pps_open_dot_avg_price,
-        pps_open_swap,
-        pps_closed_swap,
-        pps_realized_pnl,
+        pps_snapshot.acct_balance,
+        pps_snapshot.open_margin,
+        pps_snapshot.open_dot_size,
+        pps_snapshot.open_dot_avg_price,
+        pps_snapshot.open_swap,
+        pps_snapshot.closed_swap,
+        pps_snapshot.realized_pnl,
     )
 
 
@@ -0,0 +1,55 @@
+import time
+from dataclasses import replace
+
+from prefect import flow, get_run_logger
+
+from common.derived import derive_snapshot
+from common.models import PriceSnapshot
+from tasks.task_binance import binance_get_dot_price
+from tasks.task_db import get_last_snapshot, write_price_snapshot_to_db
+from tasks.task_metrics import export_metrics
+
+
+@flow(name="Collect price snapshot")
+def collect_price_snapshot_flow(dry_run: bool = False):
+    logger = get_run_logger()
+
+    try:
+        unix_time = int(time.time())
+
+        # positions only change on the full run, so its last raw row is reused and
+        # just marked to the current price
+        prev_snapshot = get_last_snapshot()
+        if prev_snapshot.raw is None:
+            logger.warning("No raw snapshot to mark against yet")
+            return
+
+        dot_market_price = binance_get_dot_price()
+
+        raw = replace(
+            prev_snapshot.raw, unix_time=unix_time, dot_market_price=dot_market_price
+        )
+        derived = derive_snapshot(raw)
+
+        snapshot = PriceSnapshot(
+            unix_time=unix_time,
+            dot_market_price=dot_market_price,
+            pps_open_pnl=derived.pps_open_pnl,
+            total_liquid_value=derived.total_liquid_value,
+            margin_ratio=derived.margin_ratio,
+            position_time=prev_snapshot.raw.unix_time,
+        )
+
+        logger.info(f"Price - DOT market price: {snapshot.dot_market_price}")
+        logger.info(f"Price - PPS open PnL: {snapshot.pps_open_pnl}")
+        logger.info(f"Price - Total liquid value: {snapshot.total_liquid_value}")
+        logger.info(f"Price - Margin ratio: {snapshot.margin_ratio}")
+
+        if not dry_run:
+            write_price_snapshot_to_db(snapshot)
+    finally:
+        export_metrics("collect_price_snapshot", persist=not dry_run)
+
+
+if __name__ == "__main__":
+    collect_price_snapshot_flow(dry_run=True)
@@ -0,0 +1,25 @@
+from typing import List
+
+from prefect import flow
+
+from tasks.task_binance import binance_stream_prices
+from tasks.task_metrics import export_metrics
+
+FEED_SYMBOLS = ["DOTBUSD"]
+# an hour between runs plus the averaging window, so the next run has a full
+# window before this one stops publishing
+FEED_RUN_SECONDS = 3900
+
+
+@flow(name="Stream Binance prices")
+def stream_prices_flow(
+    symbols: List[str] = FEED_SYMBOLS, run_seconds: int = FEED_RUN_SECONDS
+):
+    try:
+        binance_stream_prices(symbols, run_seconds)
+    finally:
+        export_metrics("stream_prices")
+
+
+if __name__ == "__main__":
+    stream_prices_flow()
@@ -1,6 +1,18 @@
-from binance.client import Client
+from typing import List
+
 from prefect import get_run_logger, task
-from prefect.blocks.system import Secret
+
+from common.binance import get_client, get_price_oracle
+from common.price_feed import run_price_feeds
+from common.store import (
+    get_filled_buy_totals,
+    get_order_watermark,
+    publish_price_quotes,
+    upsert_orders,
+)
+
+# allOrders returns at most this many orders per request
+ORDER_PAGE_SIZE = 1000
 
 
 @task(name="Binance DOT Cost Task")
@@ -8,19 +20,9 @@ def binance_get_dot_cost():
     logger = get_run_logger()
     logger.info("Binance - Getting DOT Cost")
 
-    api_key = Secret.load("binance-api-key").get()
-    api_secret = Secret.load("binance-api-secret").get()
+    sync_orders(get_client(), "DOTBUSD", logger)
 
-    client = Client(api_key=api_key, api_secret=api_secret)
-    orders = client.get_all_orders(symbol="DOTBUSD")
-
-    total_usd: float = 0
-    total_size: float = 0
-
-    for order in orders:
-        if order["status"].lower() == "filled" and order["side"].lower() == "buy":
-            total_usd += float(order["cummulativeQuoteQty"])
-            total_size += float(order["executedQty"])
+    total_size, total_usd = get_filled_buy_totals("DOTBUSD")
 
     avg_cost = total_usd / total_size
 
@@ -36,11 +38,33 @@ def binance_get_dot_price():
     logger = get_run_logger()
     logger.info("Binance - Getting DOT Market Price")
 
-    api_key = Secret.load("binance-api-key").get()
-    api_secret = Secret.load("binance-api-secret").get()
+    # served from the price feed deployment when it is running, otherwise
+    # from REST
+    dot_market_price: float = get_price_oracle().avg_price("DOTBUSD")
+
+    return dot_market_price
 
-    client = Client(api_key=api_key, api_secret=api_secret)
 
-    dot_market_price: float = float(client.get_avg_price(symbol="DOTBUSD")["price"])
+@task(name="Binance Price Feed Task")
+def binance_stream_prices(symbols: List[str], run_seconds: int):
+    logger = get_run_logger()
+    logger.info(f"Binance - Streaming {', '.join(symbols)} for {run_seconds}s")
 
-    return dot_market_price
+    published = run_price_feeds(symbols, run_seconds, publish_price_quotes)
+
+    logger.info(f"Binance - Published {published} price updates")
+
+
+def sync_orders(client, symbol: str, logger):
+    order_id = get_order_watermark(symbol)
+    while True:
+        orders = client.get_all_orders(
+            symbol=symbol, orderId=order_id, limit=ORDER_PAGE_SIZE
+        )
+        upsert_orders(symbol, orders)
+        logger.info(
+            f"Binance - Stored {len(orders)} {symbol} orders from id {order_id}"
+        )
+        if len(orders) < ORDER_PAGE_SIZE:
+            break
+        order_id = orders[-1]["orderId"] + 1
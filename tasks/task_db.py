@@ -1,8 +1,29 @@
-import psycopg2
+from typing import List
+
 from prefect import get_run_logger, task
-from prefect.blocks.system import Secret
 from psycopg2 import sql
 
+from common.db import connection
+from common.derived import Columns, columns_to_rows, rows_to_columns
+from common.migrations import apply_migrations
+from common.models import (
+    AssetHedgeSnapshot,
+    AssetSnapshot,
+    DerivedSnapshot,
+    HedgeAccountSnapshot,
+    LastSnapshot,
+    PriceSnapshot,
+    RawSnapshot,
+)
+from common.schema import DERIVED_TABLE, RAW_TABLE
+from common.store import (
+    rebuild_rollup_rows,
+    replace_derived_rows,
+    write_asset_snapshots,
+    write_price_snapshots,
+    write_snapshots,
+)
+
 
 @task
 def drop_table(table_name: str):
@@ -10,329 +31,141 @@ def drop_table(table_name: str):
 
     logger.info("Dropping table if exists")
 
-    database = Secret.load("prefect-psql-database").get()
-    host = Secret.load("prefect-psql-host").get()
-    user = Secret.load("prefect-psql-user").get()
-    password = Secret.load("prefect-psql-password").get()
-    conn = psycopg2.connect(
-        host=host,
-        database=database,
-        user=user,
-        password=password,
-    )
-    cur = conn.cursor()
-    cur.execute(
-        sql.SQL("DROP TABLE IF EXISTS {table_name}").format(
-            table_name=sql.Identifier(table_name)
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            sql.SQL("DROP TABLE IF EXISTS {table_name}").format(
+                table_name=sql.Identifier(table_name)
+            )
         )
-    )
 
-    conn.commit()
-    cur.close()
-    conn.close()
+
+@task
+def migrate_database(reapply: bool = False):
+    logger = get_run_logger()
+
+    logger.info("Applying pending schema migrations")
+
+    with connection() as conn:
+        applied = apply_migrations(conn, reapply=reapply)
+
+    for migration in applied:
+        logger.info(f"Applied migration {migration.version}: {migration.name}")
+
+    if not applied:
+        logger.info("Schema is up to date")
 
 
 @task
-def create_raw_data_table():
+def write_snapshots_to_db(raw: List[RawSnapshot], derived: List[DerivedSnapshot]):
     logger = get_run_logger()
 
-    logger.info("Creating raw data table if not exists")
-
-    database = Secret.load("prefect-psql-database").get()
-    host = Secret.load("prefect-psql-host").get()
-    user = Secret.load("prefect-psql-user").get()
-    password = Secret.load("prefect-psql-password").get()
-    conn = psycopg2.connect(
-        host=host,
-        database=database,
-        user=user,
-        password=password,
-    )
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS hedge_data_raw (
-            id SERIAL PRIMARY KEY,
-            unix_time BIGINT NOT NULL,
-            ftx_dot_balance DOUBLE PRECISION,
-            ftx_cost_size DOUBLE PRECISION,
-            ftx_cost_avg_price DOUBLE PRECISION,
-            ftx_settled_size DOUBLE PRECISION,
-            ftx_settled_avg_price DOUBLE PRECISION,
-            dot_market_price DOUBLE PRECISION,
-            dot_total_balance DOUBLE PRECISION,
-            dot_staked_balance DOUBLE PRECISION,
-            dot_total_rewards DOUBLE PRECISION,
-            pps_acct_balance DOUBLE PRECISION,
-            pps_open_margin DOUBLE PRECISION,
-            pps_open_dot_size DOUBLE PRECISION,
-            pps_open_dot_avg_price DOUBLE PRECISION,
-            pps_open_swap DOUBLE PRECISION,
-            pps_closed_swap DOUBLE PRECISION,
-            pps_realized_pnl DOUBLE PRECISION
-        );
-    """
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
-    return
+    logger.info(f"Writing {len(raw)} raw and {len(derived)} derived rows to db")
+
+    write_snapshots(raw, derived)
 
 
 @task
-def create_derived_data_table():
+def write_price_snapshot_to_db(snapshot: PriceSnapshot):
     logger = get_run_logger()
 
-    logger.info("Creating raw data table if not exists")
-
-    database = Secret.load("prefect-psql-database").get()
-    host = Secret.load("prefect-psql-host").get()
-    user = Secret.load("prefect-psql-user").get()
-    password = Secret.load("prefect-psql-password").get()
-    conn = psycopg2.connect(
-        host=host,
-        database=database,
-        user=user,
-        password=password,
-    )
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS hedge_data_derived (
-            id SERIAL PRIMARY KEY,
-            unix_time BIGINT NOT NULL,
-            pps_open_pnl DOUBLE PRECISION,
-            pps_open_liquid_value DOUBLE PRECISION,
-            pps_total_swap DOUBLE PRECISION,
-            dot_liquid_value DOUBLE PRECISION,
-            total_liquid_value DOUBLE PRECISION,
-            total_cost DOUBLE PRECISION,
-            total_settled DOUBLE PRECISION,
-            staked_ratio DOUBLE PRECISION,
-            margin_ratio DOUBLE PRECISION,
-            dot_net_position DOUBLE PRECISION,
-            dot_fees DOUBLE PRECISION,
-            pnl DOUBLE PRECISION
-        );
-    """
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
-    return
+    logger.info("Writing price snapshot to db")
+
+    write_price_snapshots([snapshot])
 
 
 @task
-def write_raw_data_to_db(
-    unix_time: int,
-    ftx_dot_balance: float,
-    ftx_cost_size: float,
-    ftx_cost_avg_price: float,
-    ftx_settled_size: float,
-    ftx_settled_avg_price: float,
-    dot_market_price: float,
-    dot_total_balance: float,
-    dot_staked_balance: float,
-    dot_total_rewards: float,
-    pps_acct_balance: float,
-    pps_open_margin: float,
-    pps_open_dot_size: float,
-    pps_open_dot_avg_price: float,
-    pps_open_swap: float,
-    pps_closed_swap: float,
-    pps_realized_pnl: float,
+def write_asset_snapshots_to_db(
+    snapshots: List[AssetSnapshot],
+    hedges: List[AssetHedgeSnapshot],
+    account: HedgeAccountSnapshot,
 ):
     logger = get_run_logger()
 
-    logger.info("Writing raw data to db")
-
-    database = Secret.load("prefect-psql-database").get()
-    host = Secret.load("prefect-psql-host").get()
-    user = Secret.load("prefect-psql-user").get()
-    password = Secret.load("prefect-psql-password").get()
-    conn = psycopg2.connect(
-        host=host,
-        database=database,
-        user=user,
-        password=password,
-    )
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO hedge_data_raw (
-            unix_time,
-            ftx_dot_balance,
-            ftx_cost_size,
-            ftx_cost_avg_price,
-            ftx_settled_size,
-            ftx_settled_avg_price,
-            dot_market_price,
-            dot_total_balance,
-            dot_staked_balance,
-            dot_total_rewards,
-            pps_acct_balance,
-            pps_open_margin,
-            pps_open_dot_size,
-            pps_open_dot_avg_price,
-            pps_open_swap,
-            pps_closed_swap,
-            pps_realized_pnl
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
-    """,
-        (
-            unix_time,
-            ftx_dot_balance,
-            ftx_cost_size,
-            ftx_cost_avg_price,
-            ftx_settled_size,
-            ftx_settled_avg_price,
-            dot_market_price,
-            dot_total_balance,
-            dot_staked_balance,
-            dot_total_rewards,
-            pps_acct_balance,
-            pps_open_margin,
-            pps_open_dot_size,
-            pps_open_dot_avg_price,
-            pps_open_swap,
-            pps_closed_swap,
-            pps_realized_pnl,
-        ),
+    logger.info(
+        f"Writing {len(snapshots)} asset snapshots and {len(hedges)} hedges to db"
     )
-    conn.commit()
-    cur.close()
-    conn.close()
-    return
+
+    write_asset_snapshots(snapshots, hedges, [account])
 
 
 @task
-def write_derived_data_to_db(
-    unix_time: int,
-    pps_open_pnl: float,
-    pps_open_liquid_value: float,
-    pps_total_swap: float,
-    dot_liquid_value: float,
-    total_liquid_value: float,
-    total_cost: float,
-    total_settled: float,
-    staked_ratio: float,
-    margin_ratio: float,
-    dot_net_position: float,
-    dot_fees: float,
-    pnl: float,
-):
+def load_raw_history() -> Columns:
     logger = get_run_logger()
 
-    logger.info("Writing raw data to db")
-
-    database = Secret.load("prefect-psql-database").get()
-    host = Secret.load("prefect-psql-host").get()
-    user = Secret.load("prefect-psql-user").get()
-    password = Secret.load("prefect-psql-password").get()
-    conn = psycopg2.connect(
-        host=host,
-        database=database,
-        user=user,
-        password=password,
+    query = sql.SQL("SELECT {columns} FROM {table} ORDER BY unix_time;").format(
+        columns=RAW_TABLE.column_list(),
+        table=RAW_TABLE.identifier,
     )
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO hedge_data_derived (
-            unix_time,
-            pps_open_pnl,
-            pps_open_liquid_value,
-            pps_total_swap,
-            dot_liquid_value,
-            total_liquid_value,
-            total_cost,
-            total_settled,
-            staked_ratio,
-            margin_ratio,
-            dot_net_position,
-            dot_fees,
-            pnl
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
-    """,
-        (
-            unix_time,
-            pps_open_pnl,
-            pps_open_liquid_value,
-            pps_total_swap,
-            dot_liquid_value,
-            total_liquid_value,
-            total_cost,
-            total_settled,
-            staked_ratio,
-            margin_ratio,
-            dot_net_position,
-            dot_fees,
-            pnl,
-        ),
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
-    return
+
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(query)
+        rows = cur.fetchall()
+
+    logger.info(f"Loaded {len(rows)} raw rows")
+
+    return rows_to_columns(rows, RAW_TABLE.columns)
 
 
 @task
-def get_last_raw_value(col_name: str) -> float:
+def replace_derived_data(derived: Columns):
     logger = get_run_logger()
 
-    logger.info(f"Getting last {col_name} value")
-
-    database = Secret.load("prefect-psql-database").get()
-    host = Secret.load("prefect-psql-host").get()
-    user = Secret.load("prefect-psql-user").get()
-    password = Secret.load("prefect-psql-password").get()
-    conn = psycopg2.connect(
-        host=host,
-        database=database,
-        user=user,
-        password=password,
-    )
-    cur = conn.cursor()
-    cur.execute(
-        f"SELECT {col_name} FROM hedge_data_raw ORDER BY unix_time DESC LIMIT 1;"
-    )
-    results = cur.fetchall()
-    if len(results) == 0:
-        return None
-    else:
-        raw_value = float(results[0][0])
+    rows = columns_to_rows(derived, DERIVED_TABLE.columns)
+    logger.info(f"Replacing derived data with {len(rows)} rows")
 
-    cur.close()
-    conn.close()
-    return raw_value
+    replace_derived_rows(rows)
 
 
 @task
-def get_last_derived_value(col_name: str) -> float:
+def rebuild_rollups():
     logger = get_run_logger()
 
-    logger.info(f"Getting last {col_name} value")
-
-    database = Secret.load("prefect-psql-database").get()
-    host = Secret.load("prefect-psql-host").get()
-    user = Secret.load("prefect-psql-user").get()
-    password = Secret.load("prefect-psql-password").get()
-    conn = psycopg2.connect(
-        host=host,
-        database=database,
-        user=user,
-        password=password,
-    )
-    cur = conn.cursor()
-    cur.execute(
-        f"SELECT {col_name} FROM hedge_data_derived ORDER BY unix_time DESC LIMIT 1;"
+    logger.info("Rebuilding rollups from derived data")
+
+    rebuild_rollup_rows()
+
+
+@task
+def get_last_snapshot() -> LastSnapshot:
+    logger = get_run_logger()
+
+    logger.info("Getting last raw and derived snapshot")
+
+    raw_columns = RAW_TABLE.columns
+
+    query = sql.SQL(
+        """
+        SELECT {raw_select}, {derived_select}
+        FROM (SELECT 1) AS anchor
+        LEFT JOIN LATERAL (
+            SELECT {raw_columns} FROM {raw_table}
+            ORDER BY unix_time DESC LIMIT 1
+        ) AS r ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT {derived_columns} FROM {derived_table}
+            ORDER BY unix_time DESC LIMIT 1
+        ) AS d ON TRUE;
+        """
+    ).format(
+        raw_select=RAW_TABLE.column_list("r"),
+        derived_select=DERIVED_TABLE.column_list("d"),
+        raw_columns=RAW_TABLE.column_list(),
+        derived_columns=DERIVED_TABLE.column_list(),
+        raw_table=RAW_TABLE.identifier,
+        derived_table=DERIVED_TABLE.identifier,
     )
-    results = cur.fetchall()
-    if len(results) == 0:
-        return None
-    else:
-        derived_value = float(results[0][0])
-
-    cur.close()
-    conn.close()
-    return derived_value
+
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(query)
+        row = cur.fetchone()
+
+    raw_values = row[: len(raw_columns)]
+    derived_values = row[len(raw_columns) :]
+
+    last_snapshot = LastSnapshot()
+    if raw_values[0] is not None:
+        last_snapshot.raw = RawSnapshot(*raw_values)
+    if derived_values[0] is not None:
+        last_snapshot.derived = DerivedSnapshot(*derived_values)
+
+    return last_snapshot
@@ -1,49 +1,35 @@
-import requests
 from prefect import get_run_logger, task
-from prefect.blocks.system import String
-from substrateinterface import SubstrateInterface
 
+from common.blocks import load_string
+from common.store import add_rewards, get_reward_watermark, get_total_rewards
+from common.subscan import iter_rewards_since
+from common.substrate import query_multi
 from common.utils import dot_wei_to_ether
 
 
-@task(name="DOT Balance Task")
-def dot_get_balance(address: str):
+@task(name="DOT Balances Task")
+def dot_get_balances(address: str):
     logger = get_run_logger()
-    logger.info("DOT - Getting Balance")
-
-    url = String.load("dot-rpc-url").value
-    substrate = SubstrateInterface(url=url)
-    result = substrate.query(
-        module="System",
-        storage_function="Account",
-        params=[address],
+    logger.info("DOT - Getting Balance and Staked Balance")
+
+    url = load_string("dot-rpc-url")
+    account, ledger = query_multi(
+        url,
+        [
+            ("System", "Account", [address]),
+            ("Staking", "Ledger", [address]),
+        ],
     )
-    total_balance = str(result["data"]["free"])
-    total_balance = dot_wei_to_ether(total_balance)
-
-    logger.info(f"DOT - Balance: {total_balance}")
-
-    return total_balance
-
 
-@task(name="DOT Staked Balance Task")
-def dot_get_staked_balance(address: str):
-    logger = get_run_logger()
-    logger.info("DOT - Getting Staked Balance")
-
-    url = String.load("dot-rpc-url").value
-    substrate = SubstrateInterface(url=url)
-    result = substrate.query(
-        module="Staking",
-        storage_function="Ledger",
-        params=[address],
-    )
-    staked_balance = str(result["active"])
+    total_balance = str(account["data"]["free"])
+    total_balance = dot_wei_to_ether(total_balance)
+    staked_balance = str(ledger["active"])
     staked_balance = dot_wei_to_ether(staked_balance)
 
+    logger.info(f"DOT - Balance: {total_balance}")
     logger.info(f"DOT - Staked Balance: {staked_balance}")
 
-    return staked_balance
+    return total_balance, staked_balance
 
 
 @task(name="DOT Total Reward Task")
@@ -51,23 +37,12 @@ def dot_get_rewards(address: str):
     logger = get_run_logger()
     logger.info("DOT - Getting Total Rewards")
 
-    url = "https://polkadot.api.subscan.io/api/scan/account/reward_slash"
-    data = {
-        "row": 100,
-        "page": 0,
-        "address": address,
-    }
-    headers = {
-        "Content-Type": "application/json",
-    }
-
-    r = requests.post(url, json=data, headers=headers)
-    rewards_data = r.json()
+    watermark = get_reward_watermark(address)
+    rewards = list(iter_rewards_since(address, watermark))
+    added = add_rewards(address, rewards)
+    logger.info(f"DOT - {added} new reward events since block {watermark}")
 
-    rewards = rewards_data["data"]["list"]
-    total_reward_amount = 0
-    for reward in rewards:
-        total_reward_amount += dot_wei_to_ether(reward["amount"])
+    total_reward_amount = dot_wei_to_ether(get_total_rewards(address))
 
     logger.info(f"DOT - Total Rewards: {total_reward_amount}")
 
@@ -1,6 +1,6 @@
 from prefect import get_run_logger, task
-from prefect.blocks.system import Secret, String
 
+from common.blocks import load_secret, load_string
 from common.ftx_client import FtxClient
 
 
@@ -9,18 +9,18 @@ def ftx_get_dot_cost():
     logger = get_run_logger()
     logger.info("FTX - Getting DOT Cost")
 
-    ftx_total_size = float(String.load("ftx-total-size").value)
-    ftx_avg_cost = float(String.load("ftx-avg-cost").value)
+    ftx_total_size = float(load_string("ftx-total-size"))
+    ftx_avg_cost = float(load_string("ftx-avg-cost"))
 
     return ftx_total_size, ftx_avg_cost
 
-    # api_key = Secret.load("ftx-api-key").get()
-    # api_secret = Secret.load("ftx-api-secret").get()
-    # subaccount_name = String.load("ftx-account").value
+    # api_key = load_secret("ftx-api-key")
+    # api_secret = load_secret("ftx-api-secret")
+    # subaccount_name = load_string("ftx-account")
     # ftx = FtxClient(
     #     api_key=api_key, api_secret=api_secret, subaccount_name=subaccount_name
     # )
-    # orders = ftx.get_order_history()
+    # orders = ftx.iter_order_history(market="DOT/USD")
     # total_usd: float = 0
     # total_size: float = 0
     # for order in orders:
@@ -57,13 +57,13 @@ def ftx_get_dot_settlement():
 
     return 0, 0
 
-    # api_key = Secret.load("ftx-api-key").get()
-    # api_secret = Secret.load("ftx-api-secret").get()
-    # subaccount_name = String.load("ftx-account").value
+    # api_key = load_secret("ftx-api-key")
+    # api_secret = load_secret("ftx-api-secret")
+    # subaccount_name = load_string("ftx-account")
     # ftx = FtxClient(
     #     api_key=api_key, api_secret=api_secret, subaccount_name=subaccount_name
     # )
-    # orders = ftx.get_order_history()
+    # orders = ftx.iter_order_history(market="DOT/USD")
     # total_usd: float = 0
     # total_size: float = 0
     # for order in orders:
@@ -100,14 +100,14 @@ def ftx_get_dot_withdrawn():
 
     return 0
 
-    # api_key = Secret.load("ftx-api-key").get()
-    # api_secret = Secret.load("ftx-api-secret").get()
-    # subaccount_name = String.load("ftx-account").value
-    # dot_address = String.load("dot-address").value
+    # api_key = load_secret("ftx-api-key")
+    # api_secret = load_secret("ftx-api-secret")
+    # subaccount_name = load_string("ftx-account")
+    # dot_address = load_string("dot-address")
     # ftx = FtxClient(
     #     api_key=api_key, api_secret=api_secret, subaccount_name=subaccount_name
     # )
-    # withdrawals = ftx.get_withdrawals()
+    # withdrawals = ftx.iter_withdrawals()
 
     # total_withdrawn = 0
     # for withdrawal in withdrawals:
@@ -126,9 +126,9 @@ def ftx_get_dot_balance():
 
     return 0
 
-    # api_key = Secret.load("ftx-api-key").get()
-    # api_secret = Secret.load("ftx-api-secret").get()
-    # subaccount_name = String.load("ftx-account").value
+    # api_key = load_secret("ftx-api-key")
+    # api_secret = load_secret("ftx-api-secret")
+    # subaccount_name = load_string("ftx-account")
     # ftx = FtxClient(
     #     api_key=api_key, api_secret=api_secret, subaccount_name=subaccount_name
     # )
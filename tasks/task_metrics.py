@@ -0,0 +1,28 @@
+import time
+
+from prefect import get_run_logger, task
+from prefect.context import get_run_context
+
+from common.metrics import export_totals, metrics
+from common.store import write_dependency_metrics
+
+
+@task(name="Export Metrics Task")
+def export_metrics(flow: str, persist: bool = True):
+    logger = get_run_logger()
+
+    flow_run_id = str(get_run_context().task_run.flow_run_id)
+    stats = metrics.drain()
+
+    for (dependency, operation), item in sorted(
+        stats.items(), key=lambda entry: entry[1].latency_sum, reverse=True
+    ):
+        logger.info(
+            f"Metrics - {dependency} {operation}: {item.calls} calls, "
+            f"{item.errors} errors, p95 {item.quantile(0.95):.3f}s, "
+            f"total {item.latency_sum:.3f}s"
+        )
+
+    export_totals(flow, stats)
+    if persist:
+        write_dependency_metrics(flow_run_id, int(time.time()), stats)
@@ -0,0 +1,209 @@
+import json
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from prefect import get_run_logger, task
+
+from common.binance import get_client, get_price_oracle
+from common.blocks import load_string
+from common.ctrader import get_session
+from common.endpoints import SUBSCAN_URL
+from common.models import DealCursor, TrackedPosition
+from common.store import (
+    add_rewards,
+    get_filled_buy_totals_by_symbol,
+    get_reward_watermark,
+    get_total_rewards_by_address,
+    load_deal_cursor,
+    save_deal_cursor,
+)
+from common.subscan import iter_rewards_since
+from common.substrate import query_multi
+from common.utils import planck_to_units
+from tasks.task_binance import sync_orders
+from tasks.task_pps import (
+    INITIAL_DEAL_TIMESTAMP,
+    agg_closed_deals,
+    get_account_balance,
+    parse_positions,
+)
+
+PositionKey = Tuple[str, str]
+
+
+def load_tracked_positions() -> List[TrackedPosition]:
+    # the hedge-positions String block holds a JSON list of TrackedPosition
+    # fields, e.g. [{"account": "main", "asset": "DOT", "address": ...}]
+    positions = [
+        TrackedPosition(**entry) for entry in json.loads(load_string("hedge-positions"))
+    ]
+    keys = [position.key for position in positions]
+    if len(set(keys)) != len(keys):
+        raise ValueError("hedge-positions lists an (account, asset) pair twice")
+
+    # Binance and cTrader each run one account, so an asset has one hedge
+    # however many staking accounts hold it
+    legs = {}
+    for position in positions:
+        leg = (position.binance_symbol, position.ctrader_symbol_id)
+        if legs.setdefault(position.asset, leg) != leg:
+            raise ValueError(
+                f"hedge-positions gives {position.asset} more than one "
+                "Binance symbol or cTrader symbol"
+            )
+    binance_symbols = [binance_symbol for binance_symbol, _ in legs.values()]
+    ctrader_symbols = [symbol_id for _, symbol_id in legs.values()]
+    for symbols in (binance_symbols, ctrader_symbols):
+        if len(set(symbols)) != len(symbols):
+            raise ValueError("hedge-positions hedges two assets with one symbol")
+    return positions
+
+
+def hedged_assets(positions: List[TrackedPosition]) -> Dict[str, TrackedPosition]:
+    # one position per asset, to read the venue legs they all share
+    assets = {}
+    for position in positions:
+        assets.setdefault(position.asset, position)
+    return assets
+
+
+@task(name="Positions Chain Balances Task")
+def positions_get_chain_balances(
+    positions: List[TrackedPosition],
+) -> Dict[PositionKey, Tuple[float, float]]:
+    logger = get_run_logger()
+
+    by_chain = defaultdict(list)
+    for position in positions:
+        by_chain[position.rpc_url].append(position)
+
+    balances = {}
+    for url, chain_positions in by_chain.items():
+        # every address on a chain is read in one query at one pinned block
+        queries = []
+        for position in chain_positions:
+            queries.append(("System", "Account", [position.address]))
+            queries.append(("Staking", "Ledger", [position.address]))
+        results = query_multi(url, queries)
+        logger.info(f"Chain - Read {len(chain_positions)} addresses from {url}")
+
+        for index, position in enumerate(chain_positions):
+            account, ledger = results[2 * index], results[2 * index + 1]
+            total_balance = planck_to_units(
+                str(account["data"]["free"]), position.decimals
+            )
+            staked_balance = 0.0
+            if ledger.value is not None:
+                staked_balance = planck_to_units(
+                    str(ledger["active"]), position.decimals
+                )
+            balances[position.key] = (total_balance, staked_balance)
+
+    return balances
+
+
+@task(name="Positions Rewards Task")
+def positions_get_rewards(
+    positions: List[TrackedPosition],
+) -> Dict[PositionKey, float]:
+    logger = get_run_logger()
+
+    # Subscan has no multi-address reward listing, so only the ledger totals
+    # are read in one query
+    subscan_urls = {
+        position.address: position.subscan_url or SUBSCAN_URL for position in positions
+    }
+    for address, subscan_url in subscan_urls.items():
+        watermark = get_reward_watermark(address)
+        rewards = list(iter_rewards_since(address, watermark, subscan_url))
+        added = add_rewards(address, rewards)
+        logger.info(f"Rewards - {added} new events for {address}")
+
+    totals = get_total_rewards_by_address(list(subscan_urls))
+    return {
+        position.key: planck_to_units(totals[position.address], position.decimals)
+        for position in positions
+    }
+
+
+@task(name="Positions Binance Task")
+def positions_get_binance(
+    positions: List[TrackedPosition],
+) -> Dict[str, Tuple[float, float, float]]:
+    logger = get_run_logger()
+
+    assets = hedged_assets(positions)
+    symbols = [position.binance_symbol for position in assets.values()]
+
+    client = get_client()
+    for symbol in symbols:
+        sync_orders(client, symbol, logger)
+
+    totals = get_filled_buy_totals_by_symbol(symbols)
+    # the same 5 minute average collect_all_data_flow marks DOT with, so the
+    # wide and long tables agree for the same instant
+    prices = get_price_oracle().avg_prices(symbols)
+
+    results = {}
+    for asset, position in assets.items():
+        total_size, total_usd = totals[position.binance_symbol]
+        avg_cost = total_usd / total_size if total_size else 0.0
+        results[asset] = (total_size, avg_cost, prices[position.binance_symbol])
+    return results
+
+
+@task(name="Positions Hedge Task")
+def positions_get_hedges(
+    positions: List[TrackedPosition],
+) -> Tuple[int, float, Dict[str, tuple]]:
+    logger = get_run_logger()
+
+    assets = hedged_assets(positions)
+
+    session = get_session()
+    account_id = session.account_id
+
+    cursors = {}
+    for position in assets.values():
+        symbol_id = position.ctrader_symbol_id
+        cursor = load_deal_cursor(account_id, symbol_id)
+        if cursor is None:
+            cursor = DealCursor(
+                account_id=account_id,
+                symbol_id=symbol_id,
+                last_deal_timestamp=INITIAL_DEAL_TIMESTAMP - 1,
+                last_deal_id=0,
+            )
+        cursors[symbol_id] = cursor
+
+    end_timestamp = round(time.time() * 1000)
+
+    reconcile = session.reconcile()
+
+    # deal lists cover every symbol, so one walk from the oldest cursor feeds
+    # them all
+    start_timestamp = min(cursor.last_deal_timestamp for cursor in cursors.values())
+    deals = session.deals(start_timestamp, end_timestamp)
+    logger.info(f"cTrader - Received {len(deals)} deals for {len(cursors)} symbols")
+    for cursor in cursors.values():
+        agg_closed_deals(deals, cursor, end_timestamp)
+        save_deal_cursor(cursor)
+
+    acct_balance = get_account_balance(session.trader())
+
+    legs = {}
+    for asset, position in assets.items():
+        cursor = cursors[position.ctrader_symbol_id]
+        open_margin, open_size, open_avg_price, open_swap = parse_positions(
+            reconcile, position.ctrader_symbol_id
+        )
+        legs[asset] = (
+            open_margin,
+            open_size,
+            open_avg_price,
+            open_swap,
+            cursor.closed_swap,
+            cursor.realized_pnl,
+        )
+    return account_id, acct_balance, legs
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from common.archive import ParquetArchive
+from common.schema import PRICE_TABLE
+
+# 2022-11-14 and 2022-11-15 00:00 UTC
+DAY_ONE = 1668384000
+DAY_TWO = 1668470400
+
+
+def rows(*unix_times: int) -> list:
+    return [
+        (unix_time, 6.1, float(index), 1000.0 + index, 150.0, unix_time - 60)
+        for index, unix_time in enumerate(unix_times)
+    ]
+
+
+def parquet_files(root) -> list:
+    return sorted(
+        os.path.relpath(os.path.join(directory, name), root)
+        for directory, _, names in os.walk(root)
+        for name in names
+        if name.endswith(".parquet")
+    )
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return ParquetArchive.local(str(tmp_path))
+
+
+def test_append_splits_by_date_and_reads_back(archive, tmp_path):
+    manifest = archive.read_manifest()
+    written = archive.append(
+        manifest,
+        PRICE_TABLE,
+        iter([rows(DAY_ONE, DAY_ONE + 60), rows(DAY_TWO - 60, DAY_TWO, DAY_TWO + 60)]),
+    )
+    archive.write_manifest(manifest)
+
+    assert [item["rows"] for item in written] == [3, 2]
+    assert archive.watermark(archive.read_manifest(), PRICE_TABLE) == DAY_TWO + 60
+    assert parquet_files(tmp_path) == [
+        f"hedge_data_price/date=2022-11-14/part-{DAY_ONE}.parquet",
+        f"hedge_data_price/date=2022-11-15/part-{DAY_TWO}.parquet",
+    ]
+
+    table = archive.read_table("hedge_data_price")
+    assert table.column("unix_time").to_pylist() == [
+        DAY_ONE,
+        DAY_ONE + 60,
+        DAY_TWO - 60,
+        DAY_TWO,
+        DAY_TWO + 60,
+    ]
+
+    batches = list(
+        archive.iter_batches(
+            "hedge_data_price", DAY_ONE + 60, DAY_TWO + 60, ["pps_open_pnl"]
+        )
+    )
+    assert [batch.schema.names for batch in batches] == [["pps_open_pnl"]] * 2
+    assert [value for batch in batches for value in batch.column(0).to_pylist()] == [
+        1.0,
+        0.0,
+        1.0,
+    ]
+
+
+def test_reset_keeps_old_files_until_manifest_is_written(archive, tmp_path):
+    manifest = archive.read_manifest()
+    archive.append(manifest, PRICE_TABLE, iter([rows(DAY_ONE, DAY_ONE + 60)]))
+    archive.write_manifest(manifest)
+    old_files = parquet_files(tmp_path)
+
+    manifest = archive.read_manifest()
+    archive.reset(manifest, PRICE_TABLE)
+    written = archive.append(manifest, PRICE_TABLE, iter([rows(DAY_ONE)]))
+
+    # a run that stops here leaves the old manifest and its files intact
+    assert written[0]["path"] not in old_files
+    assert set(old_files) < set(parquet_files(tmp_path))
+    stale = ParquetArchive.local(str(tmp_path)).read_table("hedge_data_price")
+    assert stale.num_rows == 2
+
+    archive.write_manifest(manifest)
+    assert parquet_files(tmp_path) == [written[0]["path"]]
+    assert archive.read_table("hedge_data_price").num_rows == 1
@@ -0,0 +1,157 @@
+import pytest
+from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import ProtoMessage
+from ctrader_open_api.messages.OpenApiMessages_pb2 import (
+    ProtoOADealListRes,
+    ProtoOAErrorRes,
+)
+from ctrader_open_api.messages.OpenApiModelMessages_pb2 import ProtoOADeal
+from twisted.internet import defer, task
+
+from common import ctrader
+from common.ctrader import (
+    DEAL_LIST_MAX_WINDOW,
+    RATE_LIMIT_ERROR,
+    DealListScheduler,
+    _split_windows,
+)
+from common.deal_cache import DealCache
+from common.rate_limit import TokenBucket
+
+ACCOUNT = 7
+WEEK = DEAL_LIST_MAX_WINDOW
+
+
+def deal(deal_id: int, timestamp: int) -> ProtoOADeal:
+    return ProtoOADeal(
+        dealId=deal_id,
+        orderId=deal_id,
+        positionId=deal_id,
+        volume=100,
+        filledVolume=100,
+        symbolId=1,
+        createTimestamp=timestamp,
+        executionTimestamp=timestamp,
+        tradeSide=1,
+        dealStatus=2,
+    )
+
+
+def wrap(response) -> ProtoMessage:
+    return ProtoMessage(
+        payloadType=response.payloadType, payload=response.SerializeToString()
+    )
+
+
+class FakeClient:
+    # answers like the deal list endpoint: at most max_rows deals per
+    # request, with hasMore set when the window holds more
+    def __init__(self, deals, max_rows: int = 1000, rate_limited: int = 0):
+        self.deals = deals
+        self.max_rows = max_rows
+        self.rate_limited = rate_limited
+        self.windows = []
+
+    def send(self, request, **kwargs):
+        window = (request.fromTimestamp, request.toTimestamp)
+        self.windows.append(window)
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return defer.succeed(
+                wrap(ProtoOAErrorRes(errorCode=RATE_LIMIT_ERROR, description="slow"))
+            )
+        matching = [
+            item
+            for item in self.deals
+            if window[0] <= item.executionTimestamp <= window[1]
+        ]
+        response = ProtoOADealListRes(
+            ctidTraderAccountId=ACCOUNT, hasMore=len(matching) > self.max_rows
+        )
+        response.deal.extend(matching[: self.max_rows])
+        return defer.succeed(wrap(response))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = task.Clock()
+    monkeypatch.setattr(ctrader, "reactor", clock)
+    return clock
+
+
+def fetch(clock, client, start, end, cache=None):
+    scheduler = DealListScheduler(
+        client,
+        ACCOUNT,
+        bucket=TokenBucket(rate=1000, capacity=1000, clock=clock.seconds),
+        cache=cache,
+    )
+    results = []
+    failures = []
+    scheduler.fetch(start, end).addCallbacks(results.append, failures.append)
+    for _ in range(1000):
+        if results or failures:
+            break
+        clock.advance(1)
+    if failures:
+        failures[0].raiseException()
+    return sorted(item.dealId for item in results[0])
+
+
+def test_split_windows_are_inclusive_and_disjoint():
+    assert _split_windows(0, 25, 10) == [(0, 9), (10, 19), (20, 25)]
+    assert _split_windows(5, 5, 10) == [(5, 5)]
+    assert _split_windows(6, 5, 10) == []
+
+
+def test_truncated_window_is_split_until_complete(clock):
+    deals = [deal(n, n * 10) for n in range(40)]
+    client = FakeClient(deals, max_rows=5)
+
+    assert fetch(clock, client, 0, 399) == list(range(40))
+    # every truncated window was asked for again in two disjoint halves
+    assert client.windows[:3] == [(0, 399), (0, 199), (200, 399)]
+    assert len(set(client.windows)) == len(client.windows)
+
+
+def test_rate_limited_requests_are_requeued(clock):
+    deals = [deal(n, n * WEEK) for n in range(3)]
+    client = FakeClient(deals, rate_limited=2)
+
+    assert fetch(clock, client, 0, 3 * WEEK - 1) == [0, 1, 2]
+    assert len(client.windows) == 5
+    assert sorted(set(client.windows)) == _split_windows(0, 3 * WEEK - 1, WEEK)
+
+
+def test_other_errors_fail_the_fetch(clock):
+    class BrokenClient(FakeClient):
+        def send(self, request, **kwargs):
+            return defer.succeed(wrap(ProtoOAErrorRes(errorCode="INVALID_REQUEST")))
+
+    with pytest.raises(Exception, match="INVALID_REQUEST"):
+        fetch(clock, BrokenClient([]), 0, WEEK - 1)
+
+
+def test_closed_windows_are_served_from_cache(clock, tmp_path):
+    deals = [deal(n, n * WEEK // 2) for n in range(4)]
+    cache = DealCache(str(tmp_path), verify_rate=0)
+    client = FakeClient(deals, max_rows=1)
+
+    assert fetch(clock, client, 0, 2 * WEEK - 1, cache) == [0, 1, 2, 3]
+    # each week was split in two, and cached whole once both halves came back
+    for window in _split_windows(0, 2 * WEEK - 1, WEEK):
+        assert len(cache.get(ACCOUNT, window).deal) == 2
+
+    client.windows.clear()
+    assert fetch(clock, client, WEEK // 2, WEEK - 1, cache) == [1]
+    assert client.windows == []
+
+
+def test_verified_window_is_fetched_again(clock, tmp_path):
+    cache = DealCache(str(tmp_path), verify_rate=1)
+    window = (0, WEEK - 1)
+    cache.put(ACCOUNT, window, [deal(1, 10)])
+    client = FakeClient([deal(1, 10), deal(2, 20)])
+
+    assert fetch(clock, client, 0, WEEK - 1, cache) == [1, 2]
+    assert client.windows == [window]
+    assert len(cache.get(ACCOUNT, window).deal) == 2
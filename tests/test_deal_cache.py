@@ -0,0 +1,178 @@
+import itertools
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+from ctrader_open_api.messages.OpenApiModelMessages_pb2 import ProtoOADeal
+
+from common import deal_cache
+from common.deal_cache import CLOSED_AFTER_MS, DealCache, align_windows
+from common.metrics import metrics
+
+ACCOUNT = 7
+DAY = 86400000
+
+
+def deal(deal_id: int, timestamp: int) -> ProtoOADeal:
+    return ProtoOADeal(
+        dealId=deal_id,
+        orderId=deal_id,
+        positionId=deal_id,
+        volume=100,
+        filledVolume=100,
+        symbolId=1,
+        createTimestamp=timestamp,
+        executionTimestamp=timestamp,
+        tradeSide=1,
+        dealStatus=2,
+    )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # strictly increasing last_used, so LRU order does not depend on timer
+    # resolution
+    ticks = itertools.count(1)
+    monkeypatch.setattr(
+        deal_cache,
+        "time",
+        SimpleNamespace(time=lambda: next(ticks), perf_counter=time.perf_counter),
+    )
+
+
+def blob_count(cache: DealCache) -> int:
+    return sum(
+        len(files) for _, _, files in os.walk(os.path.join(cache.directory, "objects"))
+    )
+
+
+def test_align_windows_uses_grid_from_epoch():
+    assert align_windows(25, 61, 10) == [
+        (20, 29),
+        (30, 39),
+        (40, 49),
+        (50, 59),
+        (60, 69),
+    ]
+    assert align_windows(30, 30, 10) == [(30, 39)]
+    # the same grid wherever the range starts
+    assert align_windows(33, 45, 10) == align_windows(30, 49, 10)
+
+
+def test_put_then_get_round_trips(tmp_path):
+    cache = DealCache(str(tmp_path))
+    deals = [deal(2, 200), deal(1, 100)]
+
+    cache.put(ACCOUNT, (0, DAY - 1), deals)
+    response = cache.get(ACCOUNT, (0, DAY - 1))
+
+    assert [item.dealId for item in response.deal] == [1, 2]
+    assert response.ctidTraderAccountId == ACCOUNT
+    assert not response.hasMore
+    assert cache.get(ACCOUNT, (DAY, 2 * DAY - 1)) is None
+
+
+def test_same_deals_share_one_blob(tmp_path):
+    cache = DealCache(str(tmp_path))
+
+    first = cache.put(ACCOUNT, (0, DAY - 1), [deal(1, 100), deal(2, 200)])
+    second = cache.put(ACCOUNT, (DAY, 2 * DAY - 1), [deal(2, 200), deal(1, 100)])
+    empty = cache.put(ACCOUNT, (2 * DAY, 3 * DAY - 1), [])
+    also_empty = cache.put(ACCOUNT, (3 * DAY, 4 * DAY - 1), [])
+
+    assert first == second
+    assert empty == also_empty
+    assert blob_count(cache) == 2
+
+
+def test_changed_window_records_drift(tmp_path):
+    cache = DealCache(str(tmp_path))
+    window = (0, DAY - 1)
+    metrics.drain()
+
+    before = cache.put(ACCOUNT, window, [deal(1, 100)])
+    assert cache.put(ACCOUNT, window, [deal(1, 100)]) == before
+    assert ("deal_cache", "drift") not in metrics.drain()
+
+    after = cache.put(ACCOUNT, window, [deal(1, 100), deal(2, 200)])
+
+    assert after != before
+    assert metrics.drain()[("deal_cache", "drift")].errors == 1
+    assert [item.dealId for item in cache.get(ACCOUNT, window).deal] == [1, 2]
+
+
+def test_eviction_drops_least_recently_used(tmp_path, clock):
+    windows = [(n * DAY, (n + 1) * DAY - 1) for n in range(3)]
+    probe = DealCache(str(tmp_path / "probe"))
+    size = os.path.getsize(probe._path(probe.put(ACCOUNT, windows[0], [deal(1, 1)])))
+    cache = DealCache(str(tmp_path / "cache"), max_bytes=2 * size)
+
+    oldest = cache.put(ACCOUNT, windows[0], [deal(1, 1)])
+    cache.put(ACCOUNT, windows[1], [deal(2, 2)])
+    # touching the first window makes the second the least recently used
+    assert cache.get(ACCOUNT, windows[0]) is not None
+    cache.put(ACCOUNT, windows[2], [deal(3, 3)])
+
+    assert cache.get(ACCOUNT, windows[1]) is None
+    assert cache.get(ACCOUNT, windows[0]) is not None
+    assert cache.get(ACCOUNT, windows[2]) is not None
+    assert os.path.exists(cache._path(oldest))
+    assert blob_count(cache) == 2
+
+
+def test_eviction_keeps_blob_still_shared(tmp_path, clock):
+    windows = [(n * DAY, (n + 1) * DAY - 1) for n in range(4)]
+    probe = DealCache(str(tmp_path / "probe"))
+    size = os.path.getsize(probe._path(probe.put(ACCOUNT, windows[0], [deal(1, 1)])))
+    cache = DealCache(str(tmp_path / "cache"), max_bytes=2 * size)
+
+    shared = cache.put(ACCOUNT, windows[0], [deal(1, 1)])
+    single = cache.put(ACCOUNT, windows[1], [deal(2, 2)])
+    # two distinct blobs fit, so nothing is evicted yet
+    assert cache.put(ACCOUNT, windows[2], [deal(1, 1)]) == shared
+    cache.put(ACCOUNT, windows[3], [deal(3, 3)])
+
+    # dropping the oldest window frees nothing, since the third still uses
+    # its blob, so the second goes as well
+    assert cache.get(ACCOUNT, windows[0]) is None
+    assert cache.get(ACCOUNT, windows[1]) is None
+    assert cache.get(ACCOUNT, windows[2]) is not None
+    assert os.path.exists(cache._path(shared))
+    assert not os.path.exists(cache._path(single))
+
+
+def test_missing_blob_is_forgotten(tmp_path):
+    cache = DealCache(str(tmp_path))
+    window = (0, DAY - 1)
+    os.remove(cache._path(cache.put(ACCOUNT, window, [deal(1, 100)])))
+    metrics.drain()
+
+    assert cache.get(ACCOUNT, window) is None
+    assert metrics.drain()[("deal_cache", "miss")].calls == 1
+    row = cache._db.execute("SELECT COUNT(*) FROM deal_windows").fetchone()
+    assert row == (0,)
+
+
+def test_corrupt_blob_is_forgotten(tmp_path):
+    cache = DealCache(str(tmp_path))
+    window = (0, DAY - 1)
+    with open(cache._path(cache.put(ACCOUNT, window, [deal(1, 100)])), "wb") as blob:
+        blob.write(b"\xff" * 16)
+
+    assert cache.get(ACCOUNT, window) is None
+    row = cache._db.execute("SELECT COUNT(*) FROM deal_windows").fetchone()
+    assert row == (0,)
+
+
+def test_window_closes_a_day_after_it_ends(tmp_path):
+    cache = DealCache(str(tmp_path))
+    window = (0, DAY - 1)
+
+    assert not cache.is_closed(window, DAY - 1 + CLOSED_AFTER_MS)
+    assert cache.is_closed(window, DAY + CLOSED_AFTER_MS)
+
+
+def test_verify_rate_bounds(tmp_path):
+    assert not DealCache(str(tmp_path), verify_rate=0).should_verify()
+    assert DealCache(str(tmp_path), verify_rate=1).should_verify()
@@ -0,0 +1,143 @@
+import random
+from dataclasses import fields
+
+import pytest
+
+from common.derived import compute_derived, snapshots_to_columns
+from common.models import DerivedSnapshot, LastSnapshot, RawSnapshot
+from common.schema import DERIVED_TABLE, RAW_TABLE
+
+
+def raw_snapshot(unix_time: int, rng: random.Random, **values) -> RawSnapshot:
+    data = {
+        field.name: rng.uniform(1, 1000)
+        for field in fields(RawSnapshot)
+        if field.name != "unix_time"
+    }
+    data["pps_open_dot_size"] = -rng.uniform(1, 1000)
+    data.update(values)
+    return RawSnapshot(unix_time=unix_time, **data)
+
+
+def baseline_derived(
+    raw: RawSnapshot, prev_raw: RawSnapshot, prev_derived: DerivedSnapshot
+) -> DerivedSnapshot:
+    # the per-row formulas collect_all_data_flow used before compute_derived
+    pps_open_pnl = (raw.pps_open_dot_avg_price - raw.dot_market_price) * abs(
+        raw.pps_open_dot_size
+    )
+    pps_open_liquid_value = raw.pps_open_margin + pps_open_pnl + raw.pps_open_swap
+    pps_total_swap = raw.pps_open_swap + raw.pps_closed_swap
+    dot_liquid_value = (
+        raw.dot_total_balance * raw.dot_market_price
+        + raw.ftx_dot_balance * raw.dot_market_price
+    )
+    total_liquid_value = pps_open_liquid_value + dot_liquid_value
+    total_cost = (
+        raw.ftx_cost_size * raw.ftx_cost_avg_price
+        + raw.binance_cost_size * raw.binance_avg_price
+        + raw.pps_open_margin
+    )
+    total_settled = raw.ftx_settled_size * raw.ftx_settled_avg_price
+
+    def diff(value, prev, name):
+        return 0 if prev is None else value - getattr(prev, name)
+
+    staked_ratio = (
+        raw.dot_staked_balance / (raw.dot_total_balance + raw.ftx_dot_balance) * 100
+    )
+    if raw.pps_open_margin == 0:
+        margin_ratio = 1
+    else:
+        margin_ratio = (
+            (raw.pps_acct_balance + pps_open_pnl) / raw.pps_open_margin
+        ) * 100
+    dot_net_position = (
+        raw.dot_total_balance + raw.ftx_dot_balance + raw.pps_open_dot_size
+    )
+    dot_fees = (
+        raw.ftx_cost_size
+        + raw.binance_cost_size
+        - (raw.ftx_settled_size + raw.ftx_dot_balance + raw.dot_total_balance)
+        + raw.dot_total_rewards
+    )
+    pnl = (
+        diff(total_liquid_value, prev_derived, "total_liquid_value")
+        - diff(total_cost, prev_derived, "total_cost")
+        + diff(total_settled, prev_derived, "total_settled")
+        + diff(raw.pps_realized_pnl, prev_raw, "pps_realized_pnl")
+        + diff(raw.pps_closed_swap, prev_raw, "pps_closed_swap")
+    )
+    return DerivedSnapshot(
+        unix_time=raw.unix_time,
+        pps_open_pnl=pps_open_pnl,
+        pps_open_liquid_value=pps_open_liquid_value,
+        pps_total_swap=pps_total_swap,
+        dot_liquid_value=dot_liquid_value,
+        total_liquid_value=total_liquid_value,
+        total_cost=total_cost,
+        total_settled=total_settled,
+        staked_ratio=staked_ratio,
+        margin_ratio=margin_ratio,
+        dot_net_position=dot_net_position,
+        dot_fees=dot_fees,
+        pnl=pnl,
+    )
+
+
+def baseline_history(raws, prev_raw=None, prev_derived=None):
+    derived = []
+    for raw in raws:
+        prev_derived = baseline_derived(raw, prev_raw, prev_derived)
+        derived.append(prev_derived)
+        prev_raw = raw
+    return derived
+
+
+def assert_matches(columns, expected):
+    for column in DERIVED_TABLE.columns:
+        assert columns[column].tolist() == pytest.approx(
+            [getattr(snapshot, column) for snapshot in expected], rel=1e-12
+        ), column
+
+
+@pytest.fixture
+def raws():
+    rng = random.Random(14)
+    return [
+        raw_snapshot(1668384000, rng),
+        raw_snapshot(1668405600, rng, pps_open_margin=0.0),
+        raw_snapshot(1668427200, rng),
+        raw_snapshot(1668448800, rng, pps_open_dot_size=0.0),
+    ]
+
+
+def test_matches_baseline_at_start_of_history(raws):
+    derived = compute_derived(snapshots_to_columns(raws, RAW_TABLE.columns))
+
+    expected = baseline_history(raws)
+    assert expected[0].pnl == 0
+    assert_matches(derived, expected)
+
+
+def test_matches_baseline_after_stored_snapshot(raws):
+    prev_raw = raw_snapshot(1668362400, random.Random(5))
+    prev_derived = baseline_derived(prev_raw, None, None)
+
+    derived = compute_derived(
+        snapshots_to_columns(raws, RAW_TABLE.columns),
+        LastSnapshot(raw=prev_raw, derived=prev_derived),
+    )
+
+    expected = baseline_history(raws, prev_raw, prev_derived)
+    assert expected[0].pnl != 0
+    assert_matches(derived, expected)
+
+
+def test_empty_previous_snapshot_seeds_zero_diff(raws):
+    derived = compute_derived(
+        snapshots_to_columns(raws[:1], RAW_TABLE.columns), LastSnapshot()
+    )
+
+    assert derived["pnl"].tolist() == [0.0]
+    assert_matches(derived, baseline_history(raws[:1]))
@@ -0,0 +1,61 @@
+import os
+
+from common.metrics import DependencyStats, export_totals, load_totals
+
+
+def stats(*latencies: float, error: bool = False) -> dict:
+    item = DependencyStats()
+    for seconds in latencies:
+        item.observe(seconds, error, 10, 100)
+    return {("binance", "GET /api/v3/avgPrice"): item}
+
+
+def test_totals_accumulate_across_runs(tmp_path):
+    export_totals("collect_price_snapshot", stats(0.02, 0.2), str(tmp_path))
+    totals = export_totals(
+        "collect_price_snapshot", stats(3.0, error=True), str(tmp_path)
+    )
+
+    item = totals[("binance", "GET /api/v3/avgPrice")]
+    assert item.calls == 3
+    assert item.errors == 1
+    assert item.bytes_received == 300
+    assert item.latency_max == 3.0
+    assert sum(item.buckets) == 3
+    assert (
+        load_totals(str(tmp_path / "hedge_dataflow_collect_price_snapshot.json"))
+        == totals
+    )
+
+    text = (tmp_path / "hedge_dataflow_collect_price_snapshot.prom").read_text()
+    labels = (
+        'flow="collect_price_snapshot",dependency="binance",'
+        'operation="GET /api/v3/avgPrice"'
+    )
+    assert f"hedge_dependency_latency_seconds_count{{{labels}}} 3" in text
+    assert f'hedge_dependency_latency_seconds_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f"hedge_dependency_errors_total{{{labels}}} 1" in text
+
+
+def test_missing_directory_is_created(tmp_path):
+    directory = tmp_path / "state" / "metrics"
+    export_totals("collect_all_data", stats(0.1), str(directory))
+
+    assert (directory / "hedge_dataflow_collect_all_data.prom").exists()
+
+
+def test_each_flow_writes_its_own_file(tmp_path):
+    export_totals("collect_all_data", stats(0.1, 0.1), str(tmp_path))
+    export_totals("collect_price_snapshot", stats(0.1), str(tmp_path))
+
+    names = sorted(name for name in os.listdir(tmp_path) if name.endswith(".prom"))
+    assert names == [
+        "hedge_dataflow_collect_all_data.prom",
+        "hedge_dataflow_collect_price_snapshot.prom",
+    ]
+    full = (tmp_path / "hedge_dataflow_collect_all_data.prom").read_text()
+    assert "collect_price_snapshot" not in full
+    assert (
+        'hedge_dependency_latency_seconds_count{flow="collect_all_data",'
+        'dependency="binance",operation="GET /api/v3/avgPrice"} 2'
+    ) in full
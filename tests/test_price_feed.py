@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from benchmarks.config import StandinConfig
+from benchmarks.stream_server import StreamServer
+from common.price_feed import BinancePriceFeed, TickBuffer, run_price_feeds
+
+
+def trade(trade_time: float, price: str, qty: str) -> dict:
+    return {"e": "trade", "s": "DOTBUSD", "p": price, "q": qty, "T": trade_time}
+
+
+@pytest.fixture
+def stream():
+    servers = []
+
+    def start(script=None, history_size=0):
+        server = StreamServer(
+            StandinConfig(port=0, latency=0.05, history_size=history_size), script
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"ws://127.0.0.1:{server.server_address[1]}/ws"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_tick_buffer_tracks_window():
+    buffer = TickBuffer(capacity=8, window=10)
+    buffer.push(100.0, 2.0, 1.0)
+    buffer.push(105.0, 4.0, 3.0)
+    buffer.push(108.0, 1.0, 1.0)
+
+    assert buffer.last() == 1.0
+    assert buffer.vwap(now=108.0) == pytest.approx((2 + 12 + 1) / 5)
+    assert buffer.min(now=108.0) == 1.0
+    assert buffer.max(now=108.0) == 4.0
+    assert not buffer.covers_window(now=108.0)
+
+    # the first tick leaves the window
+    assert buffer.vwap(now=111.0) == pytest.approx(13 / 4)
+    assert buffer.covers_window(now=111.0)
+    assert len(buffer) == 2
+
+
+def test_tick_buffer_overwritten_ticks_void_the_window():
+    buffer = TickBuffer(capacity=2, window=10)
+    for second in range(4):
+        buffer.push(100.0 + second, 1.0 + second, 1.0)
+
+    assert len(buffer) == 2
+    assert buffer.min(now=103.0) == 3.0
+    assert not buffer.covers_window(now=111.0)
+    assert buffer.covers_window(now=112.5)
+
+
+def test_feed_buffers_trades_from_stream(stream):
+    now_ms = round(time.time() * 1000)
+    server, url = stream(
+        [
+            {"result": None, "id": 1},
+            trade(now_ms - 2000, "6.00", "10"),
+            trade(now_ms - 1000, "6.20", "30"),
+        ]
+    )
+    feed = BinancePriceFeed("DOTBUSD", url=url)
+    feed.start()
+    try:
+        wait_for(lambda: len(feed.buffer) == 2)
+    finally:
+        feed.stop()
+
+    assert server.connections == 1
+    quote = feed.quote()
+    assert quote.symbol == "DOTBUSD"
+    assert quote.last_price == 6.2
+    assert quote.last_trade_time == now_ms - 1000
+    # two seconds of trades are not a full averaging window
+    assert quote.vwap is None
+
+
+def test_feed_quotes_vwap_once_window_is_covered(stream):
+    now_ms = round(time.time() * 1000)
+    _, url = stream(
+        [
+            trade(now_ms - 400000, "5.00", "10"),
+            trade(now_ms - 200000, "6.00", "10"),
+            trade(now_ms - 100000, "7.00", "30"),
+        ]
+    )
+    feed = BinancePriceFeed("DOTBUSD", url=url)
+    feed.start()
+    try:
+        wait_for(lambda: feed.buffer.last() == 7.0)
+    finally:
+        feed.stop()
+
+    assert feed.quote().vwap == pytest.approx((60 + 210) / 40)
+
+
+def test_run_price_feeds_publishes_until_deadline(stream):
+    _, url = stream(history_size=50)
+    published = []
+
+    started = time.monotonic()
+    count = run_price_feeds(
+        ["DOTBUSD", "DOTUSDT"],
+        run_seconds=0.5,
+        publish=published.append,
+        publish_seconds=0.1,
+        url=url,
+    )
+
+    assert time.monotonic() - started < 0.5 + 5
+    assert count == len(published) > 0
+    symbols = {quote.symbol for quote in published[-1]}
+    assert symbols == {"DOTBUSD", "DOTUSDT"}
+    assert all(quote.vwap is not None for quote in published[-1])
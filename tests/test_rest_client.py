@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from benchmarks.config import StandinConfig
+from benchmarks.http_server import VenueServer
+from common.ftx_client import FtxClient
+from common.metrics import metrics
+from common.rest_client import PaginationError
+from common.subscan import PAGE_SIZE, SubscanClient
+
+
+@pytest.fixture
+def venue():
+    servers = []
+
+    def start(**config):
+        server = VenueServer(StandinConfig(port=0, **config))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        url = f"http://127.0.0.1:{server.server_address[1]}/ftx/api/"
+        return server, FtxClient("key", "secret", base_url=url)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_order_history_pages_across_shared_seconds(venue):
+    # pages of 200 end inside a pair of rows sharing one second
+    _, client = venue(history_size=450)
+    with client:
+        orders = client.get_order_history()
+
+    assert [order["id"] for order in orders] == list(range(450))
+
+
+def test_withdrawals_page_until_nothing_new(venue):
+    _, client = venue(history_size=250)
+    with client:
+        withdrawals = client.get_withdrawals()
+
+    assert [row["id"] for row in withdrawals] == list(range(250))
+
+
+def test_full_page_on_one_timestamp_raises(venue):
+    # one row per page, but two rows per second
+    _, client = venue(history_size=10, max_rows=1)
+    with client, pytest.raises(PaginationError):
+        client.get_withdrawals()
+
+
+def test_requests_reuse_pooled_connection(venue):
+    server, client = venue()
+    with client:
+        for _ in range(5):
+            assert client.get_balances()[0]["coin"] == "DOT"
+
+    assert server.connections == 1
+
+
+def test_rate_limited_request_is_retried(venue):
+    server, client = venue(rate_limit=2)
+    metrics.drain()
+    with client:
+        balances = [client.get_balances() for _ in range(3)]
+
+    assert all(rows[0]["coin"] == "DOT" for rows in balances)
+    stats = metrics.drain()[("ftx", "GET wallet/balances")]
+    # every 429 was retried until it went through
+    assert stats.errors >= 1
+    assert stats.calls == 3 + stats.errors
+    assert server.connections == 1
+
+
+def subscan_client(server) -> SubscanClient:
+    return SubscanClient(f"http://127.0.0.1:{server.server_address[1]}/subscan/api/")
+
+
+def test_rewards_page_down_to_watermark(venue):
+    server, _ = venue(history_size=250)
+    with subscan_client(server) as client:
+        rewards = list(client.iter_rewards_since("address", 1100))
+
+    # newest first, from block 1249 down to the watermark
+    assert [reward["block_num"] for reward in rewards] == list(range(1249, 1099, -1))
+    assert len(rewards) > PAGE_SIZE
+
+
+def test_rate_limited_post_is_retried(venue):
+    server, _ = venue(history_size=10, rate_limit=2)
+    metrics.drain()
+    with subscan_client(server) as client:
+        pages = [list(client.iter_rewards_since("address", 0)) for _ in range(3)]
+
+    assert all(len(rewards) == 10 for rewards in pages)
+    stats = metrics.drain()[("subscan", "POST scan/account/reward_slash")]
+    assert stats.errors >= 1
+    assert stats.calls == 3 + stats.errors
+    assert server.connections == 1
@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from common.rollup import _affected_ranges, bucket_start
+
+# Monday 2022-11-14 00:00 UTC
+MONDAY = 1668384000
+
+
+def test_hour_and_day_buckets_align_to_the_epoch():
+    assert bucket_start(MONDAY + 3599, "1h") == MONDAY
+    assert bucket_start(MONDAY + 3600, "1h") == MONDAY + 3600
+    assert bucket_start(MONDAY + 86399, "1d") == MONDAY
+    assert bucket_start(MONDAY - 1, "1d") == MONDAY - 86400
+
+
+@pytest.mark.parametrize("seconds", [0, 1, 3 * 86400, 7 * 86400 - 1])
+def test_week_buckets_start_on_monday(seconds):
+    start = bucket_start(MONDAY + seconds, "1w")
+
+    assert start == MONDAY
+    assert datetime.fromtimestamp(start, timezone.utc).weekday() == 0
+
+
+def test_week_bucket_before_monday_is_the_previous_week():
+    # the unix epoch is a Thursday, hence the 345600 (4 day) offset
+    assert bucket_start(MONDAY - 1, "1w") == MONDAY - 604800
+    assert bucket_start(0, "1w") == 345600 - 604800
+
+
+def test_affected_ranges_merge_adjacent_buckets():
+    unix_times = [MONDAY + 10, MONDAY + 20, MONDAY + 3600 + 5, MONDAY + 4 * 3600]
+
+    assert _affected_ranges(unix_times, "1h") == [
+        (MONDAY, MONDAY + 2 * 3600),
+        (MONDAY + 4 * 3600, MONDAY + 5 * 3600),
+    ]
+
+
+def test_affected_ranges_sort_and_deduplicate():
+    unix_times = [MONDAY + 86400 * 16, MONDAY + 5, MONDAY + 86400 * 16 + 60]
+
+    assert _affected_ranges(unix_times, "1w") == [
+        (MONDAY, MONDAY + 604800),
+        (MONDAY + 2 * 604800, MONDAY + 3 * 604800),
+    ]
+    assert _affected_ranges([], "1d") == []
@@ -0,0 +1,57 @@
+import math
+import os
+import shutil
+from dataclasses import astuple
+
+import psycopg2
+import pytest
+
+from benchmarks.postgres import throwaway_postgres
+from benchmarks.run import free_port
+from common.migrations import apply_migrations
+from common.models import AssetSnapshot
+from common.schema import ASSET_TABLE
+from common.store import COPY_THRESHOLD, insert_rows
+
+pytestmark = pytest.mark.skipif(
+    not (os.environ.get("PG_BIN") or shutil.which("initdb")),
+    reason="needs a local Postgres install",
+)
+
+NAMES = ["tab\there", "line\nbreak", "back\\slash", "carriage\rreturn", "\\N", "a\\tb"]
+
+
+@pytest.fixture(scope="module")
+def conn():
+    with throwaway_postgres(free_port()) as database:
+        conn = psycopg2.connect(**database)
+        apply_migrations(conn)
+        yield conn
+        conn.close()
+
+
+def test_copy_round_trips_special_characters(conn):
+    snapshots = [
+        AssetSnapshot(
+            unix_time=index,
+            account=NAMES[index % len(NAMES)],
+            asset="DOT",
+            total_balance=float(index),
+            staked_balance=None,
+            total_rewards=math.nan,
+        )
+        for index in range(COPY_THRESHOLD + len(NAMES))
+    ]
+
+    with conn, conn.cursor() as cur:
+        insert_rows(cur, ASSET_TABLE, [astuple(snapshot) for snapshot in snapshots])
+        cur.execute(
+            "SELECT unix_time, account, asset, total_balance, staked_balance, "
+            "total_rewards FROM hedge_data_asset ORDER BY unix_time;"
+        )
+        rows = cur.fetchall()
+
+    assert len(rows) == len(snapshots)
+    for row, snapshot in zip(rows, snapshots):
+        assert row[:5] == astuple(snapshot)[:5]
+        assert math.isnan(row[5])
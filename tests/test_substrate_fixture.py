@@ -0,0 +1,35 @@
+import json
+import threading
+
+import pytest
+
+from benchmarks.config import StandinConfig
+from benchmarks.substrate_server import (
+    DEFAULT_FIXTURE,
+    SYNTHETIC_ACTIVE,
+    SYNTHETIC_FREE,
+    ReplayServer,
+)
+from common.substrate import query_multi
+
+
+@pytest.fixture
+def substrate_url():
+    server = ReplayServer(StandinConfig(port=0), DEFAULT_FIXTURE)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_committed_fixture_answers_balance_query(substrate_url):
+    with open(DEFAULT_FIXTURE) as fixture:
+        address = json.load(fixture)["address"]
+
+    account, ledger = query_multi(
+        substrate_url,
+        [("System", "Account", [address]), ("Staking", "Ledger", [address])],
+    )
+
+    assert account["data"]["free"] == SYNTHETIC_FREE
+    assert ledger["active"] == SYNTHETIC_ACTIVE
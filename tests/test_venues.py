@@ -0,0 +1,44 @@
+from dataclasses import fields
+
+import pytest
+
+from common.models import RawSnapshot
+from common.venues import VenueAdapter, merge_venue_fields
+
+SNAPSHOT_FIELDS = [field.name for field in fields(RawSnapshot)][1:]
+
+
+class HalfVenue(VenueAdapter):
+    def calls(self):
+        return {}
+
+    def fields(self, results):
+        names = SNAPSHOT_FIELDS[:8] if self.options["first"] else SNAPSHOT_FIELDS[8:]
+        return {name: results.get(name, 0.0) for name in names}
+
+
+def test_adapter_without_fields_cannot_be_created():
+    class CallsOnly(VenueAdapter):
+        def calls(self):
+            return {}
+
+    with pytest.raises(TypeError):
+        CallsOnly("calls-only", 60)
+
+
+def test_merge_venue_fields_builds_snapshot():
+    adapters = [HalfVenue("a", 60, first=True), HalfVenue("b", 60, first=False)]
+
+    snapshot = merge_venue_fields(
+        1700000000, adapters, {"a": {"ftx_dot_balance": 5.0}, "b": {}}
+    )
+
+    assert snapshot.unix_time == 1700000000
+    assert snapshot.ftx_dot_balance == 5.0
+
+
+def test_merge_venue_fields_rejects_overlap():
+    adapters = [HalfVenue("a", 60, first=True), HalfVenue("b", 60, first=True)]
+
+    with pytest.raises(ValueError, match="sets ftx_dot_balance twice"):
+        merge_venue_fields(1700000000, adapters, {"a": {}, "b": {}})